@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""
+全流程性能基准：用固定数据集离线运行 main() 与各 analyze_* / plot_* 函数，
+输出每个阶段的耗时与峰值内存，超过 baseline.json 中的基线时以非零状态退出
+
+用法:
+    python benchmarks/bench_pipeline.py                    # 对比基线
+    python benchmarks/bench_pipeline.py --update-baseline  # 记录新基线
+    python benchmarks/bench_pipeline.py --stages analyze_risk_regime,main --repeat 3
+    python benchmarks/bench_pipeline.py --archive .cache/replay.zip  # 回放录制的真实数据
+"""
+import os
+import sys
+import io
+import gc
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import platform
+import tempfile
+import warnings
+import tracemalloc
+import contextlib
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baseline.json')
+
+# 添加项目根目录与src目录到Python路径
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, 'src'))
+sys.path.insert(0, BENCH_DIR)
+
+# 渲染进程会重新导入本脚本，与 generate_image 一样屏蔽告警输出
+warnings.filterwarnings('ignore')
+
+# 低于该绝对差值的变化视为噪声
+TIME_NOISE_MS = 20
+MEMORY_NOISE_KB = 1024
+
+
+def load_pipeline(workdir, archive=None):
+    """
+    在临时工作目录中导入 generate_image（output/ 与 .cache/ 都落在该目录），
+    数据来自固定数据集，或给出 archive 时回放录制的归档
+    :return: (generate_image 模块, 数据集校验和)
+    """
+    from fixtures import FixtureSources
+    os.chdir(workdir)
+    os.environ['MARKET_CACHE_DIR'] = os.path.join(workdir, '.cache')
+    os.environ['FORCE_REBUILD'] = '1'
+    if archive:
+        os.environ['DATA_SOURCE'] = 'replay'
+        os.environ['DATA_ARCHIVE'] = archive
+    with contextlib.redirect_stdout(io.StringIO()):
+        import generate_image as gi
+    if archive:
+        with open(archive, 'rb') as f:
+            return gi, 'archive-' + hashlib.sha1(f.read()).hexdigest()[:16]
+    sources = FixtureSources()
+    sources.install(gi)
+    return gi, sources.checksum
+
+
+def reset_log(gi):
+    """清空执行日志（各阶段之间互不累积）"""
+    for key, value in gi.EXECUTION_LOG.items():
+        if isinstance(value, list):
+            value.clear()
+        elif isinstance(value, dict):
+            value.clear()
+        else:
+            gi.EXECUTION_LOG[key] = None
+
+
+def build_stages(gi, workdir):
+    """
+    基准阶段 {名称: (准备函数, 被测函数)}
+    准备函数的返回值作为被测函数的参数，准备时间不计入
+    """
+    from chart_farm import ChartFarm
+
+    inline_farm = ChartFarm(gi.OUTPUT_DIR, workers=0, output_format=gi.CHART_FORMAT)
+    pool_farm = gi.CHART_FARM
+    start_date_str, end_date_str = gi.analysis_window()
+
+    def market():
+        gi.CHART_FARM = inline_farm
+        gi.register_market_data()
+        gi.prefetch_market_data()
+        return ()
+
+    def indicators():
+        market()
+        return (gi.build_market_indicators(),)
+
+    def margin():
+        gi.CHART_FARM = inline_farm
+        return (gi.fetch_margin_data(start_date_str, end_date_str),)
+
+    def multi_indicator():
+        gi.CHART_FARM = inline_farm
+        return (gi.fetch_margin_data(start_date_str, end_date_str),
+                gi.fetch_indicator_data(start_date_str, end_date_str))
+
+    def oil_gold():
+        gi.CHART_FARM = inline_farm
+        return (gi.fetch_oil_gold_data(),)
+
+    def pe_bond():
+        gi.CHART_FARM = inline_farm
+        return (gi.fetch_pe_bond_data(),)
+
+    def hsi_rut():
+        market()
+        return (gi.fetch_hsi_rut_data(),)
+
+    def cold_start():
+        # 全流程从空缓存开始：内存行情、磁盘缓存与输出目录都清空
+        gi.CHART_FARM = pool_farm
+        gi.MARKET_DATA.clear()
+        shutil.rmtree(os.path.join(workdir, '.cache'), ignore_errors=True)
+        shutil.rmtree(gi.OUTPUT_DIR, ignore_errors=True)
+        os.makedirs(gi.OUTPUT_DIR, exist_ok=True)
+        return ()
+
+    return {
+        'build_market_indicators': (market, gi.build_market_indicators),
+        'analyze_index_divergence': (indicators, gi.analyze_index_divergence),
+        'analyze_risk_regime': (indicators, gi.analyze_risk_regime),
+        'analyze_china_us_linkage': (indicators, gi.analyze_china_us_linkage),
+        'analyze_liquidity_conditions': (lambda: (), gi.analyze_liquidity_conditions),
+        'generate_and_save_plot': (market, lambda: gi.generate_and_save_plot('^GSPC', 'sp500.png')),
+        'plot_data': (margin, gi.task_margin_analysis),
+        'plot_data_multi': (multi_indicator, gi.task_multi_indicator),
+        'plot_oil_gold_bond': (oil_gold, gi.plot_oil_gold_bond),
+        'plot_pe_bond_spread': (pe_bond, gi.plot_pe_bond_spread),
+        'plot_hsi_rut_correlation': (hsi_rut, gi.task_hsi_rut_correlation),
+        'main': (cold_start, gi.main),
+    }
+
+
+def run_stage(gi, setup, func, repeat, quiet=True):
+    """
+    运行一个阶段：先预热一次，再取 repeat 次耗时的中位数；
+    峰值内存单独用 tracemalloc 测一次（tracemalloc 会拖慢计时）
+    """
+    out = io.StringIO() if quiet else sys.stdout
+
+    def once(trace=False):
+        reset_log(gi)
+        args = setup()
+        gc.collect()
+        if trace:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            func(*args)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            peak = tracemalloc.get_traced_memory()[1] if trace else 0
+            if trace:
+                tracemalloc.stop()
+        return elapsed, peak
+
+    with contextlib.redirect_stdout(out):
+        once()
+        timings = sorted(once()[0] for _ in range(repeat))
+        peak = once(trace=True)[1]
+        errors = list(gi.EXECUTION_LOG['errors'])
+    return {
+        'time_ms': round(timings[len(timings) // 2], 1),
+        'min_ms': round(timings[0], 1),
+        'peak_kb': round(peak / 1024),
+        'errors': errors,
+    }
+
+
+def load_baseline():
+    try:
+        with open(BASELINE_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_baseline(results, checksum):
+    payload = {
+        'fixtures': checksum,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'recorded': time.strftime('%Y-%m-%d'),
+        'stages': {name: {'time_ms': r['time_ms'], 'peak_kb': r['peak_kb']} for name, r in results.items()},
+    }
+    with open(BASELINE_PATH, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+        f.write('\n')
+
+
+def compare(results, baseline, time_tolerance, memory_tolerance):
+    """返回回归列表 [(阶段, 说明)]"""
+    regressions = []
+    stages = baseline.get('stages', {})
+    for name, result in results.items():
+        base = stages.get(name)
+        if base is None:
+            continue
+        time_limit = base['time_ms'] * (1 + time_tolerance)
+        if result['time_ms'] > time_limit and result['time_ms'] - base['time_ms'] > TIME_NOISE_MS:
+            regressions.append((name, f"耗时 {result['time_ms']:.1f}ms > 基线 {base['time_ms']:.1f}ms"
+                                      f" (+{time_tolerance:.0%})"))
+        memory_limit = base['peak_kb'] * (1 + memory_tolerance)
+        if result['peak_kb'] > memory_limit and result['peak_kb'] - base['peak_kb'] > MEMORY_NOISE_KB:
+            regressions.append((name, f"峰值内存 {result['peak_kb']}KB > 基线 {base['peak_kb']}KB"
+                                      f" (+{memory_tolerance:.0%})"))
+    return regressions
+
+
+def print_table(results, baseline):
+    stages = (baseline or {}).get('stages', {})
+    print(f"\n{'阶段':<30}{'中位耗时ms':>12}{'最快ms':>10}{'峰值KB':>10}{'基线ms':>10}{'变化':>8}")
+    print('-' * 80)
+    for name, r in results.items():
+        base = stages.get(name)
+        base_ms = f"{base['time_ms']:.1f}" if base else '-'
+        delta = f"{r['time_ms'] / base['time_ms'] - 1:+.0%}" if base and base['time_ms'] else '-'
+        print(f"{name:<30}{r['time_ms']:>12.1f}{r['min_ms']:>10.1f}{r['peak_kb']:>10}{base_ms:>10}{delta:>8}")
+        for error in r['errors'][:3]:
+            print(f"    ❌ {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='离线全流程性能基准')
+    parser.add_argument('--stages', help='只运行指定阶段（逗号分隔）')
+    parser.add_argument('--repeat', type=int, default=5, help='计时重复次数（取中位数）')
+    parser.add_argument('--main-repeat', type=int, default=1, help='main 阶段的计时重复次数')
+    parser.add_argument('--time-tolerance', type=float, default=0.5, help='耗时允许的相对增长')
+    parser.add_argument('--memory-tolerance', type=float, default=0.25, help='峰值内存允许的相对增长')
+    parser.add_argument('--update-baseline', action='store_true', help='把本次结果写入 baseline.json')
+    parser.add_argument('--archive', help='回放录制归档（DATA_SOURCE=record 生成）代替固定数据集')
+    parser.add_argument('--verbose', action='store_true', help='显示被测函数的输出')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_pipeline_')
+    try:
+        archive = os.path.abspath(args.archive) if args.archive else None
+        gi, checksum = load_pipeline(workdir, archive)
+        stages = build_stages(gi, workdir)
+        selected = args.stages.split(',') if args.stages else list(stages)
+        unknown = [name for name in selected if name not in stages]
+        if unknown:
+            parser.error(f"未知阶段: {', '.join(unknown)}（可选: {', '.join(stages)}）")
+
+        print(f"固定数据集: {checksum}  工作目录: {workdir}")
+        results = {}
+        for name in selected:
+            setup, func = stages[name]
+            repeat = args.main_repeat if name == 'main' else args.repeat
+            print(f"⏱️  {name} ...", flush=True)
+            results[name] = run_stage(gi, setup, func, repeat, quiet=not args.verbose)
+        gi.CHART_FARM.shutdown()
+    finally:
+        os.chdir(ROOT_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline = load_baseline()
+    print_table(results, baseline)
+
+    if args.update_baseline:
+        if baseline and baseline.get('fixtures') == checksum and args.stages:
+            merged = {name: dict(value, min_ms=0, errors=[]) for name, value in baseline['stages'].items()}
+            merged.update(results)
+            results = merged
+        save_baseline(results, checksum)
+        print(f"\n✅ 基线已写入 {os.path.relpath(BASELINE_PATH, ROOT_DIR)}")
+        return 0
+
+    if baseline is None:
+        print("\n⚠️  没有基线，使用 --update-baseline 记录")
+        return 0
+    if baseline.get('fixtures') != checksum:
+        print(f"\n⚠️  固定数据集 {checksum} 与基线 {baseline.get('fixtures')} 不一致，跳过对比")
+        return 0
+
+    regressions = compare(results, baseline, args.time_tolerance, args.memory_tolerance)
+    if regressions:
+        print(f"\n❌ {len(regressions)} 项性能回归:")
+        for name, message in regressions:
+            print(f"  {name}: {message}")
+        return 1
+    print("\n✅ 无性能回归")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+"""
+基准测试用的固定数据集：按固定种子生成（或放入录制的真实数据），
+安装到 generate_image 后全流程离线运行
+"""
+import os
+import zlib
+import numpy as np
+import pandas as pd
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+FIXTURE_VERSION = 1
+FIXTURE_END = pd.Timestamp('2026-10-16')  # 生成数据的最后日期，加载时平移到最近的同一星期几
+
+YF_SYMBOLS = {
+    '^TNX': 4.2, '^VIX': 16.0, '^GSPC': 5800.0, '^IXIC': 18500.0, '^RUT': 2200.0,
+    'VNQ': 90.0, '^N225': 38000.0, '^HSI': 20000.0, 'CNY=X': 7.15,
+}
+ETF_CODES = {'510300': 3.9, '159845': 2.4, '510500': 5.6}
+ETF_UNIVERSE = 120  # ETF 面板的全市场样本数
+ETF_FUND_TYPES = ('指数型-股票', '指数型-股票', '指数型-股票', '指数型-海外股票', '指数型-固收', '商品型', '货币型-普通货币')
+A_SHARE_INDICES = ('sh000001', 'sz399106')
+FUTURES = {'CL': 75.0, 'GC': 2400.0}
+
+
+def _rng(name):
+    return np.random.default_rng(zlib.crc32(f'{FIXTURE_VERSION}:{name}'.encode('utf-8')))
+
+
+def _walk(name, n, start, vol):
+    """几何随机游走"""
+    steps = _rng(name).normal(0, vol, n)
+    return start * np.exp(np.cumsum(steps))
+
+
+def _bdays(n):
+    return pd.bdate_range(end=FIXTURE_END, periods=n)
+
+
+def _ohlc(symbol, start, n=500):
+    index = _bdays(n)
+    close = _walk(symbol, n, start, 0.012)
+    rng = _rng(symbol + ':range')
+    spread = np.abs(rng.normal(0, 0.006, n)) * close
+    open_ = close * (1 + rng.normal(0, 0.003, n))
+    return pd.DataFrame({
+        'Open': open_, 'High': np.maximum(open_, close) + spread,
+        'Low': np.minimum(open_, close) - spread, 'Close': close,
+        'Volume': rng.integers(1_000_000, 5_000_000, n).astype(float),
+    }, index=index.rename('Date'))
+
+
+def build_fixtures():
+    """生成全部数据源的固定数据 {名称: DataFrame}"""
+    fixtures = {f'yf_{symbol}': _ohlc(symbol, start) for symbol, start in YF_SYMBOLS.items()}
+
+    days = _bdays(2500)
+    fixtures['stock_margin_sse'] = pd.DataFrame({
+        '信用交易日期': days.strftime('%Y%m%d'),
+        '融资余额': _walk('margin', len(days), 8.0e11, 0.004),
+        '融资买入额': _walk('margin_buy', len(days), 4.0e10, 0.02),
+        '融券余量': _walk('short', len(days), 1.0e10, 0.01),
+    }).iloc[::-1].reset_index(drop=True)  # 接口按日期倒序返回
+
+    days = _bdays(4500)
+    fixtures['macro_china_shibor_all'] = pd.DataFrame({
+        '日期': days.date,
+        'O/N-定价': _walk('shibor_on', len(days), 1.5, 0.01),
+        '1W-定价': _walk('shibor_1w', len(days), 1.7, 0.008),
+        '1M-定价': _walk('shibor_1m', len(days), 2.0, 0.005),
+        '3M-定价': _walk('shibor_3m', len(days), 2.2, 0.004),
+    })
+
+    days = _bdays(3600)
+    fixtures['bond_zh_us_rate'] = pd.DataFrame({
+        '日期': days.date,
+        '中国国债收益率2年': _walk('cn2y', len(days), 2.0, 0.006),
+        '中国国债收益率10年': _walk('cn10y', len(days), 2.6, 0.004),
+        '美国国债收益率2年': _walk('us2y', len(days), 4.0, 0.008),
+        '美国国债收益率10年': _walk('us10y', len(days), 4.1, 0.006),
+    })
+
+    for code, start in ETF_CODES.items():
+        days = _bdays(3000)
+        close = _walk(f'etf{code}', len(days), start, 0.013)
+        fixtures[f'fund_etf_hist_em_{code}'] = pd.DataFrame({
+            '日期': days.strftime('%Y-%m-%d'), '开盘': close, '收盘': close,
+            '最高': close * 1.01, '最低': close * 0.99,
+            '成交量': _rng(f'etfvol{code}').integers(1e6, 1e7, len(days)),
+        })
+
+    days = _bdays(250)
+    codes = [f'{560000 + i * 7:06d}' for i in range(ETF_UNIVERSE)]
+    rng = _rng('etf_universe')
+    close = np.exp(np.cumsum(rng.normal(0, 0.012, (len(days), len(codes))), axis=0)) * rng.uniform(0.8, 5, len(codes))
+    shares = np.exp(np.cumsum(rng.normal(0, 0.008, (len(days), len(codes))), axis=0)) * rng.uniform(1e8, 2e10, len(codes))
+    volume = np.round(shares * rng.uniform(0.002, 0.08, (len(days), len(codes))) / 100)  # 手
+    fixtures['fund_etf_universe'] = pd.DataFrame({
+        '代码': np.tile(codes, len(days)), '日期': np.repeat(days.strftime('%Y-%m-%d'), len(codes)),
+        '开盘': close.ravel(), '收盘': close.ravel(), '成交量': volume.ravel(),
+        '成交额': (volume * 100 * close).ravel(), '换手率': np.round(volume * 100 / shares * 100, 2).ravel(),
+    })
+    fixtures['fund_etf_spot_em'] = pd.DataFrame({
+        '代码': codes, '名称': [f'ETF{code}' for code in codes], '最新价': close[-1],
+        '成交量': volume[-1], '成交额': volume[-1] * 100 * close[-1],
+        '换手率': np.round(volume[-1] * 100 / shares[-1] * 100, 2), '最新份额': shares[-1],
+        '数据日期': days[-1].strftime('%Y-%m-%d'),
+    })
+    fixtures['fund_name_em'] = pd.DataFrame({
+        '基金代码': codes, '基金简称': [f'ETF{code}' for code in codes],
+        '基金类型': [ETF_FUND_TYPES[i % len(ETF_FUND_TYPES)] for i in range(len(codes))],
+    })
+    days = _bdays(2500)
+    for symbol in A_SHARE_INDICES:
+        close = _walk(f'index{symbol}', len(days), 3300, 0.01)
+        fixtures[f'stock_zh_index_daily_em_{symbol}'] = pd.DataFrame({
+            'date': days.strftime('%Y-%m-%d'), 'open': close, 'close': close, 'high': close * 1.01,
+            'low': close * 0.99, 'volume': _rng(f'indexvol{symbol}').uniform(3e10, 6e10, len(days)),
+            'amount': _rng(f'indexamt{symbol}').uniform(4e11, 1.2e12, len(days)),
+        })
+
+    for symbol, start in FUTURES.items():
+        days = _bdays(5000)
+        close = _walk(f'fut{symbol}', len(days), start, 0.015)
+        fixtures[f'futures_foreign_hist_{symbol}'] = pd.DataFrame({
+            'date': days.date, 'open': close, 'high': close * 1.01,
+            'low': close * 0.99, 'close': close,
+            'volume': _rng(f'futvol{symbol}').integers(1e4, 1e5, len(days)),
+        })
+
+    days = _bdays(5000)
+    fixtures['stock_index_pe_lg'] = pd.DataFrame({
+        '日期': days.date, '指数': _walk('sz50', len(days), 2600, 0.012),
+        '静态市盈率': _walk('pe_static', len(days), 11.0, 0.008),
+        '滚动市盈率': _walk('pe_ttm', len(days), 10.5, 0.008),
+    })
+
+    days = _bdays(300)
+    mid = _walk('usdcny', len(days), 7.1, 0.002) * 100
+    fixtures['sina_forex'] = pd.DataFrame({
+        '日期': days.date, '中行汇买价': mid - 1.5, '中行钞买价': mid - 6,
+        '中行钞卖价': mid + 1.5, '中行汇卖价': mid + 1.5, '央行中间价': mid,
+    })
+    return fixtures
+
+
+def write_fixtures(fixture_dir=FIXTURE_DIR):
+    """生成并写入固定数据集"""
+    os.makedirs(fixture_dir, exist_ok=True)
+    for name, frame in build_fixtures().items():
+        frame.to_parquet(os.path.join(fixture_dir, f'{_safe(name)}.parquet'))
+
+
+def _safe(name):
+    return ''.join(c if c.isalnum() or c in '-_' else '_' for c in name)
+
+
+def fixture_checksum(fixture_dir=FIXTURE_DIR):
+    """固定数据集的内容校验和，按数据内容计算而非文件字节（基线只在同一数据集上可比）"""
+    from build_manifest import fingerprint
+    frames = {
+        name: pd.read_parquet(os.path.join(fixture_dir, name))
+        for name in sorted(os.listdir(fixture_dir)) if name.endswith('.parquet')
+    }
+    return fingerprint(frames)[:16]
+
+
+class FixtureSources:
+    def __init__(self, fixture_dir=FIXTURE_DIR):
+        """
+        从固定数据集提供 yfinance / akshare / 新浪汇率数据
+        日期整体平移到当前日期附近（按整周平移，星期几不变），使按“今天”截取的窗口有数据
+        """
+        if not os.path.isdir(fixture_dir) or not any(n.endswith('.parquet') for n in os.listdir(fixture_dir)):
+            write_fixtures(fixture_dir)
+        self.fixture_dir = fixture_dir
+        self.checksum = fixture_checksum(fixture_dir)
+        weeks = (pd.Timestamp.now().normalize() - FIXTURE_END).days // 7
+        self.shift = pd.Timedelta(weeks=max(weeks, 0))
+        self._frames = {}
+
+    def frame(self, name):
+        if name not in self._frames:
+            frame = pd.read_parquet(os.path.join(self.fixture_dir, f'{_safe(name)}.parquet'))
+            self._frames[name] = self._shifted(frame)
+        return self._frames[name].copy()
+
+    def _shifted(self, frame):
+        if isinstance(frame.index, pd.DatetimeIndex):
+            frame.index = frame.index + self.shift
+        for col in ('日期', 'date', '信用交易日期', '数据日期'):
+            if col in frame.columns:
+                if col == '信用交易日期':
+                    dates = pd.to_datetime(frame[col], format='%Y%m%d') + self.shift
+                    frame[col] = dates.dt.strftime('%Y%m%d')
+                elif isinstance(frame[col].iloc[0], str):
+                    dates = pd.to_datetime(frame[col]) + self.shift
+                    frame[col] = dates.dt.strftime('%Y-%m-%d')
+                else:
+                    frame[col] = (pd.to_datetime(frame[col]) + self.shift).dt.date
+        return frame
+
+    # ---- yfinance ----
+    def yf_download(self, symbol, period, interval='1d', start=None):
+        from market_data import period_offset
+        frame = self.frame(f'yf_{symbol}')
+        if start is not None:
+            return frame[frame.index >= pd.Timestamp(start)]
+        if period not in (None, 'max'):
+            return frame[frame.index >= pd.Timestamp.now().normalize() - period_offset(period)]
+        return frame
+
+    def yf_download_batch(self, symbols, period, interval='1d', start=None):
+        return {symbol: self.yf_download(symbol, period, interval, start) for symbol in symbols}
+
+    # ---- akshare ----
+    def stock_margin_sse(self, start_date=None, end_date=None):
+        frame = self.frame('stock_margin_sse')
+        dates = frame['信用交易日期']
+        mask = pd.Series(True, index=frame.index)
+        if start_date:
+            mask &= dates >= start_date
+        if end_date:
+            mask &= dates <= end_date
+        return frame[mask].reset_index(drop=True)
+
+    def macro_china_shibor_all(self):
+        return self.frame('macro_china_shibor_all')
+
+    def bond_zh_us_rate(self, start_date=None):
+        frame = self.frame('bond_zh_us_rate')
+        if start_date:
+            frame = frame[pd.to_datetime(frame['日期']) >= pd.to_datetime(start_date)]
+        return frame.reset_index(drop=True)
+
+    def fund_etf_hist_em(self, symbol=None, start_date=None, **kwargs):
+        if os.path.exists(os.path.join(self.fixture_dir, f'{_safe(f"fund_etf_hist_em_{symbol}")}.parquet')):
+            frame = self.frame(f'fund_etf_hist_em_{symbol}')
+        else:
+            frame = self._etf_universe().get(symbol, pd.DataFrame(columns=['日期']))
+        if start_date:
+            frame = frame[pd.to_datetime(frame['日期']) >= pd.to_datetime(start_date)]
+        return frame.reset_index(drop=True)
+
+    def _etf_universe(self):
+        """全市场 ETF 日线按代码拆分（只拆一次）"""
+        if '_etf_groups' not in self._frames:
+            frame = self.frame('fund_etf_universe')
+            self._frames['_etf_groups'] = {code: group.drop(columns='代码') for code, group in frame.groupby('代码')}
+        return self._frames['_etf_groups']
+
+    def fund_etf_spot_em(self):
+        return self.frame('fund_etf_spot_em')
+
+    def fund_name_em(self):
+        return self.frame('fund_name_em')
+
+    def stock_zh_index_daily_em(self, symbol='sh000001', start_date=None, end_date=None):
+        frame = self.frame(f'stock_zh_index_daily_em_{symbol}')
+        dates = pd.to_datetime(frame['date'])
+        if start_date:
+            frame = frame[dates >= pd.to_datetime(start_date)]
+        return frame.reset_index(drop=True)
+
+    def futures_foreign_hist(self, symbol=None):
+        return self.frame(f'futures_foreign_hist_{symbol}')
+
+    def stock_index_pe_lg(self, symbol=None):
+        return self.frame('stock_index_pe_lg')
+
+    # ---- 新浪汇率 ----
+    def fix_currency_boc_sina(self, symbol='美元', start_date=None, end_date=None):
+        frame = self.frame('sina_forex')
+        dates = pd.to_datetime(frame['日期'])
+        if start_date:
+            frame = frame[dates >= pd.to_datetime(start_date)]
+        return frame.reset_index(drop=True)
+
+    def install(self, gi):
+        """把数据源替换到 generate_image 模块上"""
+        gi.MARKET_DATA._download = self.yf_download
+        gi.MARKET_DATA._download_batch = self.yf_download_batch
+        gi.ak = _AkshareFixtures(self)
+        gi.fix_currency_boc_sina = self.fix_currency_boc_sina
+
+
+class _AkshareFixtures:
+    """只暴露 generate_image 用到的 akshare 接口（函数名需与缓存配置一致）"""
+    def __init__(self, sources):
+        for name in ('stock_margin_sse', 'macro_china_shibor_all', 'bond_zh_us_rate',
+                     'fund_etf_hist_em', 'futures_foreign_hist', 'stock_index_pe_lg',
+                     'fund_etf_spot_em', 'fund_name_em', 'stock_zh_index_daily_em'):
+            setattr(self, name, getattr(sources, name))
@@ -1,20 +1,44 @@
 # -*- coding: utf-8 -*-
-import mplfinance as mpf
-import yfinance as yf
-import matplotlib.pyplot as plt
 import pandas as pd
-import akshare as ak
 from datetime import datetime, timedelta
 import warnings
 import os
 import sys
-import requests
 from io import StringIO
-from tqdm import tqdm
-from bs4 import BeautifulSoup
 import numpy as np
 import time
 import json
+import copy
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+from market_data import MarketDataStore, _yf_download, _yf_download_batch, period_days
+from disk_cache import DiskCache, CACHE_DIR
+from scheduler import TaskScheduler, emit, carry_context, map_captured
+from plot_style import resolve_fonts
+from chart_farm import ChartFarm, ChartSpec
+from chart_output import OutputFormat
+from indicators import IndicatorEngine
+from build_manifest import BuildManifest, log_fingerprint, fingerprint
+from tracing import TRACER, install_requests_hook, row_count
+from data_source import DataSource
+from lazy_import import LazyModule
+from event_log import EventLog, LogSummary
+from signal_history import SignalHistory, DEFAULT_PATH as SIGNAL_HISTORY_PATH
+from rolling_corr import RollingCorrelation
+from prerender import prerender_reports
+from resilient_fetch import ResilientFetcher, FetchPolicy, FetchError
+from backtest import inputs_from_sources, run_backtest, regime_table, PERIODS_PER_YEAR
+from trading_calendar import align, get_calendar
+from service import SignalService, RefreshJob, TTLCache
+from intraday import IntradayState
+from etf_panel import EtfPanel, ETF_TYPES, quote_rows, history_rows, classify
+
+# akshare 导入较慢（约0.5秒），首次调用接口时才导入；
+# 导入后给 requests 安装追踪钩子，统计下载字节并按 span 导出到 执行追踪.json
+ak = LazyModule('akshare', on_import=install_requests_hook)
 
 warnings.filterwarnings('ignore')
 
@@ -22,44 +46,198 @@ warnings.filterwarnings('ignore')
 OUTPUT_DIR = "output"
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-# 执行日志
-EXECUTION_LOG = {
-    'start_time': None,
-    'end_time': None,
-    'tasks': [],
-    'errors': [],
-    'warnings': [],
-    'charts': [],
-    'insights': [],
-    'market_signals': {}
-}
+# 诊断文件（追踪、事件日志、回测明细）不是站点内容，放在已被 gitignore 的缓存目录下，不随 output/ 同步提交
+LOG_DIR = os.path.join(CACHE_DIR, 'logs')
+
+# 增量构建清单：输入未变化的图表与报告不再重新生成（FORCE_REBUILD=1 强制全部重建）
+BUILD_MANIFEST = BuildManifest(OUTPUT_DIR, force=os.environ.get('FORCE_REBUILD') == '1')
+
+# 执行日志：事件逐条追加到 执行日志.jsonl（线程与子进程安全，崩溃不丢失，每次运行以运行 ID 区分、按天轮转），
+# EXECUTION_LOG 只保留精简汇总，运行结束时写出 执行报告.json
+EVENT_LOG = EventLog(os.path.join(LOG_DIR, '执行日志.jsonl'))
+EXECUTION_LOG = LogSummary()
+
+def apply_log_event(event):
+    """把一条日志事件计入执行日志汇总"""
+    EXECUTION_LOG.apply(*event)
+
+def record_event(event):
+    """事件立即追加到事件日志；汇总在调度任务中先缓存事件（按声明顺序回放），否则直接计入"""
+    EVENT_LOG.write(*event)
+    if not emit(event):
+        apply_log_event(event)
 
 def log_execution(task, status='success', details='', chart_path=None):
     """记录执行日志"""
-    EXECUTION_LOG['tasks'].append({
+    record_event(('task', {
         'task': task,
         'status': status,
         'details': details,
-        'chart_path': chart_path,
-        'timestamp': datetime.now().isoformat()
-    })
-    if status == 'error':
-        EXECUTION_LOG['errors'].append(details)
-    elif status == 'warning':
-        EXECUTION_LOG['warnings'].append(details)
-
-def save_execution_report():
-    """保存执行报告"""
-    report_path = os.path.join(OUTPUT_DIR, '执行报告.json')
+        'chart_path': chart_path
+    }))  # 时间戳由事件日志记录
+
+def log_insight(category, message):
+    """记录市场洞察"""
+    record_event(('insight', (category, message)))
+
+def log_signal(key, value):
+    """记录市场信号"""
+    record_event(('signal', (key, value)))
+
+# 数据源模式：DATA_SOURCE=live（默认）/record（录制到 DATA_ARCHIVE）/replay（只读归档，不访问网络）
+DATA_SOURCE = DataSource.from_env(logger=log_execution)
+
+# 数据源时间预算：单次超时 / 总期限 / 重试次数，连续失败的数据源熔断 5 分钟；
+# 上游卡住时返回旧缓存或空数据，不再拖住整个任务。
+# bond_zh_us_rate 历来最慢（约11秒），美债收益率超过 hedge_after 秒未返回时由 yfinance ^TNX 对冲
+FETCH_POLICIES = {
+    'bond_zh_us_rate': FetchPolicy(timeout=30, deadline=60, hedge_after=8),
+    'fund_etf_hist_em': FetchPolicy(timeout=20, deadline=45),
+    'etf_backfill': FetchPolicy(timeout=20, deadline=45, attempts=2),
+    'sina_money_codes': FetchPolicy(timeout=15, deadline=30, attempts=2),
+    'sina_forex_page': FetchPolicy(timeout=15, deadline=30, attempts=2),
+    'yf_download_batch': FetchPolicy(timeout=60, deadline=90, attempts=2),
+}
+def carry_fetch_context(func):
+    """把任务上下文（日志事件、输出缓冲）与当前追踪 span 带入数据获取的工作线程"""
+    return carry_context(TRACER.carry(func))
+
+FETCHER = ResilientFetcher(FETCH_POLICIES, default=FetchPolicy(timeout=30, deadline=60),
+                           logger=log_execution, context=carry_fetch_context)
+
+# 本地列式缓存：跨运行保存历史数据，每次只追加新增日期（录制与回放时绕过）
+DISK_CACHE = DiskCache(logger=log_execution)
+
+# 进程内行情数据仓库：同一标的每次运行只下载一次
+MARKET_DATA = MarketDataStore(
+    downloader=FETCHER.wrap('yf_download', DATA_SOURCE.wrap(_yf_download)),
+    batch_downloader=FETCHER.wrap('yf_download_batch', DATA_SOURCE.wrap(_yf_download_batch)),
+    disk_cache=DISK_CACHE if DATA_SOURCE.live else None,
+    clock=DATA_SOURCE.now,
+)
+
+# 指标与信号历史库：跨运行累积，分位数按多年历史计算（录制与回放时只在内存中累积）
+SIGNAL_HISTORY = SignalHistory(SIGNAL_HISTORY_PATH if DATA_SOURCE.live else None, logger=log_execution)
+
+def signal_date():
+    """信号记录日期（回放时为录制日期）"""
+    return DATA_SOURCE.now().normalize()
+
+def history_percentile(name, lookback=None, fallback=float('nan')):
+    """历史库中最新值的分位数，样本不足时返回 fallback"""
+    value, _ = SIGNAL_HISTORY.percentile(name, lookback=lookback)
+    return fallback if np.isnan(value) else value
+
+# 任务1 K线图: (代码, 文件名[, period])
+KLINE_INDICES = [
+    ("^TNX", "tenbond.png"), ("^VIX", "vix.png", "2mo"),
+    ("^GSPC", "sp500.png"), ("^IXIC", "nasdaq.png"),
+    ("^RUT", "rs2000.png"), ("VNQ", "vnq.png"),
+    ("^N225", "nikkei225.png"), ("^HSI", "hsi.png"),
+    ("CNY=X", "rmb.png")
+]
+
+# akshare 日期窗口与恒指/罗素对比的回看天数（命令行 --lookback 可改）
+LOOKBACK_DAYS = 300
+
+# 市场解读所需的 yfinance 窗口
+ANALYSIS_SYMBOLS = [
+    ('^IXIC', '3mo'), ('^GSPC', '3mo'), ('^RUT', '3mo'),
+    ('^VIX', '3mo'), ('^TNX', '3mo'),
+    ('^HSI', '3mo'), ('CNY=X', '3mo'),
+]
+# 写入信号历史库的 yfinance 窗口，分位数按多年历史计算
+HISTORY_SYMBOLS = [('^VIX', '5y'), ('^TNX', '5y')]
+
+# 相关性监控跟踪的 yfinance 序列（近1年）: (代码, 名称)
+CORRELATION_PERIOD = '1y'
+CORRELATION_SYMBOLS = [
+    ('^GSPC', '标普500'), ('^IXIC', '纳指'), ('^RUT', '罗素2000'), ('^HSI', '恒生指数'),
+    ('^N225', '日经225'), ('^VIX', 'VIX'), ('^TNX', '美债10Y'), ('CNY=X', '美元兑人民币'),
+    ('VNQ', '美国REITs'),
+]
+# 相关性监控跟踪的全部序列（固定列表：某个数据源本次获取失败时该列为 NaN，保存的状态仍然可用）
+CORRELATION_NAMES = tuple(sorted([name for _, name in CORRELATION_SYMBOLS] + [
+    '融资余额', '中美利差', 'Shibor 1M', '300ETF', '500ETF', '1000ETF', '股债利差']))
+# 按差值而非收益率计算日变化的序列（利率、利差类）
+CORRELATION_DIFF = ('美债10Y', 'Shibor 1M', '中美利差', '股债利差')
+CORRELATION_WINDOWS = (20, 60, 120)
+# 每个序列只取最近约1年的记录（Shibor、中美利差等自带十几年历史，全量对齐浪费内存）
+CORRELATION_TAIL = 260
+
+def market_data_windows(tasks=None):
+    """
+    任务读取的 yfinance 窗口 [(代码, period)]
+    :param tasks: 本次运行的任务名集合，None 为全部任务
+    """
+    def wanted(name):
+        return tasks is None or name in tasks
+    windows = [(item[0], item[2] if len(item) > 2 else "1mo")
+               for item in KLINE_INDICES if wanted(f'K线:{item[0]}')]
+    if wanted('指标计算'):
+        windows += ANALYSIS_SYMBOLS
+    if wanted('恒指罗素数据'):
+        windows += [('^HSI', lookback_period()), ('^RUT', lookback_period())]
+    if wanted('风险环境分析'):
+        windows += HISTORY_SYMBOLS
+    if wanted('相关性监控'):
+        windows += [(ticker, CORRELATION_PERIOD) for ticker, _ in CORRELATION_SYMBOLS]
+    return windows
+
+def register_market_data(tasks=None):
+    """登记本次运行需要的 yfinance 窗口（只跑部分任务时只登记这些任务读取的标的）"""
+    for ticker, period in market_data_windows(tasks):
+        MARKET_DATA.require(ticker, period)
+
+def prefetch_market_data():
+    """一次分组下载全部已登记的 yfinance 标的"""
+    start_time = time.time()
+    try:
+        with TRACER.span('yfinance_batch', 'fetch') as span:
+            fetched, missing = MARKET_DATA.prefetch()
+            span.set(symbols=len(fetched), missing=len(missing))
+        print(f"✅ 批量行情: {len(fetched)} 个标的 耗时 {time.time()-start_time:.2f}s")
+        log_execution('批量行情', 'success', f'{len(fetched)} 个标的')
+        if missing:
+            log_execution('批量行情', 'warning', f'批量下载缺失: {", ".join(missing)}')
+    except Exception as e:
+        print(f"⚠️  批量行情下载失败，改为逐个下载: {e}")
+        log_execution('批量行情', 'warning', str(e))
+
+def save_execution_report(group=None):
+    """
+    保存执行报告，并把 Chrome trace 导出到 LOG_DIR（chrome://tracing 或 ui.perfetto.dev 打开）
+    :param group: 常驻服务的刷新分组名，写到 执行报告-<分组>.json，不覆盖合并后的整体报告
+    """
+    suffix = f'-{group}' if group else ''
+    report_path = os.path.join(OUTPUT_DIR, f'执行报告{suffix}.json')
+    EXECUTION_LOG['trace_summary'] = TRACER.summary(top=20)
     with open(report_path, 'w', encoding='utf-8') as f:
-        json.dump(EXECUTION_LOG, f, ensure_ascii=False, indent=2)
+        json.dump(EXECUTION_LOG, f, ensure_ascii=False, separators=(',', ':'))
     print(f"\n📋 执行报告已保存: {report_path}")
+    os.makedirs(LOG_DIR, exist_ok=True)
+    trace_path = TRACER.export(os.path.join(LOG_DIR, f'执行追踪{suffix}.json'))
+    print(f"🧭 追踪文件已保存: {trace_path}")
+
+def prerender_html_reports():
+    """把 Markdown 报告预渲染为 HTML 片段与索引（output/html/），页面加载时无需 marked / mermaid"""
+    try:
+        prerender_reports(os.path.dirname(os.path.abspath(OUTPUT_DIR)), OUTPUT_DIR, logger=log_execution)
+    except Exception as e:
+        print(f"❌ HTML预渲染失败: {e}")
+        log_execution('HTML预渲染', 'error', str(e))
 
 def generate_markdown_report():
     """生成Markdown格式的综合报告"""
     print("\n" + "📝 生成Markdown报告".center(70, "="))
     
-    report_path = os.path.join(OUTPUT_DIR, '市场分析报告.md')
+    report_name = '市场分析报告.md'
+    report_path = os.path.join(OUTPUT_DIR, report_name)
+    digest = log_fingerprint(EXECUTION_LOG, CHART_FORMAT.fmt)
+    if BUILD_MANIFEST.fresh(report_name, digest):
+        print(f"⏭️  报告输入未变化，保留: {report_path}")
+        log_execution('Markdown报告', 'success', f'输入未变化: {report_path}', report_name)
+        return
     
     with open(report_path, 'w', encoding='utf-8') as f:
         f.write(f"""# 📊 每日市场分析报告
@@ -73,11 +251,11 @@ def generate_markdown_report():
 
 ## 🎯 执行摘要
 
-- **总任务数**: {len(EXECUTION_LOG['tasks'])}
-- **成功任务**: {len([t for t in EXECUTION_LOG['tasks'] if t['status'] == 'success'])}
-- **警告数量**: {len(EXECUTION_LOG['warnings'])}
-- **错误数量**: {len(EXECUTION_LOG['errors'])}
-- **生成图表**: {len([t for t in EXECUTION_LOG['tasks'] if t['chart_path']])} 张
+- **总任务数**: {EXECUTION_LOG.task_total}
+- **成功任务**: {EXECUTION_LOG['task_counts'].get('success', 0)}
+- **警告数量**: {EXECUTION_LOG['task_counts'].get('warning', 0)}
+- **错误数量**: {EXECUTION_LOG['task_counts'].get('error', 0)}
+- **生成图表**: {len(EXECUTION_LOG['charts'])} 张
 - **总耗时**: {EXECUTION_LOG.get('total_time', 'N/A')}
 
 ---
@@ -125,6 +303,7 @@ def generate_markdown_report():
         for section_title, charts in chart_sections:
             f.write(f"\n{section_title}\n")
             for chart_file, title in charts:
+                chart_file = CHART_FORMAT.resolve(chart_file)
                 if os.path.exists(os.path.join(OUTPUT_DIR, chart_file)):
                     f.write(f"""
 #### {title}
@@ -168,97 +347,133 @@ def generate_markdown_report():
 *免责声明: 报告仅供参考，不构成投资建议。*
 """.format(datetime.now().strftime('%Y-%m-%d %H:%M')))
 
+    BUILD_MANIFEST.record(report_name, digest)
     print(f"✅ Markdown报告已生成: {report_path}")
-    log_execution('Markdown报告', 'success', f'报告路径: {report_path}', '市场分析报告.md')
+    log_execution('Markdown报告', 'success', f'报告路径: {report_path}', report_name)
 
 def check_available_fonts():
-    """检查系统可用字体"""
-    import matplotlib.font_manager as fm
-    fonts = fm.findSystemFonts()
-    chinese_fonts = [f for f in fonts if 'wqy' in f.lower() or 'noto' in f.lower() or 'cjk' in f.lower()]
+    """检查系统可用字体（解析结果按字体目录修改时间缓存，目录未变化时不扫描磁盘）"""
+    fonts = resolve_fonts()
+    if fonts['font']:
+        print(f"✅ 使用字体: {fonts['font']}")
+        log_execution('字体设置', 'success', f"使用字体: {fonts['font']}")
+    else:
+        print("⚠️  未找到中文字体，使用默认字体")
+        log_execution('字体设置', 'warning', '未找到中文字体')
+    chinese_fonts = fonts['cjk_files']
     print(f"系统找到 {len(chinese_fonts)} 个中文字体:")
     for f in chinese_fonts[:3]:
         print(f"  - {os.path.basename(f)}")
     log_execution('字体检查', 'success', f'找到 {len(chinese_fonts)} 个中文字体')
     return len(chinese_fonts) > 0
 
-def setup_matplotlib_fonts():
-    """设置matplotlib字体（服务器环境优化）"""
-    font_candidates = [
-        'WenQuanYi Micro Hei', 'WenQuanYi Zen Hei', 
-        'Noto Sans CJK SC', 'Noto Sans SC', 'DejaVu Sans',
-    ]
-    
-    available_font = None
-    for font in font_candidates:
-        try:
-            fig = plt.figure(figsize=(1, 1))
-            plt.text(0.5, 0.5, '测试', fontfamily=font)
-            plt.close(fig)
-            available_font = font
-            print(f"✅ 使用字体: {font}")
-            log_execution('字体设置', 'success', f'使用字体: {font}')
-            break
-        except:
-            continue
-    
-    if not available_font:
-        print("⚠️  未找到中文字体，使用默认字体")
-        available_font = 'sans-serif'
-        log_execution('字体设置', 'warning', '未找到中文字体')
-    
-    plt.rcParams.update({
-        'figure.figsize': (12, 8), 'figure.dpi': 100, 'savefig.dpi': 150,
-        'figure.facecolor': 'black', 'axes.facecolor': 'black', 
-        'savefig.facecolor': 'black', 'savefig.transparent': False,
-        'axes.labelcolor': 'white', 'xtick.color': 'white', 'ytick.color': 'white',
-        'text.color': 'white', 'axes.titlecolor': 'white', 'legend.labelcolor': 'white',
-        'font.family': 'sans-serif', 'font.sans-serif': [available_font],
-        'font.size': 9, 'axes.titlesize': 13, 'legend.fontsize': 8,
-        'xtick.labelsize': 8, 'ytick.labelsize': 8,
-        'lines.linewidth': 1.5, 'lines.markersize': 4,
-        'axes.prop_cycle': plt.cycler(color=['#3498db', '#e74c3c', '#2ecc71', '#f1c40f', '#9b59b6']),
-        'axes.grid': True, 'grid.color': '#666666', 'grid.alpha': 0.5, 'grid.linestyle': '--',
-        'axes.spines.top': False, 'axes.spines.right': False,
-        'axes.spines.left': True, 'axes.spines.bottom': True,
-        'xtick.direction': 'in', 'ytick.direction': 'in',
-        'legend.frameon': True, 'legend.facecolor': '#333333',
-        'legend.edgecolor': 'white', 'legend.framealpha': 0.8,
-        'figure.subplot.left': 0.06, 'figure.subplot.right': 0.96,
-        'figure.subplot.top': 0.94, 'figure.subplot.bottom': 0.08,
-        'figure.subplot.wspace': 0.1, 'figure.subplot.hspace': 0.1,
-        'axes.unicode_minus': False, 'figure.constrained_layout.use': False,
-    })
-
-setup_matplotlib_fonts()
-check_available_fonts()
+# 图表输出格式：CHART_FORMAT=png/svg/webp，CHART_COMPRESS=1 额外输出 .svgz
+CHART_FORMAT = OutputFormat.from_env()
 
-def fix_currency_boc_sina(symbol: str = "美元", start_date: str = "20230304", end_date: str = "20231110") -> pd.DataFrame:
-    """修复版新浪财经-中行人民币牌价数据"""
-    url = "http://biz.finance.sina.com.cn/forex/forex.php"
-    headers = {'User-Agent': 'Mozilla/5.0'}
+# 图表渲染进程池：每个进程只初始化一次 matplotlib 与字体
+CHART_FARM = ChartFarm(OUTPUT_DIR, output_format=CHART_FORMAT, manifest=BUILD_MANIFEST)
+RENDER_TIMEOUT = 120
+
+def render_chart_spec(spec):
+    """交给渲染进程池绘制（输入未变化时沿用已有文件），返回是否成功"""
+    with TRACER.span(spec.output, 'render', kind=spec.kind) as span:
+        result = CHART_FARM.render(spec, timeout=RENDER_TIMEOUT)
+        span.set(output=result.output, status=result.status,
+                 worker_ms=round(result.elapsed * 1000, 1), worker_cpu_ms=round(result.cpu * 1000, 1))
+    if result.status == 'unchanged':
+        print(f"⏭️  输入未变化，沿用: {result.output}")
+    elif result.status != 'success':
+        print(f"❌ 绘图失败 {spec.output}: {result.error}")
+        log_execution('绘图', 'error', f'{spec.title or spec.output}: {result.error}')
+        return False
+    return True
+
+SINA_FOREX_URL = "http://biz.finance.sina.com.cn/forex/forex.php"
+SINA_PAGE_WORKERS = 6
+
+_SINA_SESSION = None
+_SINA_LOCK = threading.Lock()
+_MONEY_CODES = {}
+
+def get_sina_session():
+    """新浪财经会话：连接复用（keep-alive）+ 失败重试退避"""
+    global _SINA_SESSION
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    install_requests_hook()
+    with _SINA_LOCK:
+        if _SINA_SESSION is None:
+            retry = Retry(
+                total=3, backoff_factor=0.5,
+                status_forcelist=(429, 500, 502, 503, 504), allowed_methods=('GET',)
+            )
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=SINA_PAGE_WORKERS, max_retries=retry)
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers.update({'User-Agent': 'Mozilla/5.0'})
+            _SINA_SESSION = session
+        return _SINA_SESSION
+
+def _sina_get(session, params, encoding=None):
+    """请求新浪外汇页面，返回文本"""
+    r = session.get(SINA_FOREX_URL, params=params, timeout=10)
+    if encoding:
+        r.encoding = encoding
+    return r.text
+
+def sina_get(session, name, params, encoding=None):
+    """请求新浪页面，返回原始 HTML（经数据源层录制/回放，录制键取请求参数）"""
+    return FETCHER.call(name, DATA_SOURCE.call, name, lambda **kw: _sina_get(session, kw, encoding), **params)
+
+def get_sina_money_codes(session, start_date, end_date):
+    """货币名称 -> 新浪货币代码，进程内缓存并落盘，后续调用不再请求"""
+    from bs4 import BeautifulSoup
+    with _SINA_LOCK:
+        if _MONEY_CODES:
+            return _MONEY_CODES
     
-    try:
+    cache_path = os.path.join(DISK_CACHE.cache_dir, 'sina_money_codes.json')
+    if DATA_SOURCE.live and os.path.exists(cache_path):
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            codes = json.load(f)
+    else:
         params = {
             "startdate": "-".join([start_date[:4], start_date[4:6], start_date[6:]]),
             "enddate": "-".join([end_date[:4], end_date[4:6], end_date[6:]]),
             "money_code": "EUR", "type": "0",
         }
-        r = requests.get(url, params=params, headers=headers, timeout=10)
-        r.encoding = "gbk"
-        soup = BeautifulSoup(r.text, "lxml")
+        soup = BeautifulSoup(sina_get(session, 'sina_money_codes', params, encoding="gbk"), "lxml")
         
         money_code_element = soup.find(attrs={"id": "money_code"})
         if money_code_element is None:
-            log_execution('汇率数据', 'warning', '无法获取货币代码映射')
-            return pd.DataFrame()
+            return {}
         
-        data_dict = dict(
+        codes = dict(
             zip(
                 [item.text for item in money_code_element.find_all("option")],
                 [item["value"] for item in money_code_element.find_all("option")]
             )
         )
+        if codes and os.path.isdir(DISK_CACHE.cache_dir):
+            with open(cache_path, 'w', encoding='utf-8') as f:
+                json.dump(codes, f, ensure_ascii=False)
+    
+    with _SINA_LOCK:
+        _MONEY_CODES.update(codes)
+    return codes
+
+def fix_currency_boc_sina(symbol: str = "美元", start_date: str = "20230304", end_date: str = "20231110") -> pd.DataFrame:
+    """修复版新浪财经-中行人民币牌价数据（分页并发获取）"""
+    from bs4 import BeautifulSoup
+    from tqdm import tqdm
+    try:
+        session = get_sina_session()
+        data_dict = get_sina_money_codes(session, start_date, end_date)
+        if not data_dict:
+            log_execution('汇率数据', 'warning', '无法获取货币代码映射')
+            return pd.DataFrame()
         
         if symbol not in data_dict:
             log_execution('汇率数据', 'warning', f'不支持的货币: {symbol}')
@@ -272,17 +487,28 @@ def fix_currency_boc_sina(symbol: str = "美元", start_date: str = "20230304",
             "page": "1", "call_type": "ajax",
         }
         
-        big_df = pd.DataFrame()
-        r = requests.get(url, params=params, headers=headers, timeout=10)
-        soup = BeautifulSoup(r.text, "lxml")
+        def fetch_page(page):
+            with TRACER.span('sina_forex_page', 'fetch', page=page):
+                return sina_get(session, 'sina_forex_page', {**params, "page": page})
+        
+        # 第一页同时给出页数与第一页数据
+        first_page = fetch_page(1)
+        soup = BeautifulSoup(first_page, "lxml")
         page_element_list = soup.find_all("a", attrs={"class": "page"})
         page_num = int(page_element_list[-2].text) if len(page_element_list) != 0 else 1
         
-        for page in tqdm(range(1, page_num + 1), leave=False, desc=f"获取{symbol}数据"):
-            params.update({"page": page})
-            r = requests.get(url, params=params, headers=headers, timeout=10)
-            temp_df = pd.read_html(StringIO(r.text), header=0)[0]
-            big_df = pd.concat([big_df, temp_df], ignore_index=True)
+        pages = [first_page]
+        if page_num > 1:
+            with ThreadPoolExecutor(max_workers=min(SINA_PAGE_WORKERS, page_num - 1)) as pool:
+                pages += list(tqdm(
+                    pool.map(fetch_page, range(2, page_num + 1)),
+                    total=page_num - 1, leave=False, desc=f"获取{symbol}数据"
+                ))
+        
+        big_df = pd.concat(
+            [pd.read_html(StringIO(text), header=0)[0] for text in pages],
+            ignore_index=True
+        )
         
         if len(big_df.columns) == 6:
             big_df.columns = ["日期", "中行汇买价", "中行钞买价", "中行钞卖价", "中行汇卖价", "央行中间价"]
@@ -303,16 +529,73 @@ def fix_currency_boc_sina(symbol: str = "美元", start_date: str = "20230304",
         log_execution('汇率数据', 'error', str(e))
         return pd.DataFrame()
 
+# akshare 数据源的本地缓存选项：日期列、增量起始参数、不参与缓存键的参数
+AK_CACHE_OPTIONS = {
+    'stock_margin_sse': {'date_col': '信用交易日期', 'date_format': '%Y%m%d',
+                         'start_arg': 'start_date', 'exclude': ('end_date',)},
+    'bond_zh_us_rate': {'date_col': '日期', 'start_arg': 'start_date'},
+    'fund_etf_hist_em': {'date_col': '日期', 'start_arg': 'start_date', 'exclude': ('end_date',)},
+    'macro_china_shibor_all': {'date_col': '日期', 'max_age': 6 * 3600},
+    'futures_foreign_hist': {'date_col': 'date', 'max_age': 6 * 3600},
+    'stock_index_pe_lg': {'date_col': '日期', 'max_age': 6 * 3600},
+}
+
+# 常驻服务中 akshare 数据在内存中的有效期（秒），各数据源按自己的更新频率重新获取
+SOURCE_TTL = {
+    'stock_margin_sse': 4 * 3600,        # 融资余额每个交易日晚间更新一次
+    'macro_china_shibor_all': 4 * 3600,
+    'bond_zh_us_rate': 3600,
+    'fund_etf_hist_em': 900,
+    'futures_foreign_hist': 900,
+    'stock_index_pe_lg': 4 * 3600,
+    'fund_etf_spot_em': 900,
+    'fund_name_em': 24 * 3600,           # 基金分类很少变化
+    'stock_zh_index_daily_em': 900,
+}
+SOURCE_TTL_DEFAULT = 3600
+# 常驻服务时为 TTLCache，单次运行为 None（不在内存中保留）
+WARM_DATA = None
+
 def safe_get_data(func, *args, **kwargs):
-    """安全获取数据"""
-    try:
-        data = func(*args, **kwargs)
-        if data is None or (hasattr(data, 'empty') and data.empty):
-            return pd.DataFrame()
+    """
+    安全获取数据：按数据源的时间预算超时重试、连续失败熔断
+    （已登记缓存选项的数据源走本地增量缓存，超时或熔断时退回旧缓存；
+    常驻服务中结果在内存中保留 SOURCE_TTL 秒，调用方拿到的是副本）
+    """
+    if WARM_DATA is None:
+        return fetch_source(func, *args, **kwargs)
+    key = (func.__name__, repr(args), repr(sorted(kwargs.items())))
+    data = WARM_DATA.get(key, SOURCE_TTL.get(func.__name__, SOURCE_TTL_DEFAULT),
+                         lambda: fetch_source(func, *args, **kwargs), valid=lambda d: not d.empty)
+    return data.copy()
+
+def fetch_source(func, *args, **kwargs):
+    """访问一次数据源（safe_get_data 的实际获取部分）"""
+    options = AK_CACHE_OPTIONS.get(func.__name__)
+    cached = bool(options) and not args and DATA_SOURCE.live
+
+    def fetch():
+        with TRACER.span(func.__name__, 'fetch', params=kwargs) as span:
+            if cached:
+                data = DISK_CACHE.fetch(func, **options, **kwargs)
+            else:
+                data = DATA_SOURCE.call(func.__name__, func, *args, **kwargs)
+            span.set(rows=row_count(data))
         return data
+
+    try:
+        data = FETCHER.call(func.__name__, fetch)
     except Exception as e:
-        log_execution('数据获取', 'warning', f'{func.__name__}: {str(e)[:100]}')
+        data = DISK_CACHE.stale(func, **options, **kwargs) if cached and isinstance(e, FetchError) else None
+        status = '使用旧缓存' if data is not None and not data.empty else ''
+        log_execution('数据获取', 'warning', f'{func.__name__}: {str(e)[:100]} {status}'.strip())
+    if data is None or (hasattr(data, 'empty') and data.empty):
         return pd.DataFrame()
+    if options and DATA_SOURCE.as_of is not None and options['date_col'] in data.columns:
+        # 按历史日期运行：丢弃该日之后的记录
+        dates = pd.to_datetime(data[options['date_col']], format=options.get('date_format'), errors='coerce')
+        data = data[dates < pd.Timestamp(DATA_SOURCE.as_of).normalize() + pd.Timedelta(days=1)]
+    return data
 
 def validate_data(data, min_points=10):
     """验证数据有效性"""
@@ -326,27 +609,16 @@ def validate_data(data, min_points=10):
         return False
     return True
 
-def generate_and_save_plot(ticker, filename, period="1mo"):
-    """生成K线图"""
+def generate_and_save_plot(ticker, filename, period="1mo", data=None):
+    """生成K线图（data 为空时从行情仓库读取）"""
     try:
-        data = yf.Ticker(ticker).history(period=period)
+        if data is None:
+            data = MARKET_DATA.get(ticker, period)
         if validate_data(data, 5):
-            filepath = os.path.join(OUTPUT_DIR, filename)
-            style = mpf.make_mpf_style(
-                base_mpf_style='charles',
-                marketcolors=mpf.make_marketcolors(up='#e74c3c', down='#2ecc71', edge='inherit'),
-                facecolor='black', edgecolor='white', figcolor='black',
-                gridcolor='#666666', gridstyle='--', rc={'font.size': 8}
-            )
-            
-            mpf.plot(
-                data, type='candle', figscale=0.35, volume=False,
-                savefig=filepath, datetime_format='%m-%d', style=style,
-                title=ticker, tight_layout=True,
-                warn_too_much_data=1000
-            )
+            if not render_chart_spec(ChartSpec('kline', filename, title=ticker, data=data)):
+                return
             print(f"✅ K线图: {filename}")
-            log_execution('K线图', 'success', f'{ticker} -> {filename}', chart_path=filename)
+            log_execution('K线图', 'success', f'{ticker} -> {filename}', chart_path=CHART_FORMAT.resolve(filename))
         else:
             print(f"❌ 数据不足: {ticker}")
             log_execution('K线图', 'warning', f'{ticker} 数据不足')
@@ -355,7 +627,13 @@ def generate_and_save_plot(ticker, filename, period="1mo"):
         log_execution('K线图', 'error', f'{ticker}: {str(e)}')
 
 def get_data(symbol, start_date, end_date):
-    """获取数据"""
+    """获取数据（parse span 内嵌套 fetch span，自身耗时即解析耗时）"""
+    with TRACER.span(symbol, 'parse') as span:
+        data = _get_data(symbol, start_date, end_date)
+        span.set(rows=row_count(data))
+    return data
+
+def _get_data(symbol, start_date, end_date):
     try:
         if symbol == '美元':
             data = fix_currency_boc_sina(symbol=symbol, start_date=start_date, end_date=end_date)
@@ -365,9 +643,9 @@ def get_data(symbol, start_date, end_date):
         elif symbol == '融资余额':
             data = safe_get_data(ak.stock_margin_sse, start_date=start_date, end_date=end_date)
             if not data.empty and len(data.columns) >= 2:
-                data = data.iloc[:, [0, 1]].iloc[::-1]
+                data = data.iloc[:, [0, 1]]
                 data['信用交易日期'] = pd.to_datetime(data['信用交易日期'], errors='coerce', format='%Y%m%d')
-                return data.dropna().set_index('信用交易日期')
+                return data.dropna().sort_values('信用交易日期').set_index('信用交易日期')
         
         elif symbol == 'Shibor 1M':
             data = safe_get_data(ak.macro_china_shibor_all)
@@ -387,7 +665,8 @@ def get_data(symbol, start_date, end_date):
         
         elif symbol.startswith('ETF_'):
             etf_code = symbol.split('_')[1]
-            data = safe_get_data(ak.fund_etf_hist_em, symbol=etf_code)
+            window = {'start_date': start_date} if start_date else {}
+            data = safe_get_data(ak.fund_etf_hist_em, symbol=etf_code, **window)
             if not data.empty and '日期' in data.columns and '收盘' in data.columns:
                 data = data.iloc[-220:] if len(data) > 220 else data
                 data['日期'] = pd.to_datetime(data['日期'], errors='coerce')
@@ -419,51 +698,41 @@ def normalize(data):
         pass
     return pd.Series(dtype=float)
 
-def calculate_trend(series, period=10):
-    """计算趋势方向"""
-    if not validate_data(series, period * 2):
-        return 'unknown'
-    recent = series.iloc[-period:].mean()
-    previous = series.iloc[-period*2:-period].mean()
-    return 'up' if recent > previous else 'down'
+def build_market_indicators():
+    """对齐解读所需的 yfinance 收盘价（3个月窗口），一次性计算全部指标"""
+    with TRACER.span('indicators', 'compute') as span:
+        ind = IndicatorEngine({
+            symbol: MARKET_DATA.close(symbol, period)
+            for symbol, period in ANALYSIS_SYMBOLS
+        })
+        span.set(rows=len(ind.prices), columns=len(ind.columns))
+    return ind
 
-def analyze_index_divergence():
+def analyze_index_divergence(ind=None):
     """分析指数差异（纳指、标普、罗素2000）"""
     print("\n" + "="*70)
     print("【市场结构解读】")
     print("="*70)
     
     try:
-        nasdaq = yf.download('^IXIC', period='3mo', interval='1d', progress=False)['Close']
-        sp500 = yf.download('^GSPC', period='3mo', interval='1d', progress=False)['Close']
-        russell = yf.download('^RUT', period='3mo', interval='1d', progress=False)['Close']
+        if ind is None:
+            ind = build_market_indicators()
+        symbols = ['^IXIC', '^GSPC', '^RUT']
         
-        # 修复: 正确处理DataFrame验证
-        if not (validate_data(nasdaq, 30) and validate_data(sp500, 30) and validate_data(russell, 30)):
+        if ind.count[symbols].min() < 30:
             print("⚠️  指数数据不足，无法分析")
             log_execution('指数差异分析', 'warning', '数据不足')
             return
         
-        # 计算收益率
-        nasdaq_ret = (nasdaq.iloc[-1] / nasdaq.iloc[-30] - 1) * 100
-        sp500_ret = (sp500.iloc[-1] / sp500.iloc[-30] - 1) * 100
-        russell_ret = (russell.iloc[-1] / russell.iloc[-30] - 1) * 100
-        
-        # 计算波动性
-        nasdaq_vol = nasdaq.pct_change().rolling(20).std().iloc[-1] * np.sqrt(252) * 100
-        sp500_vol = sp500.pct_change().rolling(20).std().iloc[-1] * np.sqrt(252) * 100
-        russell_vol = russell.pct_change().rolling(20).std().iloc[-1] * np.sqrt(252) * 100
-        
-        # 计算相关性
-        df = pd.concat([
-            nasdaq.pct_change().dropna(),
-            sp500.pct_change().dropna(),
-            russell.pct_change().dropna()
-        ], axis=1, keys=['纳指', '标普', '罗素']).dropna()
+        # 收益率与波动性
+        nasdaq_ret, sp500_ret, russell_ret = ind.change(30)[symbols]
+        nasdaq_vol, sp500_vol, russell_vol = ind.volatility[symbols]
         
-        corr_nasdaq_sp500 = df['纳指'].corr(df['标普'])
-        corr_nasdaq_russell = df['纳指'].corr(df['罗素'])
-        corr_sp500_russell = df['标普'].corr(df['罗素'])
+        # 相关性
+        corr = ind.corr(symbols)
+        corr_nasdaq_sp500 = corr.loc['^IXIC', '^GSPC']
+        corr_nasdaq_russell = corr.loc['^IXIC', '^RUT']
+        corr_sp500_russell = corr.loc['^GSPC', '^RUT']
         
         print(f"\n📊 近30日涨跌幅:")
         print(f"  纳斯达克100: {nasdaq_ret:+.2f}% (波动率: {nasdaq_vol:.1f}%)")
@@ -476,9 +745,7 @@ def analyze_index_divergence():
         print(f"  标普-罗素:   {corr_sp500_russell:.3f}")
         
         # 趋势分析
-        nasdaq_trend = calculate_trend(nasdaq)
-        sp500_trend = calculate_trend(sp500)
-        russell_trend = calculate_trend(russell)
+        nasdaq_trend, sp500_trend, russell_trend = ind.trend[symbols]
         
         print(f"\n📈 近期趋势:")
         print(f"  纳指: {'上涨' if nasdaq_trend == 'up' else '下跌'}趋势")
@@ -515,41 +782,48 @@ def analyze_index_divergence():
         
         # 记录洞察
         insight_msg = f"纳指{nasdaq_ret:+.2f}% 标普{sp500_ret:+.2f}% 罗素{russell_ret:+.2f}% {market_regime}"
-        EXECUTION_LOG['insights'].append(('指数差异', insight_msg))
+        log_insight('指数差异', insight_msg)
         
     except Exception as e:
         print(f"❌ 指数差异分析失败: {e}")
         log_execution('指数差异分析', 'error', str(e))
 
-def analyze_risk_regime():
+def analyze_risk_regime(ind=None):
     """分析风险环境（国债+VIX）"""
     print("\n" + "="*70)
     print("【风险环境解读】")
     print("="*70)
     
     try:
-        vix = yf.download('^VIX', period='3mo', interval='1d', progress=False)['Close']
-        ten_year = yf.download('^TNX', period='3mo', interval='1d', progress=False)['Close']
-        sp500 = yf.download('^GSPC', period='3mo', interval='1d', progress=False)['Close']
+        if ind is None:
+            ind = build_market_indicators()
         
-        if not (validate_data(vix, 30) and validate_data(ten_year, 30) and validate_data(sp500, 30)):
+        if ind.count[['^VIX', '^TNX', '^GSPC']].min() < 30:
             print("⚠️  风险指标数据不足")
             log_execution('风险环境分析', 'warning', '数据不足')
             return
         
-        # 修复: 确保转换为标量
-        current_vix = float(vix.iloc[-1]) if len(vix) > 0 else 0
-        current_bond = float(ten_year.iloc[-1]) if len(ten_year) > 0 else 0
-        vix_change = (vix.iloc[-1] / vix.iloc[-5] - 1) * 100 if len(vix) > 5 else 0
-        bond_change = (ten_year.iloc[-1] / ten_year.iloc[-5] - 1) * 100 if len(ten_year) > 5 else 0
-        
-        # 历史分位数
-        vix_percentile = (vix <= current_vix).sum() / len(vix) * 100 if len(vix) > 0 else 0
-        bond_percentile = (ten_year <= current_bond).sum() / len(ten_year) * 100 if len(ten_year) > 0 else 0
+        current_vix = float(ind.last['^VIX'])
+        current_bond = float(ind.last['^TNX'])
+        change_5d = ind.change(5)
+        vix_change = change_5d['^VIX']
+        bond_change = change_5d['^TNX']
+        
+        # 历史分位数：近1年与全部历史（历史库样本不足时退回3个月窗口）
+        SIGNAL_HISTORY.record('VIX', MARKET_DATA.close('^VIX', '5y'))
+        SIGNAL_HISTORY.record('US10Y', MARKET_DATA.close('^TNX', '5y'))
+        if isinstance(ind, IntradayState):
+            # 盘中：最新价作为当日临时值计入历史库（收盘后的日线运行以收盘价覆盖）
+            SIGNAL_HISTORY.record('VIX', current_vix, ind.dates['^VIX'])
+            SIGNAL_HISTORY.record('US10Y', current_bond, ind.dates['^TNX'])
+        vix_percentile = history_percentile('VIX', '1y', ind.percentile['^VIX'])
+        bond_percentile = history_percentile('US10Y', '1y', ind.percentile['^TNX'])
+        vix_percentile_all = history_percentile('VIX')
+        bond_percentile_all = history_percentile('US10Y')
         
         print(f"\n📊 当前风险指标:")
-        print(f"  VIX:        {current_vix:.2f} ({vix_percentile:.0f}分位) 5日变化: {vix_change:+.2f}%")
-        print(f"  10Y国债:    {current_bond:.2f}% ({bond_percentile:.0f}分位) 5日变化: {bond_change:+.2f}%")
+        print(f"  VIX:        {current_vix:.2f} (近1年{vix_percentile:.0f}分位 / 全部历史{vix_percentile_all:.0f}分位) 5日变化: {vix_change:+.2f}%")
+        print(f"  10Y国债:    {current_bond:.2f}% (近1年{bond_percentile:.0f}分位 / 全部历史{bond_percentile_all:.0f}分位) 5日变化: {bond_change:+.2f}%")
         
         # VIX解读
         if current_vix > 35:
@@ -576,14 +850,14 @@ def analyze_risk_regime():
         print(f"🎯 国债解读: {bond_signal}")
         
         # 趋势判断
-        vix_trend = calculate_trend(vix)
-        bond_trend = calculate_trend(ten_year)
+        vix_trend = ind.trend['^VIX']
+        bond_trend = ind.trend['^TNX']
         print(f"\n📈 近期趋势:")
         print(f"  VIX: 五日{'上升' if vix_trend == 'up' else '下降'} ({vix_change:+.2f}%)")
         print(f"  国债: 五日{'上升' if bond_trend == 'up' else '下降'} ({bond_change:+.2f}%)")
         
         # 股债相关性
-        recent_corr = sp500.pct_change().iloc[-30:].corr(ten_year.diff().iloc[-30:])
+        recent_corr = ind.corr(['^GSPC', '^TNX'], tail=30, diff=('^TNX',)).loc['^GSPC', '^TNX']
         print(f"\n🔗 股债30日相关性: {recent_corr:.3f}")
         if recent_corr > 0.3:
             corr_signal = "正相关 → 传统股债配置失效，宏观驱动主导"
@@ -617,40 +891,43 @@ def analyze_risk_regime():
             risk_level = "⚪ 中等风险"
             action = "平衡配置，动态调整"
         
-        print(f"🎯 风险等级: {risk_level}")
+        SIGNAL_HISTORY.record_label('risk_level', risk_level, signal_date())
+        _, streak = SIGNAL_HISTORY.streak('risk_level')
+        print(f"🎯 风险等级: {risk_level}" + (f"（连续{streak}次）" if streak > 1 else ""))
         print(f"💼 建议操作: {action}")
         
         # 记录洞察
-        EXECUTION_LOG['market_signals']['risk_level'] = risk_level
-        EXECUTION_LOG['insights'].append(('风险环境', f'VIX{current_vix:.2f} 国债{current_bond:.2f}% {risk_level}'))
+        log_signal('risk_level', risk_level)
+        log_insight('风险环境', f'VIX{current_vix:.2f} 国债{current_bond:.2f}% {risk_level}')
         
     except Exception as e:
         print(f"❌ 风险环境分析失败: {e}")
         log_execution('风险环境分析', 'error', str(e))
 
-def analyze_china_us_linkage():
+def analyze_china_us_linkage(ind=None):
     """分析中美市场联动"""
     print("\n" + "="*70)
     print("【中美市场联动解读】")
     print("="*70)
     
     try:
-        hsi = yf.download('^HSI', period='3mo', interval='1d', progress=False)['Close']
-        usdcny = yf.download('CNY=X', period='3mo', interval='1d', progress=False)['Close']
-        sp500 = yf.download('^GSPC', period='3mo', interval='1d', progress=False)['Close']
+        if ind is None:
+            ind = build_market_indicators()
+        symbols = ['^HSI', 'CNY=X', '^GSPC']
         
-        if not (validate_data(hsi, 30) and validate_data(usdcny, 30) and validate_data(sp500, 30)):
+        if ind.count[symbols].min() < 30:
             print("⚠️  中美市场数据不足")
             log_execution('中美联动分析', 'warning', '数据不足')
             return
         
-        # 修复: 确保转换为标量
-        current_cny = float(usdcny.iloc[-1]) if len(usdcny) > 0 else 0
-        cny_change_5d = (usdcny.iloc[-1] / usdcny.iloc[-5] - 1) * 100 if len(usdcny) > 5 else 0
-        cny_change_30d = (usdcny.iloc[-1] / usdcny.iloc[-30] - 1) * 100 if len(usdcny) > 30 else 0
+        # 恰好 30 个点时 30 日变化按 0 处理（与逐序列计算时一致）
+        change_30d = ind.change(30).where(ind.count > 30, 0)
+        current_cny = float(ind.last['CNY=X'])
+        cny_change_5d = ind.change(5)['CNY=X']
+        cny_change_30d = change_30d['CNY=X']
         
-        hsi_ret = (hsi.iloc[-1] / hsi.iloc[-30] - 1) * 100 if len(hsi) > 30 else 0
-        sp500_ret = (sp500.iloc[-1] / sp500.iloc[-30] - 1) * 100 if len(sp500) > 30 else 0
+        hsi_ret = change_30d['^HSI']
+        sp500_ret = change_30d['^GSPC']
         
         print(f"\n📊 市场表现 (30日):")
         print(f"  恒生指数:    {hsi_ret:+.2f}%")
@@ -670,15 +947,10 @@ def analyze_china_us_linkage():
         print(f"\n🎯 汇率信号: {cny_signal}")
         
         # 计算相关性
-        df = pd.concat([
-            hsi.pct_change().dropna(),
-            usdcny.pct_change().dropna(),
-            sp500.pct_change().dropna()
-        ], axis=1, keys=['恒指', '人民币', '标普']).dropna()
-        
-        corr_hsi_sp500 = df['恒指'].corr(df['标普'])
-        corr_hsi_cny = df['恒指'].corr(-df['人民币'])  # 贬值应利好港股
-        corr_sp500_cny = df['标普'].corr(-df['人民币'])
+        corr = ind.corr(symbols)
+        corr_hsi_sp500 = corr.loc['^HSI', '^GSPC']
+        corr_hsi_cny = -corr.loc['^HSI', 'CNY=X']  # 贬值应利好港股
+        corr_sp500_cny = -corr.loc['^GSPC', 'CNY=X']
         
         print(f"\n🔗 相关性分析:")
         print(f"  恒指-标普:   {corr_hsi_sp500:.3f} {'🔒强联动' if corr_hsi_sp500 > 0.7 else '🔓弱联动' if corr_hsi_sp500 < 0.3 else '🔄中等'}")
@@ -716,7 +988,7 @@ def analyze_china_us_linkage():
         print(f"💡 原因推断: {strength_reason}")
         
         # 记录洞察
-        EXECUTION_LOG['insights'].append(('中美联动', f'恒指{hsi_ret:+.2f}% 汇率{cny_change_5d:+.2f}% {linkage}'))
+        log_insight('中美联动', f'恒指{hsi_ret:+.2f}% 汇率{cny_change_5d:+.2f}% {linkage}')
         
     except Exception as e:
         print(f"❌ 中美联动分析失败: {e}")
@@ -729,10 +1001,7 @@ def analyze_liquidity_conditions():
     print("="*70)
     
     try:
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=300)
-        start_date_str = start_date.strftime('%Y%m%d')
-        end_date_str = end_date.strftime('%Y%m%d')
+        start_date_str, end_date_str = analysis_window()
         
         margin_data = get_data('融资余额', start_date_str, end_date_str)
         shibor_data = get_data('Shibor 1M', start_date_str, end_date_str)
@@ -743,21 +1012,34 @@ def analyze_liquidity_conditions():
             log_execution('流动性分析', 'warning', '数据不足')
             return
         
-        current_margin = float(margin_data['融资余额'].iloc[-1]) / 100000000
-        margin_change_5d = margin_data['融资余额'].pct_change(5).iloc[-1] * 100
-        margin_change_30d = margin_data['融资余额'].pct_change(30).iloc[-1] * 100
+        etf_500 = get_data('ETF_510500', start_date_str, end_date_str)
+        ind = IndicatorEngine({
+            '融资余额': margin_data['融资余额'],
+            'Shibor': shibor_data,
+            '500ETF': etf_500 if validate_data(etf_500, 30) else pd.Series(dtype=float),
+        })
+        
+        # change(n+1) 即 pct_change(n)：相对 n 个交易日之前
+        current_margin = float(ind.last['融资余额']) / 100000000
+        margin_change_5d = ind.change(6)['融资余额']
+        margin_change_30d = ind.change(31)['融资余额']
         
-        current_shibor = float(shibor_data.iloc[-1]) if len(shibor_data) > 0 else np.nan
-        shibor_change = shibor_data.pct_change().iloc[-1] * 100 if len(shibor_data) > 1 else 0
+        current_shibor = float(ind.last['Shibor'])
+        shibor_change = ind.change(2)['Shibor'] if ind.count['Shibor'] > 1 else 0
+        
+        SIGNAL_HISTORY.record('融资余额', margin_data['融资余额'])
+        SIGNAL_HISTORY.record('Shibor 1M', shibor_data)
+        margin_percentile = history_percentile('融资余额', '3y')
         
         print(f"\n📊 流动性指标:")
-        print(f"  融资余额: {current_margin:.0f}亿")
+        print(f"  融资余额: {current_margin:.0f}亿" + (f" (近3年{margin_percentile:.0f}分位)" if not np.isnan(margin_percentile) else ""))
         print(f"    └─5日变化: {margin_change_5d:+.2f}%")
         print(f"    └─30日变化: {margin_change_30d:+.2f}%")
         print(f"  Shibor 1M: {current_shibor:.2f}%")
         print(f"    └─日变化: {shibor_change:+.2f}%")
         
         if validate_data(bond_data) and 'spread' in bond_data.columns:
+            SIGNAL_HISTORY.record('中美利差', bond_data['spread'])
             current_spread = float(bond_data['spread'].iloc[-1])
             spread_change_5d = bond_data['spread'].diff(5).iloc[-1]
             print(f"  中美利差: {current_spread:.2f}bp (5日变化: {spread_change_5d:+.0f}bp)")
@@ -812,13 +1094,10 @@ def analyze_liquidity_conditions():
             print(f"💡 解读: {spread_desc}")
         
         # 技术形态
-        etf_500 = get_data('ETF_510500', start_date_str, end_date_str)
-        if validate_data(etf_500, 30):
-            margin_ma10 = margin_data['融资余额'].rolling(10).mean()
-            etf_ma10 = etf_500.rolling(10).mean()
-            
-            margin_above_ma = margin_data['融资余额'].iloc[-1] > margin_ma10.iloc[-1]
-            etf_above_ma = etf_500.iloc[-1] > etf_ma10.iloc[-1]
+        if ind.count['500ETF'] >= 30:
+            above_ma = ind.last > ind.moving_average(10)
+            margin_above_ma = above_ma['融资余额']
+            etf_above_ma = above_ma['500ETF']
             
             print(f"\n📈 技术形态:")
             print(f"  融资余额 vs MA10: {'✅上方' if margin_above_ma else '❌下方'}")
@@ -865,9 +1144,11 @@ def analyze_liquidity_conditions():
         print(f"🎯 综合环境: {liquidity_env}")
         print(f"💡 资产影响: {liquidity_desc}")
         
+        SIGNAL_HISTORY.record_label('liquidity_env', liquidity_env, signal_date())
+        
         # 记录洞察
-        EXECUTION_LOG['market_signals']['liquidity_env'] = liquidity_env
-        EXECUTION_LOG['insights'].append(('流动性', f'融资{current_margin:.0f}亿 Shibor{current_shibor:.2f}% {liquidity_env}'))
+        log_signal('liquidity_env', liquidity_env)
+        log_insight('流动性', f'融资{current_margin:.0f}亿 Shibor{current_shibor:.2f}% {liquidity_env}')
         
     except Exception as e:
         print(f"❌ 流动性分析失败: {e}")
@@ -883,99 +1164,96 @@ def plot_data(data_dict, title, labels, colors, linewidths=None, save_path=None)
             log_execution('绘图', 'warning', f'{title} 无有效数据')
             return
         
-        fig, ax = plt.subplots(figsize=(20, 12), facecolor='black')
-        
-        for i, (key, values) in enumerate(valid_data.items()):
-            linewidth = linewidths[i] if linewidths else 1.5
-            ax.plot(values.index, values, color=colors[i], 
-                   label=labels[i], linewidth=linewidth)
-        
-        ax.set_title(title, fontsize=13, fontweight='heavy', pad=8, color='white')
-        ax.legend(loc='upper left', fontsize=8, framealpha=0.9)
-        ax.grid(True, alpha=0.3, color='#666666')
-        
-        plt.gcf().autofmt_xdate(rotation=45, ha='right')
-        plt.tight_layout(pad=0.8, h_pad=0.8, w_pad=0.8)
-        
         if save_path:
-            filepath = os.path.join(OUTPUT_DIR, save_path)
-            plt.savefig(filepath, bbox_inches='tight', pad_inches=0.1, 
-                       facecolor='black', dpi=150)
+            series = [
+                (labels[i], values, colors[i], linewidths[i] if linewidths else 1.5)
+                for i, (key, values) in enumerate(valid_data.items())
+            ]
+            if not render_chart_spec(ChartSpec('lines', save_path, title=title, series=series)):
+                return
             print(f"✅ 图表: {save_path}")
-            log_execution('绘图', 'success', f'{title} -> {save_path}', chart_path=save_path)
+            log_execution('绘图', 'success', f'{title} -> {save_path}', chart_path=CHART_FORMAT.resolve(save_path))
         
-        plt.close(fig)
         log_execution('绘图', 'success', f'{title} 耗时 {time.time()-start_time:.2f}s')
         
     except Exception as e:
         print(f"❌ 绘图失败 {title}: {e}")
         log_execution('绘图', 'error', f'{title}: {str(e)}')
-        plt.close('all')
 
-def plot_oil_gold_bond():
+def fetch_oil_gold_data():
+    """油金比所需数据：原油、黄金、美债收益率"""
+    return {
+        'oil': get_data("CL", None, None),
+        'gold': get_data("GC", None, None),
+        'us_bond': get_us_bond(),
+    }
+
+def get_us_bond():
+    """美债10年收益率：akshare 为主，超过 hedge_after 秒未返回或失败时对冲取 yfinance ^TNX，先到先用"""
+    try:
+        data, source = FETCHER.hedged(
+            ('bond_zh_us_rate', lambda: get_data('US_BOND', None, None)),
+            ('^TNX', lambda: MARKET_DATA.close('^TNX', '5y')),
+        )
+    except Exception as e:
+        log_execution('数据获取', 'warning', f'US_BOND: {str(e)[:100]}')
+        return pd.Series(dtype=float)
+    if source != 'bond_zh_us_rate':
+        log_execution('数据获取', 'warning', f'US_BOND: bond_zh_us_rate 未及时返回，改用 yfinance {source}')
+    return data if data is not None else pd.Series(dtype=float)
+
+def plot_oil_gold_bond(data=None):
     """油金比分析"""
     start_time = time.time()
     try:
-        oil_prices = get_data("CL", None, None)
-        gold_prices = get_data("GC", None, None)
+        data = data if data is not None else fetch_oil_gold_data()
+        oil_prices, gold_prices = data['oil'], data['gold']
         
         if not (validate_data(oil_prices, 50) and validate_data(gold_prices, 50)):
             print("❌ 原油或黄金数据不足")
             return
         
-        oil_prices, gold_prices = oil_prices.align(gold_prices, join='inner')
-        if not validate_data(oil_prices, 30):
-            print("❌ 数据对齐后不足")
-            return
-        
-        oil_gold_ratio = oil_prices / gold_prices
-        us_bond = get_data('US_BOND', None, None)
-        
+        us_bond = data['us_bond']
         if not validate_data(us_bond, 30):
             print("❌ 美债数据不足")
             return
         
-        us_bond = us_bond.iloc[-300:] if len(us_bond) > 300 else us_bond
-        oil_gold_ratio = oil_gold_ratio.iloc[-300:] if len(oil_gold_ratio) > 300 else oil_gold_ratio
-        
-        fig, ax1 = plt.subplots(figsize=(20, 12), facecolor='black')
-        ax2 = ax1.twinx()
-        
-        line1 = ax1.plot(oil_gold_ratio, 'r-', label='Oil/Gold Ratio', linewidth=1.5)
-        ax1.set_ylabel('Oil/Gold Ratio', color='r', fontsize=10)
-        
-        line2 = ax2.plot(us_bond, 'b-', label='US 10Y Yield', linewidth=1.5)
-        ax2.set_ylabel('US 10Y Yield (%)', color='b', fontsize=10)
-        
-        plt.title('Oil/Gold Ratio vs US 10Y Treasury Yield Trend', 
-                 fontsize=13, fontweight='heavy', pad=8)
-        
-        ax1.grid(True, alpha=0.3, color='#666666')
-        lines = line1 + line2
-        labels = [l.get_label() for l in lines]
-        ax1.legend(lines, labels, loc='upper left', fontsize=8)
+        # 原油、黄金与美债收益率一次对齐到纽交所交易日，任一数据源缺某天时沿用其最近值
+        frame = align({'oil': oil_prices, 'gold': gold_prices, 'us_bond': us_bond}, 'NYSE').iloc[-300:]
+        if not validate_data(frame, 30):
+            print("❌ 数据对齐后不足")
+            return
         
-        plt.gcf().autofmt_xdate(rotation=45, ha='right')
-        plt.tight_layout(pad=0.8)
+        oil_gold_ratio = frame['oil'] / frame['gold']
+        us_bond = frame['us_bond']
         
-        filepath = os.path.join(OUTPUT_DIR, 'jyb_gz.png')
-        plt.savefig(filepath, bbox_inches='tight', pad_inches=0.1, 
-                   facecolor='black', dpi=150)
+        spec = ChartSpec(
+            'twin', 'jyb_gz.png', title='Oil/Gold Ratio vs US 10Y Treasury Yield Trend',
+            series=[('Oil/Gold Ratio', oil_gold_ratio, 'r', 1.5), ('US 10Y Yield', us_bond, 'b', 1.5)],
+            options={'ylabels': ('Oil/Gold Ratio', 'US 10Y Yield (%)')}
+        )
+        if not render_chart_spec(spec):
+            return
         print("✅ 图表: jyb_gz.png")
-        log_execution('油金比', 'success', f'耗时 {time.time()-start_time:.2f}s', 'jyb_gz.png')
-        plt.close(fig)
+        log_execution('油金比', 'success', f'耗时 {time.time()-start_time:.2f}s', CHART_FORMAT.resolve('jyb_gz.png'))
         
     except Exception as e:
         print(f"❌ 油金比图表失败: {e}")
         log_execution('油金比', 'error', str(e))
-        plt.close('all')
 
-def plot_pe_bond_spread():
+def fetch_pe_bond_data():
+    """股债利差所需数据：国债收益率与上证50市盈率"""
+    return {
+        'bond': safe_get_data(ak.bond_zh_us_rate, start_date="20121219"),
+        'pe': safe_get_data(ak.stock_index_pe_lg, symbol="上证50"),
+    }
+
+def plot_pe_bond_spread(data=None):
     """股债利差分析"""
     start_time = time.time()
     try:
-        bond_df = safe_get_data(ak.bond_zh_us_rate, start_date="20121219")
-        pe_df = safe_get_data(ak.stock_index_pe_lg, symbol="上证50")
+        data = data if data is not None else fetch_pe_bond_data()
+        bond_df, pe_df = data['bond'].copy(), data['pe'].copy()
         
         if bond_df.empty or pe_df.empty:
             print("❌ 债券或PE数据获取失败")
@@ -992,57 +1270,47 @@ def plot_pe_bond_spread():
         bond_df['日期'] = pd.to_datetime(bond_df['日期'], errors='coerce')
         pe_df['日期'] = pd.to_datetime(pe_df['日期'], errors='coerce')
         
-        bond_10y = bond_df.dropna().set_index('日期')['中国国债收益率10年']
-        pe_ratio = pe_df.dropna().set_index('日期')['滚动市盈率']
-        
-        # 修复: 确保有足够的交集数据
-        common_idx = bond_10y.index.intersection(pe_ratio.index)
-        if len(common_idx) < 50:  # 降低要求到50
-            print(f"⚠️  日期交集数据不足: {len(common_idx)} < 50")
-            # 尝试使用最近的数据
-            bond_10y = bond_10y.tail(200)
-            pe_ratio = pe_ratio.tail(200)
-            common_idx = bond_10y.index.intersection(pe_ratio.index)
-            if len(common_idx) < 30:
-                log_execution('股债利差', 'warning', '日期交集不足')
-                return
+        bond_10y = bond_df.dropna(subset=['日期']).set_index('日期')['中国国债收益率10年']
+        pe_ratio = pe_df.dropna(subset=['日期']).set_index('日期')['滚动市盈率']
+        
+        # 国债收益率按上交所交易日 as-of 对齐到市盈率，某一方缺数据的日期沿用最近值
+        aligned = align({'bond': bond_10y, 'pe': pe_ratio}, 'SSE')
+        if len(aligned) < 30:
+            print(f"⚠️  日期对齐后数据不足: {len(aligned)} < 30")
+            log_execution('股债利差', 'warning', '日期对齐后数据不足')
+            return
         
-        spread = bond_10y.loc[common_idx] - 100 / pe_ratio.loc[common_idx]
-        spread = spread.ffill().dropna()
+        # 只计算历史库最后日期之后的利差（含最后一天），与已累积的历史合并
+        since = SIGNAL_HISTORY.last_date('股债利差')
+        if since is not None:
+            aligned = aligned[aligned.index >= since]
+        SIGNAL_HISTORY.record('股债利差', aligned['bond'] - 100 / aligned['pe'])
+        spread = SIGNAL_HISTORY.series('股债利差')
         
         if len(spread) < 30:
             print("⚠️  股债利差数据不足")
             return
         
-        fig, ax = plt.subplots(figsize=(20, 12), facecolor='black')
-        spread.plot(ax=ax, color='white', linewidth=1.5, title='股债利差')
-        
-        for y, color, label in [
-            (-2.6, 'red', '高息'), (-5.5, 'green', '正常'), 
-            (-7.8, 'blue', '低息'), (-4.5, 'gray', ''), (-6.8, 'gray', '')
-        ]:
-            plt.axhline(y=y, ls=":", c=color, label=label if label else None, alpha=0.7)
-        
-        plt.legend(fontsize=8, loc='upper left')
-        plt.grid(True, alpha=0.3, color='#666666')
-        plt.title('股债利差', fontsize=13, fontweight='heavy', pad=8)
-        
-        plt.gcf().autofmt_xdate(rotation=45, ha='right')
-        plt.tight_layout(pad=0.8)
-        
-        filepath = os.path.join(OUTPUT_DIR, 'guzhaixicha.png')
-        plt.savefig(filepath, bbox_inches='tight', pad_inches=0.1, 
-                   facecolor='black', dpi=150)
+        spec = ChartSpec(
+            'lines', 'guzhaixicha.png', title='股债利差',
+            series=[('股债利差', spread, 'white', 1.5)],
+            hlines=[
+                (-2.6, 'red', '高息'), (-5.5, 'green', '正常'), 
+                (-7.8, 'blue', '低息'), (-4.5, 'gray', ''), (-6.8, 'gray', '')
+            ]
+        )
+        if not render_chart_spec(spec):
+            return
         print("✅ 图表: guzhaixicha.png")
-        log_execution('股债利差', 'success', f'耗时 {time.time()-start_time:.2f}s', 'guzhaixicha.png')
-        plt.close(fig)
+        log_execution('股债利差', 'success', f'耗时 {time.time()-start_time:.2f}s', CHART_FORMAT.resolve('guzhaixicha.png'))
         
         # 解读
         current_spread = float(spread.iloc[-1])
-        spread_percentile = (spread <= current_spread).sum() / len(spread) * 100
+        spread_percentile = history_percentile('股债利差')
+        spread_percentile_3y = history_percentile('股债利差', '3y')
         
         print(f"\n【股债利差解读】")
-        print(f"当前利差: {current_spread:.2f}% (历史{spread_percentile:.0f}分位)")
+        print(f"当前利差: {current_spread:.2f}% (历史{spread_percentile:.0f}分位 / 近3年{spread_percentile_3y:.0f}分位)")
         
         if current_spread < -7:
             equity_signal = "🔴 股票性价比极低"
@@ -1058,225 +1326,864 @@ def plot_pe_bond_spread():
         print(f"💡 债券: {bond_signal}")
         
         # 记录洞察
-        EXECUTION_LOG['market_signals']['equity_signal'] = equity_signal
-        EXECUTION_LOG['insights'].append(('股债利差', f'{current_spread:.2f}% {equity_signal.split()[1]}'))
+        log_signal('equity_signal', equity_signal)
+        log_insight('股债利差', f'{current_spread:.2f}% {equity_signal.split()[1]}')
         
     except Exception as e:
         print(f"❌ 股债利差图表失败: {e}")
         log_execution('股债利差', 'error', str(e))
-        plt.close('all')
 
-def main():
-    """主执行函数"""
-    EXECUTION_LOG['start_time'] = datetime.now().isoformat()
-    print("\n" + "="*70)
-    print("金融数据分析程序启动")
-    print(f"运行时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print(f"输出目录: {os.path.abspath(OUTPUT_DIR)}")
-    print("="*70)
-    
-    start_time = time.time()
-    success_count = 0
-    total_tasks = 0
-    start_date_str = ""
-    end_date_str = ""
+def analysis_window():
+    """融资余额等 akshare 数据的日期窗口（近 LOOKBACK_DAYS 天，指定 as-of 时截止到该日，回放时以录制日期为准）"""
+    end_date = DATA_SOURCE.now().to_pydatetime()
+    start_date = end_date - timedelta(days=LOOKBACK_DAYS)
+    return start_date.strftime('%Y%m%d'), end_date.strftime('%Y%m%d')
+
+def lookback_period():
+    """回看天数对应的 yfinance period"""
+    return f'{LOOKBACK_DAYS}d'
+
+def fetch_kline_data(tasks=None):
+    """行情数据：登记并批量下载本次任务读取的 yfinance 标的，返回K线所需窗口"""
+    register_market_data(tasks)
+    prefetch_market_data()
+    frames = {}
+    for item in KLINE_INDICES:
+        if tasks is None or f'K线:{item[0]}' in tasks:
+            period = item[2] if len(item) > 2 else "1mo"
+            frames[item[0]] = MARKET_DATA.get(item[0], period)
+    return frames
+
+def plot_kline(ticker, filename, frames):
+    """任务1: 单个指数K线图"""
+    generate_and_save_plot(ticker, filename, data=frames.get(ticker, pd.DataFrame()))
+
+def fetch_margin_data(start_date_str, end_date_str):
+    """融资余额数据"""
+    return get_data('融资余额', start_date_str, end_date_str)
+
+INDICATOR_SYMBOLS = {
+    'exchange_rate': '美元',
+    'shibor': 'Shibor 1M',
+    'bond': '中美国债收益率',
+    'etf_300': 'ETF_510300',
+    'etf_1000': 'ETF_159845',
+    'etf_500': 'ETF_510500',
+}
+
+def fetch_indicator_data(start_date_str, end_date_str):
+    """多指标对比所需数据：汇率、Shibor、中美利差、ETF（各数据源并发获取，耗时取最慢的一个而非总和）"""
+    values = map_captured(lambda symbol: get_data(symbol, start_date_str, end_date_str), INDICATOR_SYMBOLS.values())
+    return dict(zip(INDICATOR_SYMBOLS, values))
+
+def task_margin_analysis(margin_data):
+    """任务2: 融资余额分析"""
+    print("\n【任务2】融资余额分析...")
+    if not validate_data(margin_data, 50):
+        print("❌ 融资余额数据不足")
+        log_execution('融资余额', 'warning', '数据不足')
+        return
     
-    # === 任务1: 指数K线图 ===
-    print("\n【任务1】生成指数K线图...")
-    indices = [
-        ("^TNX", "tenbond.png"), ("^VIX", "vix.png", "2mo"),
-        ("^GSPC", "sp500.png"), ("^IXIC", "nasdaq.png"),
-        ("^RUT", "rs2000.png"), ("VNQ", "vnq.png"),
-        ("^N225", "nikkei225.png"), ("^HSI", "hsi.png"),
-        ("CNY=X", "rmb.png")
-    ]
+    margin_data['ma10'] = margin_data['融资余额'].rolling(10).mean()
+    plot_data(
+        {'融资余额': margin_data['融资余额'].iloc[-50:], 
+         'ma10': margin_data['ma10'].iloc[-50:]},
+        '融资余额与MA10', ['融资余额', 'MA10'], ['r', 'b'],
+        save_path='rongziyue_ma.png'
+    )
     
-    for item in indices:
-        total_tasks += 1
-        try:
-            ticker, filename = item[0], item[1]
-            period = item[2] if len(item) > 2 else "1mo"
-            generate_and_save_plot(ticker, filename, period)
-            success_count += 1
-        except Exception as e:
-            print(f"❌ 任务失败 {item[0]}: {e}")
+    last_margin = margin_data[['融资余额', 'ma10']].iloc[-1:].fillna(0)
+    last_margin_m = (last_margin / 1000000).round(1)
+    print(f"最新融资余额: {last_margin_m['融资余额'].iloc[0]}M")
     
-    # === 任务2: 融资余额分析 ===
-    print("\n【任务2】融资余额分析...")
-    total_tasks += 1
-    try:
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=300)
-        start_date_str = start_date.strftime('%Y%m%d')
-        end_date_str = end_date.strftime('%Y%m%d')
-        
-        margin_data = get_data('融资余额', start_date_str, end_date_str)
-        if validate_data(margin_data, 50):
-            margin_data['ma10'] = margin_data['融资余额'].rolling(10).mean()
-            plot_data(
-                {'融资余额': margin_data['融资余额'].iloc[-50:], 
-                 'ma10': margin_data['ma10'].iloc[-50:]},
-                '融资余额与MA10', ['融资余额', 'MA10'], ['r', 'b'],
-                save_path='rongziyue_ma.png'
-            )
-            
-            last_margin = margin_data[['融资余额', 'ma10']].iloc[-1:].fillna(0)
-            last_margin_m = (last_margin / 1000000).round(1)
-            print(f"最新融资余额: {last_margin_m['融资余额'].iloc[0]}M")
-            
-            if last_margin['融资余额'].iloc[0] < last_margin['ma10'].iloc[-1]:
-                print("⚠️  \x1b[31m注意：风险偏好下资金流出!!!\x1b[0m")
-            
-            success_count += 1
-            log_execution('融资余额', 'success', f'最新: {last_margin_m["融资余额"].iloc[0]}M')
-        else:
-            print("❌ 融资余额数据不足")
-            log_execution('融资余额', 'warning', '数据不足')
-    except Exception as e:
-        print(f"❌ 融资余额分析失败: {e}")
+    if last_margin['融资余额'].iloc[0] < last_margin['ma10'].iloc[-1]:
+        print("⚠️  \x1b[31m注意：风险偏好下资金流出!!!\x1b[0m")
     
-    # === 任务3: 多指标对比 ===
+    log_execution('融资余额', 'success', f'最新: {last_margin_m["融资余额"].iloc[0]}M')
+
+def task_multi_indicator(margin_data, indicators):
+    """任务3: 多指标对比"""
     print("\n【任务3】多指标对比...")
-    total_tasks += 1
-    try:
-        exchange_rate = get_data('美元', start_date_str, end_date_str)
-        shibor_data = get_data('Shibor 1M', start_date_str, end_date_str)
-        bond_data = get_data('中美国债收益率', start_date_str, end_date_str)
-        etf_300 = get_data('ETF_510300', start_date_str, end_date_str)
-        etf_1000 = get_data('ETF_159845', start_date_str, end_date_str)
-        etf_500 = get_data('ETF_510500', start_date_str, end_date_str)
-        
-        plot_data(
-            {'融资余额': normalize(margin_data['融资余额'] if validate_data(margin_data) else pd.Series()),
-             '汇率': normalize(-exchange_rate),
-             '中美利差': normalize(bond_data['spread'] if validate_data(bond_data) and 'spread' in bond_data.columns else pd.Series()),
-             '500ETF': normalize(etf_500)},
-            '归一化指标对比', ['融资余额', '汇率', '中美利差', '500ETF'],
-            ['g', 'c', 'k', 'r'], save_path='rongziyue_1.png'
-        )
-        
-        plot_data(
-            {'融资余额': normalize(margin_data['融资余额'] if validate_data(margin_data) else pd.Series()),
-             '300ETF': normalize(etf_300),
-             '1000ETF': normalize(etf_1000)},
-            '融资余额与ETF对比', ['融资余额', '300ETF', '1000ETF'],
-            ['g', 'r', 'b'], save_path='rongziyue_2.png'
-        )
-        
-        plot_data(
-            {'Shibor 1M': normalize(shibor_data.iloc[-200:] if validate_data(shibor_data) else pd.Series()),
-             '中美国债收益率差': normalize(bond_data['spread'].iloc[-200:] if validate_data(bond_data) and 'spread' in bond_data.columns else pd.Series())},
-            '流动性指标', ['Shibor 1M', '中美国债利差'], ['k', 'g'],
-            save_path='liudongxing.png'
-        )
-        
-        if validate_data(bond_data) and validate_data(shibor_data):
-            if 'spread' in bond_data.columns and len(shibor_data) > 1:
-                bond_diff = bond_data['spread'].diff().iloc[-1] if len(bond_data) > 1 else 0
-                shibor_diff = shibor_data.diff().iloc[-1] if len(shibor_data) > 1 else 0
-                if bond_diff > 0 and shibor_diff < 0:
-                    print("\n⚠️  \x1b[31m注意：国内剩余流动性激增，股市预受损\x1b[0m")
-        
-        success_count += 1
-        log_execution('多指标对比', 'success', '完成3张图表')
-    except Exception as e:
-        print(f"❌ 多指标对比失败: {e}")
+    exchange_rate = indicators['exchange_rate']
+    shibor_data = indicators['shibor']
+    bond_data = indicators['bond']
+    etf_300 = indicators['etf_300']
+    etf_1000 = indicators['etf_1000']
+    etf_500 = indicators['etf_500']
     
-    # === 任务4: 油金比分析 ===
-    print("\n【任务4】油金比分析...")
-    total_tasks += 1
-    try:
-        plot_oil_gold_bond()
-        success_count += 1
-    except Exception as e:
-        print(f"❌ 油金比分析失败: {e}")
+    plot_data(
+        {'融资余额': normalize(margin_data['融资余额'] if validate_data(margin_data) else pd.Series()),
+         '汇率': normalize(-exchange_rate),
+         '中美利差': normalize(bond_data['spread'] if validate_data(bond_data) and 'spread' in bond_data.columns else pd.Series()),
+         '500ETF': normalize(etf_500)},
+        '归一化指标对比', ['融资余额', '汇率', '中美利差', '500ETF'],
+        ['g', 'c', 'k', 'r'], save_path='rongziyue_1.png'
+    )
     
-    # === 任务5: 相关性分析 ===
+    plot_data(
+        {'融资余额': normalize(margin_data['融资余额'] if validate_data(margin_data) else pd.Series()),
+         '300ETF': normalize(etf_300),
+         '1000ETF': normalize(etf_1000)},
+        '融资余额与ETF对比', ['融资余额', '300ETF', '1000ETF'],
+        ['g', 'r', 'b'], save_path='rongziyue_2.png'
+    )
+    
+    plot_data(
+        {'Shibor 1M': normalize(shibor_data.iloc[-200:] if validate_data(shibor_data) else pd.Series()),
+         '中美国债收益率差': normalize(bond_data['spread'].iloc[-200:] if validate_data(bond_data) and 'spread' in bond_data.columns else pd.Series())},
+        '流动性指标', ['Shibor 1M', '中美国债利差'], ['k', 'g'],
+        save_path='liudongxing.png'
+    )
+    
+    if validate_data(bond_data) and validate_data(shibor_data):
+        if 'spread' in bond_data.columns and len(shibor_data) > 1:
+            bond_diff = bond_data['spread'].diff().iloc[-1] if len(bond_data) > 1 else 0
+            shibor_diff = shibor_data.diff().iloc[-1] if len(shibor_data) > 1 else 0
+            if bond_diff > 0 and shibor_diff < 0:
+                print("\n⚠️  \x1b[31m注意：国内剩余流动性激增，股市预受损\x1b[0m")
+    
+    log_execution('多指标对比', 'success', '完成3张图表')
+
+def task_oil_gold(data):
+    """任务4: 油金比分析"""
+    print("\n【任务4】油金比分析...")
+    plot_oil_gold_bond(data)
+
+def fetch_hsi_rut_data():
+    """恒指与罗素2000（回看 LOOKBACK_DAYS 天）"""
+    return {
+        'hsi': MARKET_DATA.get('^HSI', lookback_period()),
+        'rut': MARKET_DATA.get('^RUT', lookback_period()),
+    }
+
+def task_hsi_rut_correlation(frames):
+    """任务5: 恒指与罗素2000相关性"""
     print("\n【任务5】相关性分析...")
-    total_tasks += 1
-    try:
-        hsi_df = yf.download('^HSI', period='300d', interval='1d', progress=False)
-        rut_df = yf.download('^RUT', period='300d', interval='1d', progress=False)
-        
-        # 修复: 正确处理DataFrame判断
-        if validate_data(hsi_df, 50) and validate_data(rut_df, 50):
-            hsi_close = hsi_df[['Close']].rename(columns={'Close': 'HSI'})
-            rut_close = rut_df[['Close']].rename(columns={'Close': 'RUT'})
-            
-            df = pd.concat([hsi_close, rut_close], axis=1, join='inner').dropna()
-            
-            if len(df) > 30:
-                correlation = df['HSI'].corr(df['RUT'])
-                print(f"恒生指数与Russell 2000相关性: {correlation:.4f}")
-                
-                fig, ax = plt.subplots(figsize=(20, 12), facecolor='black')
-                ax.plot(df.index, df['HSI']/df['HSI'].iloc[0], label='HSI (归一化)', color='#3498db', linewidth=1.5)
-                ax.plot(df.index, df['RUT']/df['RUT'].iloc[0], label='RUT (归一化)', color='#e74c3c', linewidth=1.5)
-                ax.set_title('恒生指数与Russell 2000走势对比', fontsize=13, fontweight='heavy', pad=8)
-                ax.legend(fontsize=8)
-                ax.grid(alpha=0.3, color='#666666')
-                
-                plt.gcf().autofmt_xdate(rotation=45, ha='right')
-                plt.tight_layout(pad=0.8)
-                
-                filepath = os.path.join(OUTPUT_DIR, 'hsi_rut_comparison.png')
-                plt.savefig(filepath, bbox_inches='tight', pad_inches=0.1, 
-                           facecolor='black', dpi=150)
-                print("✅ 图表: hsi_rut_comparison.png")
-                plt.close(fig)
-                
-                success_count += 1
-                log_execution('相关性分析', 'success', f'相关系数: {correlation:.4f}')
-            else:
-                print("❌ 相关性数据不足")
-                log_execution('相关性分析', 'warning', '数据不足')
-        else:
-            print("❌ 指数数据下载失败")
-            log_execution('相关性分析', 'warning', '下载失败')
-    except Exception as e:
-        print(f"❌ 相关性分析失败: {e}")
+    hsi_df, rut_df = frames['hsi'], frames['rut']
+    
+    # 修复: 正确处理DataFrame判断
+    if not (validate_data(hsi_df, 50) and validate_data(rut_df, 50)):
+        print("❌ 指数数据下载失败")
+        log_execution('相关性分析', 'warning', '下载失败')
+        return
+    
+    # 恒指收盘早于美股开盘，按纽交所交易日取截至当天的恒指收盘即为同一天的可比数据
+    df = align({'HSI': hsi_df['Close'], 'RUT': rut_df['Close']}, 'NYSE')
+    
+    if len(df) <= 30:
+        print("❌ 相关性数据不足")
+        log_execution('相关性分析', 'warning', '数据不足')
+        return
     
-    # === 任务6: 股债利差 ===
+    correlation = df['HSI'].corr(df['RUT'])
+    print(f"恒生指数与Russell 2000相关性: {correlation:.4f}")
+    
+    spec = ChartSpec(
+        'lines', 'hsi_rut_comparison.png', title='恒生指数与Russell 2000走势对比',
+        series=[
+            ('HSI (归一化)', df['HSI']/df['HSI'].iloc[0], '#3498db', 1.5),
+            ('RUT (归一化)', df['RUT']/df['RUT'].iloc[0], '#e74c3c', 1.5),
+        ],
+        options={'legend_loc': 'best'}
+    )
+    if not render_chart_spec(spec):
+        return
+    print("✅ 图表: hsi_rut_comparison.png")
+    
+    log_execution('相关性分析', 'success', f'相关系数: {correlation:.4f}')
+
+def task_pe_bond_spread(data):
+    """任务6: 股债利差分析"""
     print("\n【任务6】股债利差分析...")
-    total_tasks += 1
-    try:
-        plot_pe_bond_spread()
-        success_count += 1
-    except Exception as e:
-        print(f"❌ 股债利差分析失败: {e}")
+    plot_pe_bond_spread(data)
+
+def correlation_series(margin_data, indicators):
+    """相关性监控的全部序列 {名称: 价格/水平序列}"""
+    series = {name: MARKET_DATA.close(ticker, CORRELATION_PERIOD) for ticker, name in CORRELATION_SYMBOLS}
+    if validate_data(margin_data):
+        series['融资余额'] = margin_data['融资余额']
+    bond_data = indicators['bond']
+    if validate_data(bond_data) and 'spread' in bond_data.columns:
+        series['中美利差'] = bond_data['spread']
+    for key, name in (('shibor', 'Shibor 1M'), ('etf_300', '300ETF'), ('etf_500', '500ETF'), ('etf_1000', '1000ETF')):
+        if validate_data(indicators[key]):
+            series[name] = indicators[key]
+    spread = SIGNAL_HISTORY.series('股债利差')
+    if len(spread):
+        series['股债利差'] = spread
+    return {name: data.iloc[-CORRELATION_TAIL:] for name, data in series.items()}
+
+def task_correlation_monitor(margin_data, indicators):
+    """任务7: 全部跟踪序列的滚动相关矩阵与偏离监控（状态跨运行保存，每次只喂入最近几个与新增的交易日）"""
+    print("\n【任务7】相关性监控...")
+    start_time = time.time()
+    series = correlation_series(margin_data, indicators)
+    names = list(CORRELATION_NAMES)
+    missing = [name for name in names if name not in series]
+    if missing:
+        print(f"⚠️  相关性监控缺少序列（本次记为 NaN）: {', '.join(missing)}")
+    with TRACER.span('rolling_corr', 'compute') as span:
+        changes = IndicatorEngine(series).returns(diff=CORRELATION_DIFF)
+        state_path = os.path.join(DISK_CACHE.cache_dir, 'rolling_corr.npz') if DATA_SOURCE.live else None
+        engine = RollingCorrelation.load(state_path, names, CORRELATION_WINDOWS)
+        fed = engine.update_frame(changes)
+        if state_path:
+            engine.save(state_path)
+        drifts = engine.drift()
+        span.set(series=len(names), rows=fed, flagged=len(drifts))
+
+    pairs = len(names) * (len(names) - 1) // 2
+    short, long = engine.windows[0], engine.windows[-1]
+    print(f"跟踪 {len(names)} 个序列 / {pairs} 对，喂入 {fed} 个交易日（含重喂），{short}日 vs {long}日偏离 {len(drifts)} 对")
+    for item in drifts[:10]:
+        print(f"  ⚠️  {item['a']} - {item['b']}: {long}日 {item['long']:+.2f} → {short}日 {item['short']:+.2f}"
+              f" (漂移 {item['drift']:+.2f}, z={item['z']:+.1f})")
+    for item in drifts[:3]:
+        relation = '正相关' if item['long'] > 0.3 else '负相关' if item['long'] < -0.3 else '弱相关'
+        log_insight('偏离预警', f"{item['a']}与{item['b']}的{relation}关系正在变化：{long}日相关{item['long']:.2f}，"
+                                f"近{short}日{item['short']:.2f}，漂移{item['drift']:+.2f}")
+    log_execution('相关性监控', 'success',
+                  f'{len(names)}个序列 {pairs}对 偏离{len(drifts)}对 耗时 {time.time()-start_time:.2f}s')
+
+def task_backtest(pe_bond):
+    """任务8: 用当前阈值回测报告中的配置规则（参数扫描: python src/backtest.py）"""
+    print("\n【任务8】配置规则回测...")
+    start_time = time.time()
+    with TRACER.span('backtest', 'compute') as span:
+        inputs = inputs_from_sources(pe_bond['pe'], pe_bond['bond'], SIGNAL_HISTORY)
+        if inputs is None or len(inputs) < PERIODS_PER_YEAR:
+            print("⚠️  回测数据不足（需要一年以上的 VIX / 美债 / 股债利差历史）")
+            log_execution('配置回测', 'warning', '数据不足')
+            return
+        daily, benchmarks = run_backtest(inputs)
+        regimes = regime_table(inputs)
+        span.set(days=len(inputs))
+    
+    start, end = f'{inputs.index[0]:%Y-%m-%d}', f'{inputs.index[-1]:%Y-%m-%d}'
+    print(f"回测区间: {start} ~ {end}（{len(inputs)} 个交易日，上证50 / 中国10年国债 / Shibor 1M）")
+    for name, item in benchmarks.items():
+        print(f"  {name}: 年化 {item['cagr']:+.2%} 波动 {item['volatility']:.2%} "
+              f"夏普 {item['sharpe']:.2f} 最大回撤 {item['max_drawdown']:.2%}")
+    rule = benchmarks['规则配置']
+    print(f"  配置占比: 保守 {rule['share_保守']:.0%} / 进取 {rule['share_进取']:.0%} / 平衡 {rule['share_平衡']:.0%}，"
+          f"年均换仓 {rule['switches_per_year']:.1f} 次")
+    print("\n各信号分档后20日上证50收益:")
+    for row in regimes.itertuples():
+        if row.天数:
+            print(f"  {row.信号} {row.区间}: {row.天数}天 平均 {row.平均远期收益:+.2%} 上涨概率 {row.上涨概率:.0%}")
     
-    # === 综合解读（核心） ===
-    print("\n" + "📈 开始生成市场解读".center(70, "="))
+    report = {
+        'start': start, 'end': end, 'days': len(inputs), 'benchmarks': benchmarks,
+        'regimes': regimes.astype(object).where(regimes.notna(), None).to_dict(orient='records'),
+        'allocation_today': daily['allocation'].iloc[-1],
+    }
+    os.makedirs(LOG_DIR, exist_ok=True)
+    report_path = os.path.join(LOG_DIR, '配置回测.json')
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, separators=(',', ':'))
+    print(f"回测明细: {report_path}")
+    
+    static = benchmarks['静态平衡']
+    log_insight('配置回测', f"{start}以来规则配置年化{rule['cagr']:+.1%} 回撤{rule['max_drawdown']:.1%}，"
+                           f"静态平衡年化{static['cagr']:+.1%} 回撤{static['max_drawdown']:.1%}")
+    log_execution('配置回测', 'success', f'{len(inputs)}个交易日 耗时 {time.time()-start_time:.2f}s')
+
+# ETF 全市场面板：面板整体缓存，缓存覆盖不到的 ETF 才逐只并发补历史，之后每天只追加一次全市场快照
+ETF_HISTORY_DAYS = 120       # 面板保留的自然日
+ETF_REPORT_DAYS = 27         # 报告统计的交易日数
+ETF_WORKERS = 16
+ETF_FETCH_TIMEOUT = 600
+ETF_PANEL_CACHE = 'etf_panel'
+# 报告与图表用 etf_flow 前缀：output/etf_report.md 与 chart_01~04 由站点工作流从私有仓库 analyse 同步，两边不能同名
+ETF_REPORT_NAME = 'etf_flow_report.md'
+ETF_CHARTS = ('etf_flow_01_top_create_redeem.png', 'etf_flow_02_aum_by_type.png',
+              'etf_flow_03_amount_ratio.png', 'etf_flow_04_net_subscription_rate.png')
+A_SHARE_INDICES = ('sh000001', 'sz399106')   # 上证综指 + 深证综指，成交额合计为 A 股成交额
+
+def fetch_etf_history(code, start_date, end_date):
+    """
+    单只 ETF 日线（不走逐只的磁盘缓存，缓存的是整个面板）；
+    批量补历史用单独的策略与熔断器 etf_backfill，连续失败不会挡住其它任务的 fund_etf_hist_em，
+    失败时抛出异常，由调用方汇总成一条告警
+    """
+    def fetch():
+        with TRACER.span('fund_etf_hist_em', 'fetch', params={'symbol': code}) as span:
+            data = DATA_SOURCE.call('fund_etf_hist_em', ak.fund_etf_hist_em, code,
+                                    start_date=start_date, end_date=end_date)
+            span.set(rows=row_count(data))
+        return data
+    return FETCHER.call('etf_backfill', fetch)
+
+def backfill_etf_histories(stale, start_date, end_date):
+    """
+    并发补齐 ETF 历史
+    :param stale: 以代码为索引的最后数据日期（NaT 表示没有数据，从 start_date 补起）
+    :return: {代码: 原始 DataFrame}，只含获取成功的 ETF
+    """
+    def backfill(code):
+        start = f'{max(stale[code], pd.Timestamp(start_date)):%Y%m%d}' if pd.notna(stale[code]) else start_date
+        try:
+            return fetch_etf_history(code, start, end_date)
+        except Exception as e:
+            return e
+    results = dict(zip(stale.index, map_captured(backfill, stale.index, max_workers=ETF_WORKERS)))
+    failed = {code: e for code, e in results.items() if isinstance(e, Exception)}
+    if failed:
+        error = next(iter(failed.values()))
+        print(f"⚠️  ETF 补历史失败 {len(failed)}/{len(results)} 只，下次运行重试")
+        log_execution('ETF数据', 'warning', f'补历史失败 {len(failed)}/{len(results)} 只'
+                                            f'（如 {next(iter(failed))}: {type(error).__name__} {str(error)[:80]}）')
+    return {code: data for code, data in results.items() if code not in failed}
+
+def fetch_market_amount(start_date, end_date):
+    """A 股每日成交额（上证综指与深证综指成交额之和，两边都有数据的日期）"""
+    frames = map_captured(
+        lambda symbol: safe_get_data(ak.stock_zh_index_daily_em, symbol=symbol, start_date=start_date,
+                                     end_date=end_date),
+        A_SHARE_INDICES)
+    amounts = []
+    for frame in frames:
+        if frame.empty or 'date' not in frame.columns or 'amount' not in frame.columns:
+            return pd.Series(dtype=float)
+        amounts.append(pd.to_numeric(frame['amount'], errors='coerce')
+                       .set_axis(pd.to_datetime(frame['date'], errors='coerce')))
+    return pd.concat(amounts, axis=1).sum(axis=1, min_count=len(amounts)).dropna().sort_index()
+
+def fetch_etf_data():
+    """ETF 全市场面板：缓存面板 + 缺失历史的 ETF 并发补齐 + 当日快照，以及分类与 A 股成交额"""
+    end = DATA_SOURCE.now().normalize()
+    start = end - timedelta(days=ETF_HISTORY_DAYS)
+    start_date, end_date = start.strftime('%Y%m%d'), end.strftime('%Y%m%d')
+    # 按历史日期运行时不读写面板缓存（缓存含该日之后的数据），当日快照只用来取 ETF 列表
+    cached = DATA_SOURCE.live and DATA_SOURCE.as_of is None
+    rows = DISK_CACHE.load(ETF_PANEL_CACHE) if cached else None
+    panel = EtfPanel(rows)
+
+    spot, fund_names, market_amount = map_captured(lambda load: load(), (
+        lambda: safe_get_data(ak.fund_etf_spot_em),
+        lambda: safe_get_data(ak.fund_name_em),
+        lambda: fetch_market_amount(start_date, end_date),
+    ))
+    if not spot.empty and '数据日期' not in spot.columns:
+        spot['数据日期'] = end
+    snapshot = quote_rows(spot if DATA_SOURCE.as_of is None else None)
+
+    # 最后数据早于快照前一个交易日的 ETF 需要补历史（新上市或缓存中断）
+    listed = spot['代码'].astype(str).str.zfill(6).unique() if '代码' in spot.columns else []
+    codes = panel.codes.union(pd.Index(listed))
+    latest = snapshot.index.get_level_values('日期').max() if len(snapshot) else end
+    sessions = get_calendar('SSE').sessions(start, latest)
+    previous = sessions[-2] if len(sessions) > 1 else start
+    last = panel.last_dates().reindex(codes)
+    stale = last[~(last >= previous)]
+    histories = backfill_etf_histories(stale, start_date, end_date) if len(stale) else {}
+    panel = panel.merge(history_rows(histories))
+    panel = panel.merge(snapshot).since(start, end)
+    if cached:
+        DISK_CACHE.save(panel.rows(), ETF_PANEL_CACHE)
+
+    names = spot.set_index(spot['代码'].astype(str).str.zfill(6))['名称'] \
+        if {'代码', '名称'} <= set(spot.columns) else pd.Series(dtype=object)
+    fund_types = fund_names.set_index(fund_names['基金代码'].astype(str).str.zfill(6))['基金类型'] \
+        if {'基金代码', '基金类型'} <= set(fund_names.columns) else pd.Series(dtype=object)
+    types = classify(fund_types.reindex(panel.codes), names.reindex(panel.codes)).reindex(panel.codes)
+    print(f"ETF 面板: {len(panel.codes)} 只 × {len(panel.dates)} 个交易日，补历史 {len(histories)}/{len(stale)} 只")
+    return {'panel': panel, 'names': names, 'types': types, 'market_amount': market_amount,
+            'fetched': len(histories)}
+
+def _yi(value, signed=True):
+    """金额（元）→ 亿"""
+    return f'{value / 1e8:+.0f} 亿' if signed else f'{value / 1e8:.0f} 亿'
+
+def task_etf_report(data):
+    """任务9: ETF 全市场净申赎、分类型规模与成交额占比（整表运算），生成 etf_flow_report.md"""
+    print("\n【任务9】ETF 申赎分析...")
+    start_time = time.time()
+    panel, names, types = data['panel'], data['names'], data['types']
+    if len(panel.dates) < ETF_REPORT_DAYS + 1:
+        print(f"⚠️  ETF 面板数据不足: {len(panel.dates)} 个交易日")
+        log_execution('ETF报告', 'warning', f'面板数据不足: {len(panel.dates)} 个交易日')
+        return
+
+    with TRACER.span('etf_panel', 'compute') as span:
+        window = panel.dates[-(ETF_REPORT_DAYS + 1):]
+        days = window[1:]
+        flow = panel.net_flow().loc[days]
+        totals = flow.sum(min_count=1).dropna()
+        daily_flow = flow.sum(axis=1, min_count=1)
+        aum_type = panel.by_type(panel.aum(), types).loc[window]
+        flow_type = panel.by_type(flow, types).sum()
+        rate = (panel.flow_rate().loc[days] * 100).dropna()
+        amount = panel.amount().loc[days]
+        market = data['market_amount'].reindex(days)
+        ratio = (amount / market * 100).dropna()
+        monthly = daily_flow.groupby(days.to_period('M')).sum()
+        type_counts = types.value_counts()
+        span.set(etfs=len(panel.codes), days=len(days))
+
+    total_flow = float(daily_flow.sum())
+    total_aum = float(aum_type.iloc[-1].sum())
+    top, bottom = totals.nlargest(5), totals.nsmallest(5)
+    bottom = bottom[bottom < 0]
+    label = lambda code: names.get(code) if isinstance(names.get(code), str) else code
+    # 实际份额只来自每日快照，首次运行时期间内没有可差分的两天，相关章节改为说明
+    no_flow = '> 实际份额不足：净申赎只用每日快照份额，需从首次快照起逐日累积，暂无可统计的交易日。'
+
+    ranked = pd.concat([top, bottom.sort_values(ascending=False)]) / 1e8
+    spec = ChartSpec('bars', ETF_CHARTS[0], title=f'近{len(days)}日 Top 5 净创设 vs 净赎回 ETF（亿元）',
+                     series=[('净申赎', ranked.rename(index=label), None, 0)], hlines=[(0, 'gray', '')])
+    if len(ranked) and render_chart_spec(spec):
+        print(f"✅ 图表: {ETF_CHARTS[0]}")
+    plot_data(
+        {name: aum_type[name] / aum_type[name].iloc[0] * 100 for name in aum_type.columns
+         if aum_type[name].iloc[0] > 0},
+        'ETF 规模按类型（期初=100）', [name for name in aum_type.columns if aum_type[name].iloc[0] > 0],
+        ['r', 'b', 'g', 'orange', 'gray'], save_path=ETF_CHARTS[1]
+    )
+    plot_data({'ratio': ratio}, 'ETF 成交额占 A 股比 (%)', ['ETF/A股'], ['b'], save_path=ETF_CHARTS[2])
+    spec = ChartSpec('lines', ETF_CHARTS[3], title='ETF 每日净申赎率 (%)',
+                     series=[('净申赎率', rate, 'r', 1.5)], hlines=[(0, 'gray', '')])
+    if validate_data(rate, 5) and render_chart_spec(spec):
+        print(f"✅ 图表: {ETF_CHARTS[3]}")
+
+    chart = lambda name: CHART_FORMAT.resolve(name)
+    lines = [
+        '# ETF 申赎与成交额占比分析报告', '',
+        f'数据期间：{days[0]:%Y-%m-%d} → {days[-1]:%Y-%m-%d}（{len(days)} 个交易日） · '
+        f'覆盖 {len(panel.codes)} 只 ETF · 数据来源：akshare', '',
+        '## 核心指标', '', '| 指标 | 数值 |', '|------|------|',
+        f'| 覆盖 ETF 数 | {len(panel.codes)} |',
+        f'| 期间净申赎合计 | {_yi(total_flow) if len(totals) else "—"} |',
+        f'| 净申赎覆盖 | {len(totals)} 只（有快照实际份额） |',
+        f'| 净创设 / 净赎回 | {(totals > 0).sum()} 只 / {(totals < 0).sum()} 只 |',
+        f'| 当前日 ETF 占 A 股成交比 | {ratio.iloc[-1]:.2f}% |' if len(ratio) else '| 当前日 ETF 占 A 股成交比 | — |',
+        f'| ETF 总 AUM（期末） | {total_aum / 1e12:.2f} 万亿 |', '', '---', '',
+        '## 1. Top 5 净创设 vs 净赎回 ETF', '',
+    ]
+    if len(totals):
+        lines += [f'![图1]({chart(ETF_CHARTS[0])})', '',
+                  '| 净创设 Top5 | 金额 | 净赎回 Top5 | 金额 |', '|-------------|------|-------------|------|']
+    else:
+        lines.append(no_flow)
+    for i in range(max(len(top), len(bottom))):
+        left = f'{label(top.index[i])} | {_yi(top.iloc[i])}' if i < len(top) else ' | '
+        right = f'{label(bottom.index[i])} | {_yi(bottom.iloc[i])}' if i < len(bottom) else ' | '
+        lines.append(f'| {left} | {right} |')
+    lines += [
+        '', '> 净申赎金额 = Δ份额 × 收盘价，按期间逐日累加；只用快照给出的实际份额，'
+        '由成交量 / 换手率反推的份额误差过大，不参与净申赎、排名与合计。', '', '---', '',
+        '## 2. ETF 总 AUM 时序按类型拆分（份额 × 收盘价）', '', f'![图2]({chart(ETF_CHARTS[1])})', '',
+        '| 类型 | 只数 | 期初 AUM（亿） | 期末 AUM（亿） | 变动（亿） |',
+        '|------|------|---------------|---------------|-----------|',
+    ]
+    for name in aum_type.columns:
+        first, final = aum_type[name].iloc[0], aum_type[name].iloc[-1]
+        lines.append(f'| {name} | {type_counts.get(name, 0)} | {first / 1e8:.0f} | {final / 1e8:.0f} | '
+                     f'{(final - first) / 1e8:+.0f} |')
+    equity_share = aum_type[ETF_TYPES[0]].iloc[-1] / total_aum if total_aum else float('nan')
+    lines += [
+        '', f'> 图中各类型以期初为 100，便于比较走势。股票 ETF 占总 AUM 的 {equity_share:.0%}。', '', '---', '',
+        '## 3. ETF 成交额占 A 股比 —— 时序', '', f'![图3]({chart(ETF_CHARTS[2])})', '',
+    ]
+    if len(ratio):
+        current = ratio.index[-1]
+        lines += [
+            '| 指标 | 当前日数值 | 期间范围 |', '|------|-----------|---------|',
+            f'| ETF 成交额 | {amount[current] / 1e8:.0f} 亿元 | {amount.min() / 1e8:.0f} ~ {amount.max() / 1e8:.0f} 亿 |',
+            f'| A 股成交额 | {market[current] / 1e8:.0f} 亿元 | {market.min() / 1e8:.0f} ~ {market.max() / 1e8:.0f} 亿 |',
+            f'| **ETF 占 A 股比** | **{ratio.iloc[-1]:.2f}%** | {ratio.min():.2f}% ~ {ratio.max():.2f}% |',
+            f'| 期间均值 | **{ratio.mean():.2f}%** | — |',
+        ]
+    else:
+        lines.append('A 股成交额数据缺失。')
+    lines += [
+        '', '> ETF 成交额 = 全市场 ETF 逐只成交额累加；A 股成交额 = 上证综指 + 深证综指成交金额合计。', '', '---', '',
+        '## 4. ETF 每日净申赎率时序（净申赎金额 / 前日总 AUM）', '',
+    ]
+    if len(rate) >= 5:
+        lines += [f'![图4]({chart(ETF_CHARTS[3])})', '']
+    if len(rate):
+        lines += [
+            '| 阶段 | 特征 |', '|------|------|',
+            f'| 期间峰值 | {rate.idxmax().month}/{rate.idxmax().day} 触顶 {rate.max():+.2f}% |',
+            f'| 期间谷值 | {rate.idxmin().month}/{rate.idxmin().day} 触底 {rate.min():+.2f}% |',
+            f'| 最新日 | {rate.iloc[-1]:+.2f}%，{len(rate)} 个交易日中 {(rate < 0).sum()} 天净赎回 |',
+            '', '> 正值 = 当日净创设（资金进场），负值 = 净赎回（资金流出）。',
+        ]
+    else:
+        lines.append(no_flow)
+    lines += ['', '---', '', '## 5. 关键发现', '']
+
+    findings = []
+    equity_flow = flow_type[ETF_TYPES[0]]
+    same_side = flow_type[flow_type * equity_flow > 0].sum()
+    if len(totals):
+        findings.append(f'**股票 ETF 是主体。** {type_counts.get(ETF_TYPES[0], 0)} 只股票 ETF 占 ETF 总 AUM 的 '
+                        f'{equity_share:.0%}，期间净{"创设" if equity_flow >= 0 else "赎回"} {abs(equity_flow) / 1e8:.0f} 亿，'
+                        f'占全部净{"创设" if equity_flow >= 0 else "赎回"}的 {equity_flow / same_side if same_side else 0:.0%}。')
+    else:
+        findings.append(f'**股票 ETF 是主体。** {type_counts.get(ETF_TYPES[0], 0)} 只股票 ETF 占 ETF 总 AUM 的 '
+                        f'{equity_share:.0%}；实际份额尚在累积，暂不统计净申赎。')
+    if len(totals) and len(monthly) > 1:
+        first, final = monthly.iloc[0], monthly.iloc[-1]
+        trend = '月间分歧' if first * final < 0 else '方向一致'
+        findings.append(f'**资金{trend}。** 期间净申赎合计 {_yi(total_flow)}；较早月（{monthly.index[0]}）累计 '
+                        f'{_yi(first)}，最近月（{monthly.index[-1]}）累计 {_yi(final)}。')
+    others = [f'{name.replace("ETF", " ETF")} {_yi(flow_type[name]).replace(" ", "")}'
+              for name in ETF_TYPES[1:] if abs(flow_type[name]) >= 1e8]
+    if len(totals) and others:
+        findings.append(f'**大类之间的资金流向。** {"、".join(others)}，股票 ETF {_yi(equity_flow).replace(" ", "")}。')
+    if len(top) >= 2:
+        findings.append(f'**净创设前二。** {label(top.index[0])} ({_yi(top.iloc[0]).replace(" ", "")})、'
+                        f'{label(top.index[1])} ({_yi(top.iloc[1]).replace(" ", "")}) 是期间净创设主力。')
+    if len(ratio):
+        findings.append(f'**ETF 占 A 股成交比。** 期间均值 {ratio.mean():.1f}%，当前日 {ratio.iloc[-1]:.1f}%'
+                        f'（ETF {amount[current] / 1e8:.0f} 亿 / A 股 {market[current] / 1e8:.0f} 亿）。')
+    lines += [f'{i}. {text}' for i, text in enumerate(findings, 1)]
+    lines += ['', '---', '', '*报告生成时间：动态 · 数据来源：akshare · 脚本：generate_image.py*', '']
+    content = '\n'.join(lines)
+
+    report_name = ETF_REPORT_NAME
+    digest = fingerprint(content)
+    if not BUILD_MANIFEST.fresh(report_name, digest):
+        with open(os.path.join(OUTPUT_DIR, report_name), 'w', encoding='utf-8') as f:
+            f.write(content)
+        BUILD_MANIFEST.record(report_name, digest)
+    print(f"覆盖 {len(panel.codes)} 只 ETF，{len(days)} 个交易日净申赎 {_yi(total_flow) if len(totals) else '—'}，"
+          f"期末 AUM {total_aum / 1e12:.2f} 万亿" + (f"，成交额占 A 股 {ratio.iloc[-1]:.1f}%" if len(ratio) else ''))
+    if len(totals):
+        log_insight('ETF资金', f'近{len(days)}日ETF净申赎{_yi(total_flow).replace(" ", "")}，'
+                               f'股票ETF{_yi(equity_flow).replace(" ", "")}' +
+                    (f'，成交额占A股{ratio.iloc[-1]:.1f}%' if len(ratio) else ''))
+        log_signal('etf_net_flow', round(total_flow / 1e8, 1))
+    log_execution('ETF报告', 'success', f'{len(panel.codes)}只ETF {len(days)}个交易日 耗时 {time.time()-start_time:.2f}s',
+                  report_name)
+
+def task_analysis_summary():
+    """综合解读完成标记"""
+    print("\n" + "📊 市场解读完成".center(70, "="))
+    log_execution('市场解读', 'success', '完成全部维度分析')
+
+# 任务超时（秒）
+FETCH_TIMEOUT = 180
+CHART_TASK_TIMEOUT = 300
+ANALYSIS_TIMEOUT = 120
+
+def build_scheduler(tasks=None):
+    """
+    声明全部任务及其数据依赖
+    任务本身都在线程中运行，图表渲染提交给 CHART_FARM 进程池；声明顺序即执行日志顺序
+    :param tasks: 只运行这些任务及其依赖（任务名或 K线 这样的前缀），None 为全部
+    """
+    start_date_str, end_date_str = analysis_window()
+    scheduler = TaskScheduler(io_workers=16, tracer=TRACER)
+    selected = set()  # 裁剪后的任务名，行情数据任务据此只下载用到的标的
+    
+    # 数据获取（I/O）
+    scheduler.add('行情数据', fetch_kline_data, args=(selected,), timeout=FETCH_TIMEOUT)
+    scheduler.add('融资数据', fetch_margin_data, args=(start_date_str, end_date_str), timeout=FETCH_TIMEOUT)
+    scheduler.add('多指标数据', fetch_indicator_data, args=(start_date_str, end_date_str), timeout=FETCH_TIMEOUT)
+    scheduler.add('油金数据', fetch_oil_gold_data, timeout=FETCH_TIMEOUT)
+    scheduler.add('恒指罗素数据', fetch_hsi_rut_data, after=('行情数据',), timeout=FETCH_TIMEOUT)
+    scheduler.add('股债数据', fetch_pe_bond_data, timeout=FETCH_TIMEOUT)
+    scheduler.add('ETF数据', fetch_etf_data, timeout=ETF_FETCH_TIMEOUT)
+    scheduler.add('指标计算', build_market_indicators, after=('行情数据',), timeout=ANALYSIS_TIMEOUT)
+    
+    # 图表（渲染在 CHART_FARM 进程池中完成）
+    for item in KLINE_INDICES:
+        scheduler.add(f'K线:{item[0]}', plot_kline, args=item[:2], inputs=('行情数据',),
+                      timeout=CHART_TASK_TIMEOUT)
+    scheduler.add('融资余额', task_margin_analysis, inputs=('融资数据',), timeout=CHART_TASK_TIMEOUT)
+    scheduler.add('多指标对比', task_multi_indicator, inputs=('融资数据', '多指标数据'),
+                  timeout=CHART_TASK_TIMEOUT)
+    scheduler.add('油金比', task_oil_gold, inputs=('油金数据',), timeout=CHART_TASK_TIMEOUT)
+    scheduler.add('相关性分析', task_hsi_rut_correlation, inputs=('恒指罗素数据',),
+                  timeout=CHART_TASK_TIMEOUT)
+    scheduler.add('股债利差', task_pe_bond_spread, inputs=('股债数据',), timeout=CHART_TASK_TIMEOUT)
+    scheduler.add('ETF报告', task_etf_report, inputs=('ETF数据',), timeout=CHART_TASK_TIMEOUT)
+    
+    # 综合解读（核心）
+    scheduler.add('指数差异分析', analyze_index_divergence, inputs=('指标计算',), timeout=ANALYSIS_TIMEOUT)
+    scheduler.add('风险环境分析', analyze_risk_regime, inputs=('指标计算',), timeout=ANALYSIS_TIMEOUT)
+    scheduler.add('中美联动分析', analyze_china_us_linkage, inputs=('指标计算',), timeout=ANALYSIS_TIMEOUT)
+    scheduler.add('流动性分析', analyze_liquidity_conditions, after=('融资数据', '多指标数据'),
+                  timeout=ANALYSIS_TIMEOUT)
+    scheduler.add('相关性监控', task_correlation_monitor, inputs=('融资数据', '多指标数据'),
+                  after=('行情数据', '股债利差'), timeout=ANALYSIS_TIMEOUT)
+    scheduler.add('配置回测', task_backtest, inputs=('股债数据',),
+                  after=('风险环境分析', '流动性分析', '股债利差'), timeout=ANALYSIS_TIMEOUT)
+    scheduler.add('市场解读', task_analysis_summary,
+                  after=('指数差异分析', '风险环境分析', '中美联动分析', '流动性分析', '相关性监控', '配置回测'))
+    if tasks:
+        scheduler = scheduler.select(tasks)
+    selected.update(scheduler.tasks)
+    return scheduler
+
+def describe_plan(scheduler):
+    """打印执行计划（不执行）：日期窗口、要下载的 yfinance 标的、按声明顺序的任务及其依赖"""
+    start_date_str, end_date_str = analysis_window()
+    print(f"as-of: {DATA_SOURCE.now():%Y-%m-%d}  回看: {LOOKBACK_DAYS}天 ({start_date_str} ~ {end_date_str})")
+    if '行情数据' in scheduler.tasks:
+        widest = {}
+        for ticker, period in market_data_windows(scheduler.tasks):
+            if ticker not in widest or period_days(period) > period_days(widest[ticker]):
+                widest[ticker] = period
+        print(f"yfinance 标的 ({len(widest)}): " + ", ".join(f"{t} {p}" for t, p in widest.items()))
+    print(f"任务 ({len(scheduler.tasks)}):")
+    for i, task in enumerate(scheduler.tasks.values(), 1):
+        summary = (task.func.__doc__ or task.func.__name__).strip().splitlines()[0]
+        deps = f"  ← {', '.join(task.deps)}" if task.deps else ''
+        print(f"  {i:>2}. {task.name}: {summary}{deps}")
+
+def replay_task_result(result):
+    """按声明顺序回放任务输出与日志"""
+    if result.output:
+        sys.stdout.write(result.output)
+    for event in result.events:
+        apply_log_event(event)
+    if result.status in ('error', 'timeout'):
+        print(f"❌ 任务失败 {result.name}: {result.error}")
+        log_execution(result.name, 'error', result.error)
+    elif result.status == 'skipped':
+        print(f"⏭️  任务跳过 {result.name}: {result.error}")
+        log_execution(result.name, 'warning', result.error)
+
+def report_fetch_health():
+    """记录本次运行中出现超时、失败、熔断或对冲的数据源"""
+    stats = FETCHER.stats()
+    EXECUTION_LOG['data_sources'] = stats
+    for name, item in stats.items():
+        if item['timeouts'] or item['failures'] or item['rejected'] or item['hedged'] or item['state'] != 'closed':
+            log_execution('数据源', 'warning',
+                          f"{name}: 调用{item['calls']} 超时{item['timeouts']} 失败{item['failures']} "
+                          f"重试{item['retries']} 熔断拒绝{item['rejected']} 对冲{item['hedged']} ({item['state']})")
+
+def set_as_of(date):
+    """按历史日期运行：数据截止到该日，日期窗口从该日往前数，信号历史库只读"""
+    if not DATA_SOURCE.live:
+        raise ValueError(f'--as-of 只能在 live 模式下使用（当前 {DATA_SOURCE.mode}，归档中的窗口按录制日期固定）')
+    as_of = pd.Timestamp(date).normalize()
+    DATA_SOURCE.as_of = MARKET_DATA.as_of = as_of
+    SIGNAL_HISTORY.freeze(as_of)
+
+def main(tasks=None, keep_warm=False, group=None):
+    """
+    主执行函数
+    :param tasks: 只运行这些任务及其依赖，None 为全部（部分运行不重新生成 Markdown/HTML 报告）
+    :param keep_warm: 结束后保留渲染进程池（常驻服务）
+    :param group: 常驻服务的刷新分组名，执行报告按分组分别保存（见 save_execution_report）
+    """
+    EVENT_LOG.start()
+    EXECUTION_LOG.reset()
+    FETCHER.reset_stats()
+    EXECUTION_LOG['start_time'] = datetime.now().isoformat()
+    EVENT_LOG.write('run', {'status': 'start', 'mode': DATA_SOURCE.mode})
+    print("\n" + "="*70)
+    print("金融数据分析程序启动")
+    print(f"运行时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"输出目录: {os.path.abspath(OUTPUT_DIR)}")
+    if not DATA_SOURCE.live:
+        print(f"数据源模式: {DATA_SOURCE.mode} ({DATA_SOURCE.archive})")
+    print("="*70)
+    
+    check_available_fonts()
+    
+    start_time = time.time()
     try:
-        analyze_index_divergence()
-        analyze_risk_regime()
-        analyze_china_us_linkage()
-        analyze_liquidity_conditions()
-        print("\n" + "📊 市场解读完成".center(70, "="))
-        log_execution('市场解读', 'success', '完成全部维度分析')
-    except Exception as e:
-        print(f"❌ 市场解读失败: {e}")
-        log_execution('市场解读', 'error', str(e))
+        with TRACER.span('scheduler', 'run'):
+            results = build_scheduler(tasks).run(on_result=replay_task_result)
+    finally:
+        if not keep_warm:
+            CHART_FARM.shutdown()
+    success_count = len([r for r in results.values() if r.status == 'success'])
+    total_tasks = len(results)
+    report_fetch_health()
     
     # 生成报告
-    save_execution_report()
-    generate_markdown_report()
+    save_execution_report(group)
+    if group:
+        print("⏭️  常驻服务分组刷新，Markdown/HTML 报告由各分组汇总合并后重新生成")
+    elif tasks:
+        print("⏭️  只运行了部分任务，保留原有 Markdown/HTML 报告")
+    else:
+        generate_markdown_report()
+        prerender_html_reports()
+    BUILD_MANIFEST.save()
+    SIGNAL_HISTORY.save()
+    recorded = DATA_SOURCE.save()
+    if recorded:
+        print(f"📼 已录制 {recorded} 个数据源响应: {DATA_SOURCE.archive}")
     
     # 总结
     EXECUTION_LOG['end_time'] = datetime.now().isoformat()
     EXECUTION_LOG['total_time'] = f"{time.time() - start_time:.2f}s"
+    EVENT_LOG.write('run', {'status': 'end', 'success': success_count, 'total': total_tasks,
+                            'total_time': EXECUTION_LOG['total_time']})
     
     print("\n" + "="*70)
     print(f"执行完成: {success_count}/{total_tasks} 任务成功")
     print(f"总耗时: {time.time() - start_time:.2f}秒")
-    print(f"图表输出: {len([t for t in EXECUTION_LOG['tasks'] if t['chart_path']])} 张")
-    print(f"风险提示: {len(EXECUTION_LOG['warnings'])} 个")
+    print(f"图表输出: {len(EXECUTION_LOG['charts'])} 张")
+    print(f"风险提示: {EXECUTION_LOG['task_counts'].get('warning', 0)} 个")
+    print(f"事件日志: {EVENT_LOG.path}")
+    slowest = TRACER.summary(cat='fetch', top=3)
+    if slowest:
+        print("最慢数据源: " + ", ".join(f"{e['name']} {e['wall_ms'] / 1000:.2f}s" for e in slowest))
     print(f"查看输出: ls -lh {os.path.abspath(OUTPUT_DIR)}")
     print("="*70)
     
     return success_count, total_tasks
 
-if __name__ == "__main__":
-    success, total = main()
-    sys.exit(0)
+# 常驻服务的刷新分组：(名称, 刷新间隔秒, 任务)，各分组按自己的周期只重跑这些任务及其依赖；
+# 任务列表中直接列出 行情数据 的分组负责刷新内存中的 yfinance 行情，其余分组复用已下载的行情
+SERVICE_JOBS = [
+    ('行情', 900, ('行情数据', 'K线', '指数差异分析', '风险环境分析', '中美联动分析', '相关性分析')),
+    ('资金面', 3600, ('融资余额', '多指标对比', '流动性分析', 'ETF报告')),
+    ('股债', 3600, ('股债利差', '油金比')),
+    ('综合', 4 * 3600, ('相关性监控', '配置回测', '市场解读')),
+]
+SERVICE_PORT = 8765
+
+# 常驻服务各分组最近一次的执行汇总，合并后生成整体的执行报告与 Markdown/HTML 报告
+SERVICE_SUMMARIES = {}
+
+def service_refresh(name, tasks):
+    """常驻服务的一次分组刷新：执行报告按分组保存，随后重新生成整体报告，返回本次执行汇总的副本"""
+    if '行情数据' in tasks:
+        MARKET_DATA.clear()
+    main(tasks, keep_warm=True, group=name)
+    summary = copy.deepcopy(dict(EXECUTION_LOG))
+    SERVICE_SUMMARIES[name] = summary
+    write_service_reports()
+    return summary
+
+def write_service_reports():
+    """合并各分组最近一次的执行汇总，写出 执行报告.json 并重新生成 Markdown/HTML 报告"""
+    EXECUTION_LOG.reset()
+    for summary in SERVICE_SUMMARIES.values():
+        EXECUTION_LOG.merge(summary)
+    save_execution_report()
+    generate_markdown_report()
+    prerender_html_reports()
+    BUILD_MANIFEST.save()
+
+# 盘中模式：风险环境与中美联动用到的标的按分钟线增量更新，只重算这两项解读
+INTRADAY_SYMBOLS = ['^VIX', '^TNX', '^GSPC', '^HSI', 'CNY=X']
+INTRADAY_INTERVAL = '1m'
+INTRADAY_POLL = 300
+INTRADAY_STATE = None
+_INTRADAY_DAY = None
 
+def intraday_state():
+    """盘中指标状态：每天首次使用时由日线（3个月窗口）建立，之后只喂入新的分钟线"""
+    global INTRADAY_STATE, _INTRADAY_DAY
+    today = signal_date()
+    if INTRADAY_STATE is None or _INTRADAY_DAY != today:
+        periods = dict(ANALYSIS_SYMBOLS)
+        INTRADAY_STATE = IntradayState({symbol: MARKET_DATA.close(symbol, periods[symbol])
+                                        for symbol in INTRADAY_SYMBOLS})
+        _INTRADAY_DAY = today
+    return INTRADAY_STATE
+
+def intraday_refresh():
+    """盘中刷新：拉取分钟线增量更新指标，重新给出风险环境与中美联动信号，返回本次执行汇总的副本"""
+    EVENT_LOG.start()
+    EXECUTION_LOG.reset()
+    start = time.time()
+    state = intraday_state()
+    try:
+        bars = MARKET_DATA.poll(INTRADAY_SYMBOLS, INTRADAY_INTERVAL)
+    except Exception as e:
+        bars = {}
+        log_execution('盘中刷新', 'warning', f'分钟线获取失败，沿用上次状态: {e}')
+    fed = state.update(bars)
+    updated = state.updated.strftime('%Y-%m-%d %H:%M') if state.updated is not None else '无分钟线'
+    print(f"\n⏱️  盘中刷新 {datetime.now().strftime('%H:%M:%S')}: 新K线 {fed} 根，最新 {updated}")
+    analyze_risk_regime(state)
+    analyze_china_us_linkage(state)
+    log_execution('盘中刷新', 'success', f'新K线 {fed} 根，最新 {updated}，耗时 {time.time() - start:.2f}s')
+    return copy.deepcopy(dict(EXECUTION_LOG))
+
+def intraday(interval=INTRADAY_POLL):
+    """盘中模式（前台）：每隔 interval 秒刷新一次，Ctrl-C 退出"""
+    try:
+        while True:
+            intraday_refresh()
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        SIGNAL_HISTORY.save()
+
+def serve(host='127.0.0.1', port=SERVICE_PORT):
+    """
+    常驻服务：进程与导入的库、行情、数据源结果、信号历史和渲染进程池都保持常驻，
+    各分组按 SERVICE_JOBS 的周期刷新（另有每 INTRADAY_POLL 秒一次的盘中分组），最新结果通过本地 HTTP JSON 接口提供
+    """
+    global WARM_DATA
+    WARM_DATA = TTLCache()
+    jobs = [RefreshJob(name, interval, functools.partial(service_refresh, name, tasks))
+            for name, interval, tasks in SERVICE_JOBS]
+    # 盘中分组放在最后，交易时段内其信号覆盖日线分组的同名信号
+    jobs.append(RefreshJob('盘中', INTRADAY_POLL, intraday_refresh))
+    service = SignalService(jobs, OUTPUT_DIR, logger=log_execution)
+    print(f"常驻服务: http://{host}:{port}/api/latest （/api/signals /api/insights /api/charts /api/status，"
+          f"POST /api/refresh/<分组> 立即刷新）")
+    try:
+        service.serve(host, port)
+    finally:
+        CHART_FARM.shutdown()
+        SIGNAL_HISTORY.save()
+
+def cli(argv=None):
+    """命令行入口：选择任务、指定 as-of 日期与回看天数，或只打印执行计划"""
+    global LOOKBACK_DAYS
+    import argparse
+    parser = argparse.ArgumentParser(description='金融数据分析：下载行情、生成图表与市场解读')
+    parser.add_argument('tasks', nargs='*',
+                        help='只运行这些任务及其依赖（如 油金比 风险环境分析 K线:^VIX，K线 表示全部K线），默认全部')
+    parser.add_argument('--as-of', help='按历史日期运行 (YYYY-MM-DD)：数据截止到该日，信号历史库只读')
+    parser.add_argument('--lookback', type=int, default=LOOKBACK_DAYS,
+                        help=f'akshare 日期窗口与恒指/罗素对比的回看天数（默认 {LOOKBACK_DAYS}）')
+    parser.add_argument('--dry-run', action='store_true', help='只打印数据下载与任务计划，不执行')
+    parser.add_argument('--list', action='store_true', help='列出全部任务')
+    parser.add_argument('--serve', type=int, nargs='?', const=SERVICE_PORT, metavar='PORT',
+                        help=f'常驻服务模式：按分组周期刷新，在本地端口（默认 {SERVICE_PORT}）提供 JSON 接口')
+    parser.add_argument('--host', default='127.0.0.1', help='常驻服务监听地址（默认 127.0.0.1）')
+    parser.add_argument('--intraday', type=int, nargs='?', const=INTRADAY_POLL, metavar='SECONDS',
+                        help=f'盘中模式：每隔 SECONDS 秒（默认 {INTRADAY_POLL}）拉取分钟线，增量更新风险环境与中美联动信号')
+    args = parser.parse_args(argv)
+    if args.serve is not None and (args.tasks or args.as_of or args.dry_run):
+        parser.error('--serve 不能与任务选择、--as-of 或 --dry-run 同时使用')
+    if args.intraday is not None and (args.tasks or args.as_of or args.dry_run or args.serve is not None):
+        parser.error('--intraday 不能与任务选择、--as-of、--dry-run 或 --serve 同时使用')
+    if args.intraday is not None and args.intraday <= 0:
+        parser.error('--intraday 的刷新间隔必须为正数')
+
+    if args.lookback <= 0:
+        parser.error('--lookback 必须为正数')
+    LOOKBACK_DAYS = args.lookback
+    try:
+        if args.as_of:
+            set_as_of(args.as_of)
+        scheduler = build_scheduler(args.tasks)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.list:
+        print("\n".join(scheduler.tasks))
+        return 0
+    if args.dry_run:
+        describe_plan(scheduler)
+        return 0
+    if args.serve is not None:
+        serve(args.host, args.serve)
+        return 0
+    if args.intraday is not None:
+        intraday(args.intraday)
+        return 0
+    main(args.tasks or None)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(cli())
@@ -0,0 +1,410 @@
+# -*- coding: utf-8 -*-
+"""
+配置规则的向量化历史回测：对多年历史的每个交易日一次性重算风险评分、股债性价比与流动性评分，
+按报告中的配置规则（30/50/20、70/20/10、50/40/10）模拟次日调仓的组合收益；
+参数扫描把阈值组合排成 (变体数 × 交易日) 矩阵整块计算，分块并行到进程池
+
+    python src/backtest.py [--workers 4] [--set vix_high=20,25,30] [--top 20] [--output 回测.json]
+"""
+import os
+import sys
+import json
+import time
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+PERIODS_PER_YEAR = 252
+# 10年期国债的近似久期，用收益率日变化估算债券日收益
+BOND_DURATION = 8.0
+
+# 与 analyze_risk_regime / plot_pe_bond_spread / analyze_liquidity_conditions 中的阈值一致
+RULE_DEFAULTS = {
+    'vix_low': 15.0, 'vix_high': 25.0, 'vix_extreme': 35.0,
+    'tnx_low': 3.0, 'tnx_high': 4.5,
+    'risk_high': 3, 'risk_low': -1,
+    'spread_high': -3.0, 'spread_low': -7.0,
+    'margin_fast': 1.0, 'shibor_low': 2.5, 'shibor_high': 3.0, 'cnus_wide': 50.0,
+}
+
+# 报告中的配置（股票, 债券, 现金），顺序即配置编号
+ALLOCATIONS = {
+    '保守': (0.3, 0.5, 0.2),   # 🔴 高风险
+    '进取': (0.7, 0.2, 0.1),   # 🟢 低风险且股票性价比高
+    '平衡': (0.5, 0.4, 0.1),   # 其余
+}
+_WEIGHTS = np.array(list(ALLOCATIONS.values()))
+_DEFENSIVE, _AGGRESSIVE, _BALANCED = range(3)
+
+# 默认扫描网格：影响配置的阈值（vix_extreme、spread_low 与流动性阈值只影响解读，见 regime_table）
+DEFAULT_GRID = {
+    'vix_low': [12, 13, 14, 15, 16, 17, 18],
+    'vix_high': [20, 22, 25, 28, 30, 35],
+    'tnx_low': [2.5, 3.0, 3.5],
+    'tnx_high': [4.0, 4.5, 5.0],
+    'risk_high': [2, 3],
+    'spread_high': [-2.0, -2.5, -3.0, -3.5, -4.0, -5.0],
+}
+
+# 变体数 × 交易日超过该值且有多核时才启用进程池（spawn 子进程导入 numpy/pandas 约需 1 秒）
+PARALLEL_CELLS = 50_000_000
+
+METRIC_COLUMNS = ['cagr', 'volatility', 'sharpe', 'max_drawdown', 'switches_per_year',
+                  'share_保守', 'share_进取', 'share_平衡']
+
+
+def _clean(series):
+    """无时区日期索引、升序、去重的浮点序列"""
+    series = pd.to_numeric(pd.Series(series), errors='coerce').dropna()
+    index = pd.to_datetime(series.index, errors='coerce')
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    series = pd.Series(series.to_numpy(dtype=float), index=index.normalize())
+    series = series[series.index.notna()]
+    return series[~series.index.duplicated(keep='last')].sort_index()
+
+
+class BacktestInputs:
+    def __init__(self, equity, bond_yield, cash_rate, vix, us10y, spread, margin=None, cnus_spread=None,
+                 duration=BOND_DURATION, trend_period=10):
+        """
+        回测输入：全部序列对齐到权益资产的交易日历（只向前填充，不引入未来数据），
+        从所有必需序列都有值的第一天开始
+        :param equity: 权益资产价格（如上证50指数）
+        :param bond_yield: 债券资产的到期收益率（%），按久期估算日收益
+        :param cash_rate: 现金利率（%，如 Shibor 1M）
+        :param vix: VIX；趋势按 VIX 自身日历的近 trend_period 日均值对比前 trend_period 日均值
+        :param us10y: 美债10年收益率（%）
+        :param spread: 股债利差（%）
+        :param margin: 融资余额（可选），5 日变化率按自身日历计算
+        :param cnus_spread: 中美利差（可选）
+        """
+        equity = _clean(equity)
+        vix = _clean(vix)
+        n = trend_period
+        recent = vix.rolling(n).mean()
+        columns = {
+            'equity': equity,
+            'bond_yield': _clean(bond_yield),
+            'cash_rate': _clean(cash_rate),
+            'vix': vix,
+            'vix_up': (recent > recent.shift(n)).astype(float).where(recent.shift(n).notna()),
+            'us10y': _clean(us10y),
+            'spread': _clean(spread),
+        }
+        optional = {
+            'margin_change': _clean(margin).pct_change(5, fill_method=None) * 100 if margin is not None else None,
+            'cnus_spread': _clean(cnus_spread) if cnus_spread is not None else None,
+        }
+        frame = pd.concat(columns, axis=1).sort_index().ffill().reindex(equity.index)
+        frame = frame.dropna()
+        for name, series in optional.items():
+            values = series.reindex(series.index.union(frame.index)).ffill().reindex(frame.index) \
+                if series is not None and len(series) else pd.Series(np.nan, index=frame.index)
+            frame[name] = values.to_numpy()
+
+        self.index = frame.index
+        self.columns = {name: frame[name].to_numpy(dtype=float) for name in frame.columns}
+        self.columns['vix_up'] = self.columns['vix_up'].astype(np.int8)
+        # 第 t 天持有资产的日收益：权益涨跌、债券票息减久期×收益率变化、现金按前一日利率计息
+        yields = self.columns['bond_yield'] / 100
+        asset_returns = np.zeros((3, len(frame)))
+        asset_returns[0, 1:] = np.diff(self.columns['equity']) / self.columns['equity'][:-1]
+        asset_returns[1, 1:] = yields[:-1] / PERIODS_PER_YEAR - duration * np.diff(yields)
+        asset_returns[2, 1:] = self.columns['cash_rate'][:-1] / 100 / PERIODS_PER_YEAR
+        self.asset_returns = asset_returns
+        # 三种配置的日收益 (3, T)
+        self.allocation_returns = _WEIGHTS @ asset_returns
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+
+def _as_params(params):
+    """参数 dict（标量或等长数组）-> {名称: (K, 1) 数组}，未给出的取默认值"""
+    merged = {**RULE_DEFAULTS, **(params or {})}
+    size = max(np.size(v) for v in merged.values())
+    return {k: np.broadcast_to(np.asarray(v, dtype=float).reshape(-1, 1), (size, 1)) for k, v in merged.items()}
+
+
+def risk_scores(inputs, params=None):
+    """综合风险评分 (K, T)：VIX 高/低、美债高/低、VIX 五日趋势向上"""
+    p = _as_params(params)
+    vix, us10y = inputs['vix'], inputs['us10y']
+    score = 2 * (vix > p['vix_high']).astype(np.int8)
+    score -= (vix < p['vix_low'])
+    score += (us10y > p['tnx_high'])
+    score -= (us10y < p['tnx_low'])
+    score += inputs['vix_up']
+    return score
+
+
+def liquidity_scores(inputs, params=None):
+    """流动性评分 (K, T)：融资余额 5 日变化、Shibor 高低、中美利差走阔（缺失数据不计分）"""
+    p = _as_params(params)
+    margin, shibor, cnus = inputs['margin_change'], inputs['cash_rate'], inputs['cnus_spread']
+    with np.errstate(invalid='ignore'):
+        score = (margin > p['margin_fast']).astype(np.int8)
+        score -= (margin < -p['margin_fast'])
+        score += (shibor < p['shibor_low'])
+        score -= (shibor > p['shibor_high'])
+        score -= (cnus > p['cnus_wide'])
+    return score
+
+
+def allocations(inputs, params=None):
+    """每个交易日收盘后的配置编号 (K, T)：高风险→保守，低风险且股票性价比高→进取，其余→平衡"""
+    p = _as_params(params)
+    risk = risk_scores(inputs, p)
+    cheap = inputs['spread'] > p['spread_high']
+    choice = np.full(risk.shape, _BALANCED, dtype=np.int8)
+    choice[(risk <= p['risk_low']) & cheap] = _AGGRESSIVE
+    choice[risk >= p['risk_high']] = _DEFENSIVE
+    return choice
+
+
+def portfolio_returns(inputs, choice):
+    """按前一日收盘的配置持有当日的组合收益 (K, T-1)"""
+    days = np.arange(1, len(inputs))
+    return inputs.allocation_returns[choice[:, :-1], days]
+
+
+def metrics(returns, cash=None, choice=None):
+    """
+    每行收益序列的绩效指标
+    :param returns: (K, T) 日收益
+    :param cash: (T,) 现金日收益，夏普按超额收益计算
+    :param choice: (K, T+1) 配置编号，给出时统计换仓次数与各配置时间占比
+    :return: {指标: (K,) 数组}
+    """
+    returns = np.atleast_2d(returns)
+    years = returns.shape[1] / PERIODS_PER_YEAR
+    log_nav = np.cumsum(np.log1p(returns), axis=1)
+    excess = returns - (cash if cash is not None else 0.0)
+    std = returns.std(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = {
+            'cagr': np.expm1(log_nav[:, -1] / years),
+            'volatility': std * np.sqrt(PERIODS_PER_YEAR),
+            'sharpe': excess.mean(axis=1) / std * np.sqrt(PERIODS_PER_YEAR),
+            'max_drawdown': np.expm1((log_nav - np.maximum.accumulate(np.maximum(log_nav, 0), axis=1)).min(axis=1)),
+        }
+    if choice is not None:
+        result['switches_per_year'] = (choice[:, 1:] != choice[:, :-1]).sum(axis=1) / years
+        for i, name in enumerate(ALLOCATIONS):
+            result[f'share_{name}'] = (choice == i).mean(axis=1)
+    return result
+
+
+def run_backtest(inputs, params=None):
+    """
+    单组参数的回测
+    :return: (每日明细 DataFrame, {组合: 指标 dict})，组合含规则配置、静态平衡配置与权益资产本身
+    """
+    p = _as_params(params)
+    choice = allocations(inputs, p)
+    returns = portfolio_returns(inputs, choice)
+    cash = inputs.asset_returns[2, 1:]
+    names = list(ALLOCATIONS)
+    daily = pd.DataFrame({
+        'risk_score': risk_scores(inputs, p)[0],
+        'liquidity_score': liquidity_scores(inputs, p)[0],
+        'allocation': [names[i] for i in choice[0]],
+        'return': np.concatenate([[0.0], returns[0]]),
+    }, index=inputs.index)
+    daily['nav'] = (1 + daily['return']).cumprod()
+
+    def summary(values, choice=None):
+        return {k: float(v[0]) for k, v in metrics(values, cash, choice).items()}
+
+    benchmarks = {
+        '规则配置': summary(returns, choice),
+        '静态平衡': summary(inputs.allocation_returns[_BALANCED:_BALANCED + 1, 1:]),
+        '权益资产': summary(inputs.asset_returns[0:1, 1:]),
+    }
+    return daily, benchmarks
+
+
+def regime_table(inputs, params=None, horizon=20):
+    """
+    各信号分档之后 horizon 个交易日的权益收益：检验阈值划分出的区间是否真的有区分度
+    :return: DataFrame(信号, 区间, 天数, 占比, 平均远期收益, 上涨概率)
+    """
+    p = {k: float(np.asarray(v).ravel()[0]) for k, v in _as_params(params).items()}
+    equity = inputs['equity']
+    forward = np.full(len(equity), np.nan)
+    forward[:-horizon] = equity[horizon:] / equity[:-horizon] - 1
+    risk = risk_scores(inputs, p)[0]
+    liquidity = liquidity_scores(inputs, p)[0]
+    vix, spread = inputs['vix'], inputs['spread']
+    groups = {
+        '风险等级': {
+            '高风险': risk >= p['risk_high'],
+            '中风险': (risk >= 1) & (risk < p['risk_high']),
+            '中等风险': (risk > p['risk_low']) & (risk < 1),
+            '低风险': risk <= p['risk_low'],
+        },
+        'VIX区间': {
+            f"<{p['vix_low']:g}": vix < p['vix_low'],
+            f"{p['vix_low']:g}-{p['vix_high']:g}": (vix >= p['vix_low']) & (vix <= p['vix_high']),
+            f"{p['vix_high']:g}-{p['vix_extreme']:g}": (vix > p['vix_high']) & (vix <= p['vix_extreme']),
+            f">{p['vix_extreme']:g}": vix > p['vix_extreme'],
+        },
+        '股票性价比': {
+            f"高(>{p['spread_high']:g})": spread > p['spread_high'],
+            '中性': (spread >= p['spread_low']) & (spread <= p['spread_high']),
+            f"极低(<{p['spread_low']:g})": spread < p['spread_low'],
+        },
+        '流动性': {'宽松': liquidity >= 1, '中性': liquidity == 0, '紧张': liquidity <= -1},
+    }
+    valid = ~np.isnan(forward)
+    rows = []
+    for signal, buckets in groups.items():
+        for bucket, mask in buckets.items():
+            selected = forward[mask & valid]
+            rows.append({
+                '信号': signal, '区间': bucket, '天数': int(mask.sum()), '占比': float(mask.mean()),
+                '平均远期收益': float(selected.mean()) if len(selected) else float('nan'),
+                '上涨概率': float((selected > 0).mean()) if len(selected) else float('nan'),
+            })
+    return pd.DataFrame(rows)
+
+
+def parameter_grid(grid=None, base=None):
+    """网格的笛卡尔积 -> {参数名: (K,) 数组}，网格外的参数取 base / 默认值"""
+    grid = grid or DEFAULT_GRID
+    names = list(grid)
+    combos = np.array(list(itertools.product(*(grid[name] for name in names))), dtype=float)
+    params = {name: combos[:, i] for i, name in enumerate(names)}
+    for name, value in {**RULE_DEFAULTS, **(base or {})}.items():
+        params.setdefault(name, np.full(len(combos), value, dtype=float))
+    return params
+
+
+def _evaluate(inputs, params):
+    choice = allocations(inputs, params)
+    return metrics(portfolio_returns(inputs, choice), inputs.asset_returns[2, 1:], choice)
+
+
+_WORKER_INPUTS = None
+
+
+def _init_worker(inputs):
+    global _WORKER_INPUTS
+    _WORKER_INPUTS = inputs
+
+
+def _evaluate_chunk(params):
+    return _evaluate(_WORKER_INPUTS, params)
+
+
+def sweep(inputs, grid=None, base=None, workers=None, chunk=256):
+    """
+    参数扫描：每块 chunk 个变体整块向量化计算，块数较多时分发到进程池
+    :param grid: {参数名: 候选值列表}，默认 DEFAULT_GRID
+    :param base: 网格外参数的取值（默认 RULE_DEFAULTS）
+    :param workers: 进程数；None 时按计算量自动选择（小规模扫描在当前进程计算更快）
+    :return: DataFrame（扫描参数列 + 指标列），按夏普降序
+    """
+    params = parameter_grid(grid, base)
+    size = len(next(iter(params.values())))
+    chunks = [{k: v[i:i + chunk] for k, v in params.items()} for i in range(0, size, chunk)]
+    if workers is None:
+        workers = min(4, os.cpu_count() or 1) if size * len(inputs) >= PARALLEL_CELLS else 1
+
+    if workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_worker, initargs=(inputs,)) as pool:
+            parts = list(pool.map(_evaluate_chunk, chunks))
+    else:
+        parts = [_evaluate(inputs, part) for part in chunks]
+
+    result = pd.DataFrame({name: params[name] for name in (grid or DEFAULT_GRID)})
+    for column in METRIC_COLUMNS:
+        result[column] = np.concatenate([part[column] for part in parts])
+    return result.sort_values('sharpe', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def inputs_from_sources(pe_frame, bond_frame, history, **kwargs):
+    """
+    由上证50估值（含指数点位）、中美国债收益率与信号历史库组装回测输入
+    权益=上证50，债券=中国10年国债，现金=Shibor 1M；VIX、美债、股债利差、融资余额、中美利差取自历史库
+    :return: BacktestInputs，数据不足时为 None
+    """
+    if pe_frame is None or bond_frame is None or pe_frame.empty or bond_frame.empty:
+        return None
+    if '指数' not in pe_frame.columns or '中国国债收益率10年' not in bond_frame.columns:
+        return None
+    series = {name: history.series(name) for name in ('VIX', 'US10Y', '股债利差', 'Shibor 1M', '融资余额', '中美利差')}
+    if any(series[name].empty for name in ('VIX', 'US10Y', '股债利差', 'Shibor 1M')):
+        return None
+    inputs = BacktestInputs(
+        equity=pe_frame.set_index(pd.to_datetime(pe_frame['日期'], errors='coerce'))['指数'],
+        bond_yield=bond_frame.set_index(pd.to_datetime(bond_frame['日期'], errors='coerce'))['中国国债收益率10年'],
+        cash_rate=series['Shibor 1M'], vix=series['VIX'], us10y=series['US10Y'], spread=series['股债利差'],
+        margin=series['融资余额'], cnus_spread=series['中美利差'], **kwargs
+    )
+    return inputs if len(inputs) > 1 else None
+
+
+def _parse_set(values):
+    """--set name=v1,v2 -> {name: [v1, v2]}"""
+    grid = {}
+    for item in values or ():
+        name, _, candidates = item.partition('=')
+        if name not in RULE_DEFAULTS:
+            raise SystemExit(f'未知参数: {name}（可选: {", ".join(RULE_DEFAULTS)}）')
+        grid[name] = [float(v) for v in candidates.split(',') if v]
+    return grid
+
+
+def main():
+    import argparse
+    from disk_cache import DiskCache
+    from signal_history import SignalHistory
+
+    parser = argparse.ArgumentParser(description='配置规则历史回测与参数扫描（读取本地缓存与信号历史库，不访问网络）')
+    parser.add_argument('--set', action='append', metavar='NAME=V1,V2', help='扫描网格（可重复，替换默认网格）')
+    parser.add_argument('--workers', type=int, help='进程数（默认按变体数自动选择）')
+    parser.add_argument('--top', type=int, default=10, help='显示夏普最高的前 N 组')
+    parser.add_argument('--output', help='把扫描结果写入 JSON')
+    args = parser.parse_args()
+
+    cache = DiskCache()
+    inputs = inputs_from_sources(
+        cache.load('stock_index_pe_lg', symbol='上证50'), cache.load('bond_zh_us_rate'), SignalHistory()
+    )
+    if inputs is None:
+        raise SystemExit('本地缓存或信号历史库数据不足，先完整运行一次 generate_image.py')
+
+    grid = _parse_set(args.set) or DEFAULT_GRID
+    _, benchmarks = run_backtest(inputs)
+    print(f"回测区间: {inputs.index[0]:%Y-%m-%d} ~ {inputs.index[-1]:%Y-%m-%d}（{len(inputs)} 个交易日）")
+    for name, item in benchmarks.items():
+        print(f"  {name}: 年化 {item['cagr']:+.2%} 波动 {item['volatility']:.2%} "
+              f"夏普 {item['sharpe']:.2f} 最大回撤 {item['max_drawdown']:.2%}")
+
+    start = time.time()
+    result = sweep(inputs, grid, workers=args.workers)
+    print(f"\n扫描 {len(result)} 组参数 耗时 {time.time() - start:.2f}s，夏普最高的 {args.top} 组:")
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(result.head(args.top).to_string(float_format=lambda v: f'{v:.3f}'))
+    print("\n信号分档后20日权益收益（当前阈值）:")
+    print(regime_table(inputs).to_string(index=False, float_format=lambda v: f'{v:.3f}'))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'start': f'{inputs.index[0]:%Y-%m-%d}', 'end': f'{inputs.index[-1]:%Y-%m-%d}',
+                       'benchmarks': benchmarks,
+                       'sweep': result.astype(object).where(result.notna(), None).to_dict(orient='records')},
+                      f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
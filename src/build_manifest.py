@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+增量构建清单：记录每个输出文件（图表、报告）的输入指纹，
+输入未变化且文件仍在时跳过重新生成，避免周末/节假日运行改写 output/
+"""
+import os
+import json
+import hashlib
+import threading
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+MANIFEST_NAME = '.build_manifest.json'
+
+
+def _update(digest, obj):
+    """把对象按稳定的方式写入哈希"""
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        digest.update(type(obj).__name__.encode())
+        names = list(obj.columns) if isinstance(obj, pd.DataFrame) else [obj.name]
+        digest.update(json.dumps(names, ensure_ascii=False, default=str).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+    elif isinstance(obj, np.ndarray):
+        digest.update(str(obj.dtype).encode())
+        digest.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, dict):
+        digest.update(b'{')
+        for key in sorted(obj, key=str):
+            _update(digest, key)
+            _update(digest, obj[key])
+        digest.update(b'}')
+    elif isinstance(obj, (list, tuple)):
+        digest.update(b'[')
+        for item in obj:
+            _update(digest, item)
+        digest.update(b']')
+    else:
+        digest.update(repr(obj).encode('utf-8'))
+        digest.update(b';')
+
+
+def fingerprint(*parts):
+    """由数据与参数计算内容指纹"""
+    digest = hashlib.sha1()
+    for part in parts:
+        _update(digest, part)
+    return digest.hexdigest()
+
+
+def log_fingerprint(execution_log, *extra):
+    """
+    报告输入指纹：只取决定报告正文的内容（洞察、信号、告警、任务状态），
+    不含生成时间、耗时等每次运行都会变化的字段
+    """
+    tasks = [(t.get('task'), t.get('status'), t.get('chart_path')) for t in execution_log.get('tasks', [])]
+    # 精简汇总（event_log.LogSummary）只保留每个任务的最后状态与图表列表
+    tasks += sorted(execution_log.get('task_status', {}).items())
+    return fingerprint(
+        execution_log.get('insights', []), execution_log.get('market_signals', {}),
+        execution_log.get('warnings', []), execution_log.get('errors', []),
+        execution_log.get('detailed_output', {}), sorted(tasks, key=str),
+        sorted(execution_log.get('charts', [])), *extra,
+    )
+
+
+class BuildManifest:
+    def __init__(self, output_dir, force=False):
+        """
+        增量构建清单（保存在输出目录下的 .build_manifest.json）
+        :param output_dir: 输出目录，清单中的文件名相对此目录
+        :param force: 为 True 时不跳过任何输出（仍记录指纹）
+        """
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.force = force
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.entries = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('entries', {})
+        except (OSError, ValueError):
+            return {}
+
+    def fresh(self, output, digest):
+        """输出文件存在且输入指纹未变化"""
+        if self.force:
+            return False
+        with self._lock:
+            entry = self.entries.get(output)
+        return (entry is not None and entry.get('hash') == digest
+                and os.path.exists(os.path.join(self.output_dir, output)))
+
+    def record(self, output, digest):
+        """登记新生成的输出"""
+        with self._lock:
+            if self.entries.get(output, {}).get('hash') == digest:
+                return
+            self.entries[output] = {'hash': digest, 'updated': datetime.now().isoformat(timespec='seconds')}
+            self._dirty = True
+
+    def save(self):
+        """原子写入清单（无变化时不改写文件）"""
+        with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            payload = {'version': 1, 'entries': dict(sorted(self.entries.items()))}
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(payload, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+面向对象的 Agg 绘图后端：直接使用 Figure + FigureCanvasAgg，不经过 pyplot
+图表之间不共享全局 figure 状态，可在多个线程中同时调用；matplotlib 在第一次绘图时才导入
+"""
+import threading
+from chart_output import DEFAULT_FORMAT, decimate_series
+
+# 绘图代码改变输出外观时递增，使增量构建清单中的旧图表失效
+RENDER_VERSION = 1
+
+LINE_FIGSIZE = (20, 12)
+BAR_FIGSIZE = (12, 6)
+KLINE_FIGSIZE = (2.8, 2.0125)  # 与原 mpf.plot(figscale=0.35) 的尺寸一致
+KLINE_DPI = 100
+
+_STYLE_LOCK = threading.Lock()
+_KLINE_STYLE = None
+
+
+def kline_style():
+    """K线样式只构建一次，之后所有调用复用同一个对象"""
+    global _KLINE_STYLE
+    with _STYLE_LOCK:
+        if _KLINE_STYLE is None:
+            import mplfinance as mpf
+            _KLINE_STYLE = mpf.make_mpf_style(
+                base_mpf_style='charles',
+                marketcolors=mpf.make_marketcolors(up='#e74c3c', down='#2ecc71', edge='inherit'),
+                facecolor='black', edgecolor='white', figcolor='black',
+                gridcolor='#666666', gridstyle='--', rc={'font.size': 8}
+            )
+        return _KLINE_STYLE
+
+
+def new_figure(figsize=LINE_FIGSIZE, dpi=None, facecolor='black'):
+    """创建绑定 Agg 画布的独立 Figure"""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    fig = Figure(figsize=figsize, dpi=dpi, facecolor=facecolor)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def save_figure(fig, filepath, output_format=DEFAULT_FORMAT, **kwargs):
+    """按输出格式保存图表；Figure 不在 pyplot 中注册，无需 close"""
+    options = dict(bbox_inches='tight', pad_inches=0.1, facecolor='black')
+    options.update(kwargs)
+    return output_format.save(fig, filepath, **options)
+
+
+def _finish(fig, filepath, output_format):
+    fig.autofmt_xdate(rotation=45, ha='right')
+    fig.tight_layout(pad=0.8)
+    save_figure(fig, filepath, output_format)
+
+
+def render_lines(spec, filepath, output_format=DEFAULT_FORMAT):
+    """多序列折线图"""
+    fig = new_figure()
+    ax = fig.add_subplot()
+    max_points = output_format.max_points(fig)
+    for label, values, color, linewidth in spec.series:
+        values = decimate_series(values, max_points)
+        ax.plot(values.index, values, color=color, label=label, linewidth=linewidth)
+    for y, color, label in spec.hlines:
+        ax.axhline(y=y, ls=":", c=color, label=label if label else None, alpha=0.7)
+
+    ax.set_title(spec.title, fontsize=13, fontweight='heavy', pad=8, color='white')
+    ax.legend(loc=spec.options.get('legend_loc', 'upper left'), fontsize=8, framealpha=0.9)
+    ax.grid(True, alpha=0.3, color='#666666')
+    _finish(fig, filepath, output_format)
+
+
+def render_twin(spec, filepath, output_format=DEFAULT_FORMAT):
+    """双轴折线图：第一条序列画左轴，第二条画右轴"""
+    fig = new_figure()
+    ax1 = fig.add_subplot()
+    ax2 = ax1.twinx()
+    ylabels = spec.options.get('ylabels', (None, None))
+    max_points = output_format.max_points(fig)
+
+    lines = []
+    for ax, (label, values, color, linewidth), ylabel in zip((ax1, ax2), spec.series, ylabels):
+        lines += ax.plot(decimate_series(values, max_points), color=color, label=label, linewidth=linewidth)
+        if ylabel:
+            ax.set_ylabel(ylabel, color=color, fontsize=10)
+
+    ax1.set_title(spec.title, fontsize=13, fontweight='heavy', pad=8)
+    ax1.grid(True, alpha=0.3, color='#666666')
+    ax1.legend(lines, [l.get_label() for l in lines], loc='upper left', fontsize=8)
+    _finish(fig, filepath, output_format)
+
+
+def render_kline(spec, filepath, output_format=DEFAULT_FORMAT):
+    """K线图：mplfinance 外部坐标轴模式，样式由预构建对象提供，不改动全局 rcParams"""
+    import mplfinance as mpf
+    style = kline_style()
+    fig = new_figure(KLINE_FIGSIZE, dpi=KLINE_DPI, facecolor=style['figcolor'])
+    ax = fig.add_subplot()
+    ax.set_facecolor(style['facecolor'])
+    for spine in ax.spines.values():
+        spine.set_color(style['edgecolor'])
+        spine.set_linewidth(style['rc']['axes.linewidth'])
+    ax.tick_params(labelsize=style['rc']['font.size'])
+    ax.grid(True, axis=style['rc']['axes.grid.axis'], color=style['gridcolor'],
+            linestyle=style['gridstyle'], linewidth=style['rc']['grid.linewidth'])
+    if style['y_on_right']:
+        ax.yaxis.tick_right()
+
+    mpf.plot(spec.data, type='candle', ax=ax, volume=False, style=style,
+             datetime_format='%m-%d', warn_too_much_data=1000)
+    ax.set_title(spec.title, fontsize=style['rc']['font.size'] * 1.2, fontweight='semibold')
+    fig.tight_layout(pad=0.4)
+    save_figure(fig, filepath, output_format, pad_inches=0.05, dpi=KLINE_DPI)
+
+
+def render_bars(spec, filepath, output_format=DEFAULT_FORMAT):
+    """横向条形图：第一条序列的索引为类目、值为条长，正负值分色（options['colors']，默认红正绿负）"""
+    label, values, _, _ = spec.series[0]
+    up, down = spec.options.get('colors', ('#e74c3c', '#2ecc71'))
+    fig = new_figure(spec.options.get('figsize', BAR_FIGSIZE))
+    ax = fig.add_subplot()
+    positions = list(range(len(values)))
+    ax.barh(positions, values.to_numpy(), color=[up if v >= 0 else down for v in values], label=label)
+    ax.set_yticks(positions, [str(name) for name in values.index])
+    ax.invert_yaxis()
+    for x, color, label in spec.hlines:
+        ax.axvline(x=x, ls=":", c=color, label=label if label else None, alpha=0.7)
+    if spec.options.get('xlabel'):
+        ax.set_xlabel(spec.options['xlabel'], fontsize=10)
+
+    ax.set_title(spec.title, fontsize=13, fontweight='heavy', pad=8, color='white')
+    ax.grid(False, axis='y')
+    ax.grid(True, axis='x', alpha=0.3, color='#666666')
+    fig.tight_layout(pad=0.8)
+    save_figure(fig, filepath, output_format)
+
+
+RENDERERS = {
+    'lines': render_lines,
+    'bars': render_bars,
+    'twin': render_twin,
+    'kline': render_kline,
+}
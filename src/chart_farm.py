@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from chart_backend import RENDERERS, RENDER_VERSION
+from chart_output import DEFAULT_FORMAT
+from build_manifest import fingerprint
+
+
+class ChartSpec:
+    def __init__(self, kind, output, title='', series=None, hlines=None, data=None, options=None):
+        """
+        图表描述（可序列化，交给渲染进程绘制）
+        :param kind: lines（多序列折线）/ twin（双轴折线）/ kline（K线）/ bars（横向条形，hlines 为竖直参考线）
+        :param output: 输出文件名（相对输出目录）
+        :param series: [(标签, pd.Series, 颜色, 线宽)]；twin 时第一条画左轴、第二条画右轴
+        :param hlines: [(y, 颜色, 标签)] 水平参考线
+        :param data: kline 使用的 OHLC DataFrame
+        :param options: 其它选项，如 legend_loc、ylabels
+        """
+        self.kind = kind
+        self.output = output
+        self.title = title
+        self.series = series or []
+        self.hlines = hlines or []
+        self.data = data
+        self.options = options or {}
+
+
+class ChartResult:
+    def __init__(self, output, status, error=None, elapsed=0.0, cpu=0.0):
+        """
+        渲染结果
+        :param status: success / unchanged（输入未变化，沿用已有文件）/ error
+        :param elapsed: 渲染进程内的墙钟秒数
+        :param cpu: 渲染进程内的 CPU 秒数
+        """
+        self.output = output
+        self.status = status
+        self.error = error
+        self.elapsed = elapsed
+        self.cpu = cpu
+
+
+def spec_fingerprint(spec, output_format=DEFAULT_FORMAT):
+    """图表输入指纹：数据、参数、输出格式与绘图代码版本"""
+    return fingerprint(
+        RENDER_VERSION, spec.kind, spec.title, spec.series, spec.hlines,
+        spec.data, spec.options, vars(output_format),
+    )
+
+
+def render_chart(spec, output_dir, output_format=DEFAULT_FORMAT):
+    """按描述绘制并保存一张图表，文件扩展名由输出格式决定"""
+    start_time, start_cpu = time.time(), time.process_time()
+    output = output_format.resolve(spec.output)
+    try:
+        RENDERERS[spec.kind](spec, os.path.join(output_dir, output), output_format)
+        status, error = 'success', None
+    except Exception as e:
+        status, error = 'error', f'{type(e).__name__}: {e}'
+    return ChartResult(output, status, error, time.time() - start_time, time.process_time() - start_cpu)
+
+
+def _init_worker(output_format):
+    """渲染进程初始化：只设置一次字体、输出参数并预构建K线样式"""
+    from plot_style import setup_matplotlib_fonts
+    from chart_backend import kline_style
+    setup_matplotlib_fonts(verbose=False)
+    output_format.apply_rc()
+    kline_style()
+
+
+class ChartFarm:
+    def __init__(self, output_dir, workers=None, mp_context='spawn', output_format=DEFAULT_FORMAT,
+                 manifest=None):
+        """
+        图表渲染进程池
+        :param output_dir: 图表输出目录
+        :param workers: 渲染进程数，默认 min(4, CPU 核数)；0 表示在调用线程内直接渲染
+        :param mp_context: 进程启动方式
+        :param output_format: 图表输出格式（OutputFormat）
+        :param manifest: 增量构建清单（BuildManifest），输入未变化的图表不再重绘
+        """
+        self.output_dir = output_dir
+        self.output_format = output_format
+        self.manifest = manifest
+        self.workers = min(4, os.cpu_count() or 1) if workers is None else workers
+        self.mp_context = mp_context
+        self._pool = None
+        self._lock = threading.Lock()
+        self._inline_ready = False
+
+    def _init_inline(self):
+        """直接渲染时在第一次绘图前完成与渲染进程相同的初始化"""
+        with self._lock:
+            if not self._inline_ready:
+                _init_worker(self.output_format)
+                self._inline_ready = True
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    self.workers,
+                    mp_context=multiprocessing.get_context(self.mp_context),
+                    initializer=_init_worker,
+                    initargs=(self.output_format,),
+                )
+            return self._pool
+
+    def submit(self, spec):
+        """提交渲染，返回 Future[ChartResult]"""
+        digest = None
+        if self.manifest is not None:
+            output = self.output_format.resolve(spec.output)
+            digest = spec_fingerprint(spec, self.output_format)
+            if self.manifest.fresh(output, digest):
+                future = Future()
+                future.set_result(ChartResult(output, 'unchanged'))
+                return future
+
+        if self.workers == 0:
+            self._init_inline()
+            future = Future()
+            future.set_result(render_chart(spec, self.output_dir, self.output_format))
+        else:
+            future = self._get_pool().submit(render_chart, spec, self.output_dir, self.output_format)
+        if digest is not None:
+            future.add_done_callback(lambda f: self._record(f, digest))
+        return future
+
+    def _record(self, future, digest):
+        if not future.cancelled() and future.exception() is None and future.result().status == 'success':
+            self.manifest.record(future.result().output, digest)
+
+    def render(self, spec, timeout=None):
+        """提交渲染并等待结果"""
+        try:
+            return self.submit(spec).result(timeout=timeout)
+        except Exception as e:
+            return ChartResult(self.output_format.resolve(spec.output), 'error', f'{type(e).__name__}: {e}')
+
+    def render_all(self, specs, timeout=None):
+        """批量渲染，按提交顺序返回结果"""
+        futures = [(spec, self.submit(spec)) for spec in specs]
+        results = []
+        for spec, future in futures:
+            try:
+                results.append(future.result(timeout=timeout))
+            except Exception as e:
+                results.append(ChartResult(self.output_format.resolve(spec.output), 'error',
+                                           f'{type(e).__name__}: {e}'))
+        return results
+
+    def shutdown(self):
+        """关闭渲染进程"""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+图表输出格式：PNG / SVG / WebP，序列按像素宽度做 LTTB 降采样，
+SVG 文字不转曲（svg.fonttype=none），可额外输出预压缩的 .svgz
+"""
+import os
+import gzip
+import shutil
+import numpy as np
+import pandas as pd
+
+FORMATS = ('png', 'svg', 'webp')
+
+
+def lttb_indices(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets 降采样，返回保留点的下标
+    首尾点必保留，每个桶取与前一保留点、后一桶均值构成三角形面积最大的点
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        avg_start = int(np.floor((i + 1) * every)) + 1
+        avg_end = min(int(np.floor((i + 2) * every)) + 1, n)
+        avg_x = x[avg_start:avg_end].mean()
+        avg_y = y[avg_start:avg_end].mean()
+
+        start = int(np.floor(i * every)) + 1
+        end = int(np.floor((i + 1) * every)) + 1
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(area.argmax())
+        indices[i + 1] = a
+    return indices
+
+
+def decimate_series(values, max_points):
+    """折线序列超过 max_points 时做 LTTB 降采样，形状保持不变"""
+    values = values.dropna()
+    if max_points is None or len(values) <= max_points:
+        return values
+    index = values.index
+    if isinstance(index, pd.DatetimeIndex):
+        x = index.asi8.astype(float)
+    else:
+        x = np.asarray(index, dtype=float)
+    y = values.to_numpy(dtype=float)
+    return values.iloc[lttb_indices(x, y, max_points)]
+
+
+class OutputFormat:
+    def __init__(self, fmt='png', decimate=True, compress=False, dpi=150):
+        """
+        图表输出设置
+        :param fmt: png / svg / webp
+        :param decimate: 是否把折线降采样到图像像素宽度
+        :param compress: SVG 额外写出 gzip 压缩的 .svgz
+        :param dpi: 位图分辨率（SVG 按 72 点/英寸计算像素宽度）
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f'未知图表格式: {fmt}')
+        self.fmt = fmt
+        self.decimate = decimate
+        self.compress = compress
+        self.dpi = dpi
+
+    @classmethod
+    def from_env(cls):
+        """从环境变量 CHART_FORMAT / CHART_DECIMATE / CHART_COMPRESS 读取"""
+        return cls(
+            fmt=os.environ.get('CHART_FORMAT', 'png').lower(),
+            decimate=os.environ.get('CHART_DECIMATE', '1') != '0',
+            compress=os.environ.get('CHART_COMPRESS', '0') == '1',
+        )
+
+    def resolve(self, filename):
+        """把图表文件名的扩展名换成当前格式"""
+        return f'{os.path.splitext(filename)[0]}.{self.fmt}'
+
+    def apply_rc(self):
+        """进程级 rcParams：SVG 文字保留为 <text>，去掉随机 id 与时间戳便于增量部署"""
+        import matplotlib
+        matplotlib.rcParams.update({'svg.fonttype': 'none', 'svg.hashsalt': 'chart'})
+
+    def max_points(self, fig):
+        """图像宽度对应的像素数，即折线最多需要的点数"""
+        if not self.decimate:
+            return None
+        return int(fig.get_figwidth() * (72 if self.fmt == 'svg' else self.dpi))
+
+    def save(self, fig, filepath, **kwargs):
+        """按格式保存，返回写出的文件路径列表"""
+        options = dict(format=self.fmt, metadata={'Date': None} if self.fmt == 'svg' else None)
+        if self.fmt != 'svg':
+            options['dpi'] = kwargs.pop('dpi', self.dpi)
+        else:
+            kwargs.pop('dpi', None)
+        if self.fmt == 'webp':
+            options['pil_kwargs'] = {'quality': 90, 'method': 6}
+        options.update(kwargs)
+        if options['metadata'] is None:
+            del options['metadata']
+        fig.savefig(filepath, **options)
+
+        written = [filepath]
+        if self.compress and self.fmt == 'svg':
+            with open(filepath, 'rb') as src, gzip.GzipFile(filepath + 'z', 'wb', mtime=0) as dst:
+                shutil.copyfileobj(src, dst)
+            written.append(filepath + 'z')
+        return written
+
+
+DEFAULT_FORMAT = OutputFormat()
@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+import os
+
+# 仓库根目录下的 output/（与工作目录无关）
+OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'output')
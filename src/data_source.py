@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+数据源录制/回放：live 直接访问上游；record 访问上游并把原始返回写入压缩归档；
+replay 只从归档读取，完全不访问网络（用于离线复现与分析调优）
+"""
+import io
+import os
+import json
+import zipfile
+import hashlib
+import threading
+import functools
+from datetime import datetime
+import pandas as pd
+from disk_cache import CACHE_DIR
+from tracing import annotate
+
+MODES = ('live', 'record', 'replay')
+ARCHIVE_VERSION = 1
+DEFAULT_ARCHIVE = os.path.join(CACHE_DIR, 'replay.zip')
+
+# 随运行日期变化的参数不参与键，隔天回放仍能命中
+VOLATILE_ARGS = ('start', 'start_date', 'end_date', 'startdate', 'enddate')
+
+
+class ReplayMiss(KeyError):
+    """回放归档中没有对应的录制"""
+
+
+def _encode(result):
+    """
+    把返回值编码为归档成员
+    :return: (类型, {成员后缀: bytes}, 附加信息)
+    """
+    if isinstance(result, pd.Series):
+        buffer = io.BytesIO()
+        result.to_frame(name='value').to_parquet(buffer)
+        return 'series', {'.parquet': buffer.getvalue()}, {'name': result.name}
+    if isinstance(result, pd.DataFrame):
+        buffer = io.BytesIO()
+        result.to_parquet(buffer)
+        return 'frame', {'.parquet': buffer.getvalue()}, {}
+    if isinstance(result, dict) and all(isinstance(v, pd.DataFrame) for v in result.values()):
+        members = {}
+        for i, frame in enumerate(result.values()):
+            buffer = io.BytesIO()
+            frame.to_parquet(buffer)
+            members[f'/{i}.parquet'] = buffer.getvalue()
+        return 'frames', members, {'keys': list(result)}
+    if isinstance(result, str):
+        return 'text', {'.txt': result.encode('utf-8')}, {}
+    return 'json', {'.json': json.dumps(result, ensure_ascii=False).encode('utf-8')}, {}
+
+
+def _decode(kind, members, info):
+    if kind == 'series':
+        frame = pd.read_parquet(io.BytesIO(members['.parquet']))
+        return frame['value'].rename(info.get('name'))
+    if kind == 'frame':
+        return pd.read_parquet(io.BytesIO(members['.parquet']))
+    if kind == 'frames':
+        return {
+            key: pd.read_parquet(io.BytesIO(members[f'/{i}.parquet']))
+            for i, key in enumerate(info['keys'])
+        }
+    if kind == 'text':
+        return members['.txt'].decode('utf-8')
+    return json.loads(members['.json'].decode('utf-8'))
+
+
+class DataSource:
+    def __init__(self, mode='live', archive=DEFAULT_ARCHIVE, volatile=VOLATILE_ARGS, logger=None):
+        """
+        数据源访问层
+        :param mode: live / record / replay
+        :param archive: 录制归档路径（zip）
+        :param volatile: 不参与录制键的参数名
+        :param logger: 日志回调函数 (task, status, details)（可选）
+        """
+        if mode not in MODES:
+            raise ValueError(f'未知的数据源模式: {mode}（可选: {", ".join(MODES)}）')
+        self.mode = mode
+        self.archive = archive
+        self.volatile = set(volatile)
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._entries = {}     # 录制: 键 -> (类型, 成员, 附加信息)
+        self._index = None     # 回放: 归档索引
+        self._zip = None
+        self._recorded_at = datetime.now()
+        self.as_of = None      # 按历史日期运行时的“今天”
+
+    @classmethod
+    def from_env(cls, logger=None):
+        """DATA_SOURCE=live/record/replay，DATA_ARCHIVE=归档路径"""
+        return cls(
+            mode=os.environ.get('DATA_SOURCE', 'live').strip().lower(),
+            archive=os.environ.get('DATA_ARCHIVE') or DEFAULT_ARCHIVE,
+            logger=logger,
+        )
+
+    @property
+    def live(self):
+        """是否直接访问上游且可以使用本地缓存（录制与回放都绕过缓存，保证拿到完整原始返回）"""
+        return self.mode == 'live'
+
+    def key(self, name, args=(), kwargs=None):
+        """录制键：数据源名称 + 参数（不含随日期变化的参数）"""
+        stable = {k: v for k, v in (kwargs or {}).items() if k not in self.volatile}
+        return json.dumps([name, list(args), stable], sort_keys=True, ensure_ascii=False, default=str)
+
+    def call(self, name, func, *args, **kwargs):
+        """按当前模式调用数据源"""
+        if self.mode == 'live':
+            return func(*args, **kwargs)
+        key = self.key(name, args, kwargs)
+        if self.mode == 'replay':
+            annotate(source='replay')
+            return self._load(key)
+
+        result = func(*args, **kwargs)
+        annotate(source='record')
+        try:
+            encoded = _encode(result)
+        except Exception as e:
+            if self.logger:
+                self.logger('数据录制', 'warning', f'{name}: 无法录制 {str(e)[:100]}')
+            return result
+        with self._lock:
+            self._entries[key] = encoded
+        return result
+
+    def wrap(self, func, name=None):
+        """包装数据源函数（保留函数名，缓存与追踪按原名记录）"""
+        name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return self.call(name, func, *args, **kwargs)
+        return wrapper
+
+    def now(self):
+        """当前时间；指定 as_of 时为该日，回放时为录制时间，按“今天”截取的窗口与录制时一致"""
+        if self.as_of is not None:
+            return pd.Timestamp(self.as_of)
+        if self.mode == 'replay':
+            recorded = self._open().get('recorded')
+            if recorded:
+                return pd.Timestamp(recorded)
+        return pd.Timestamp.now()
+
+    def _open(self):
+        with self._lock:
+            if self._index is None:
+                if not os.path.exists(self.archive):
+                    raise FileNotFoundError(f'回放归档不存在: {self.archive}（先用 DATA_SOURCE=record 运行一次）')
+                self._zip = zipfile.ZipFile(self.archive)
+                self._index = json.loads(self._zip.read('index.json').decode('utf-8'))
+            return self._index
+
+    def _load(self, key):
+        index = self._open()
+        entry = index['entries'].get(key)
+        if entry is None:
+            raise ReplayMiss(f'回放归档中没有录制: {key}')
+        with self._lock:
+            members = {suffix: self._zip.read(entry['id'] + suffix) for suffix in entry['members']}
+        return _decode(entry['kind'], members, entry['info'])
+
+    def save(self):
+        """录制模式下原子写出归档（zip + index.json），返回写入的条目数"""
+        if self.mode != 'record':
+            return 0
+        with self._lock:
+            entries = dict(self._entries)
+        index = {'version': ARCHIVE_VERSION, 'recorded': self._recorded_at.isoformat(timespec='seconds'),
+                 'entries': {}}
+        os.makedirs(os.path.dirname(os.path.abspath(self.archive)), exist_ok=True)
+        tmp_path = f'{self.archive}.{os.getpid()}.tmp'
+        try:
+            with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+                for key in sorted(entries):
+                    kind, members, info = entries[key]
+                    entry_id = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+                    for suffix, payload in members.items():
+                        zf.writestr(entry_id + suffix, payload)
+                    index['entries'][key] = {'id': entry_id, 'kind': kind,
+                                             'members': sorted(members), 'info': info}
+                zf.writestr('index.json', json.dumps(index, ensure_ascii=False, indent=1))
+            os.replace(tmp_path, self.archive)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return len(entries)
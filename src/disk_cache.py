@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import time
+import hashlib
+import threading
+import pandas as pd
+from tracing import annotate
+
+CACHE_DIR = os.environ.get('MARKET_CACHE_DIR', '.cache')
+
+try:
+    import pyarrow  # noqa: F401  parquet 引擎
+    _PARQUET = True
+except ImportError:
+    _PARQUET = False
+
+
+def cache_key(name, **key):
+    """由数据源名称与参数生成稳定的缓存文件名"""
+    payload = json.dumps(key, sort_keys=True, ensure_ascii=False, default=str)
+    digest = hashlib.sha1(payload.encode('utf-8')).hexdigest()[:12]
+    safe_name = ''.join(c if c.isalnum() or c in '-_' else '_' for c in name)
+    return f'{safe_name}-{digest}'
+
+
+def _dates(frame, date_col, date_format=None):
+    """取出日期列（或索引）并转换为 datetime"""
+    values = frame.index if date_col is None else frame[date_col]
+    return pd.to_datetime(values, errors='coerce', format=date_format)
+
+
+def merge_frames(cached, fresh, date_col=None, date_format=None):
+    """追加新数据，同一日期以新数据为准，按日期升序"""
+    merged = pd.concat([cached, fresh])
+    dates = _dates(merged, date_col, date_format)
+    merged = merged.assign(_cache_date=dates.values if date_col else dates)
+    merged = merged[~merged['_cache_date'].duplicated(keep='last')]
+    merged = merged.sort_values('_cache_date', kind='stable').drop(columns='_cache_date')
+    if date_col is not None:
+        merged = merged.reset_index(drop=True)
+    return merged
+
+
+class DiskCache:
+    def __init__(self, cache_dir=CACHE_DIR, logger=None):
+        """
+        本地列式缓存（Parquet），按数据源函数与参数分文件存放
+        :param cache_dir: 缓存目录
+        :param logger: 日志回调函数 (task, status, details)（可选）
+        """
+        self.cache_dir = cache_dir
+        self.logger = logger
+        self.enabled = _PARQUET
+        self._lock = threading.Lock()
+        self._file_locks = {}
+        if self.enabled:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, name, **key):
+        return os.path.join(self.cache_dir, cache_key(name, **key) + '.parquet')
+
+    def _file_lock(self, path):
+        with self._lock:
+            return self._file_locks.setdefault(path, threading.Lock())
+
+    def load(self, name, **key):
+        """读取缓存，不存在或损坏时返回 None"""
+        if not self.enabled:
+            return None
+        path = self._path(name, **key)
+        if not os.path.exists(path):
+            return None
+        try:
+            return pd.read_parquet(path)
+        except Exception as e:
+            if self.logger:
+                self.logger('缓存', 'warning', f'{name}: 缓存损坏 {str(e)[:100]}')
+            return None
+
+    def save(self, frame, name, **key):
+        """原子写入缓存（先写临时文件再替换）"""
+        if not self.enabled or frame is None or frame.empty:
+            return
+        path = self._path(name, **key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            frame.to_parquet(tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            if self.logger:
+                self.logger('缓存', 'warning', f'{name}: 写入失败 {str(e)[:100]}')
+
+    def age(self, name, **key):
+        """缓存文件距今秒数，不存在时返回 None"""
+        path = self._path(name, **key)
+        if not self.enabled or not os.path.exists(path):
+            return None
+        return time.time() - os.path.getmtime(path)
+
+    def fetch(self, func, name=None, date_col=None, date_format=None,
+              start_arg=None, start_format='%Y%m%d', exclude=(), max_age=3600, **kwargs):
+        """
+        带增量追加的缓存获取
+        :param func: 数据源函数（akshare 接口等）
+        :param name: 缓存名称，默认取函数名
+        :param date_col: 日期列名，None 表示日期在索引上
+        :param date_format: 日期列解析格式
+        :param start_arg: 数据源的起始日期参数名；提供时只拉取最后缓存日期之后的数据
+        :param start_format: 起始日期参数的格式
+        :param exclude: 不参与缓存键的参数名（如每天变化的结束日期）
+        :param max_age: 缓存在该秒数内视为新鲜，直接返回不访问网络
+        :param kwargs: 传给数据源函数的参数
+        """
+        name = name or func.__name__
+        key = self._key(kwargs, start_arg, exclude)
+        path = self._path(name, **key)
+
+        requested_start = kwargs.get(start_arg) if start_arg else None
+        with self._file_lock(path):
+            cached = self.load(name, **key)
+            if cached is not None and requested_start is not None:
+                first = _dates(cached, date_col, date_format).min()
+                # 缓存覆盖不到请求的起点（留一周余量给周末与假期）时整段重取
+                if pd.isna(first) or first > pd.to_datetime(requested_start) + pd.Timedelta(days=7):
+                    cached = None
+
+            age = self.age(name, **key)
+            if cached is not None and max_age is not None and age is not None and age < max_age:
+                annotate(cache='hit')
+                return self._since(cached, date_col, date_format, requested_start)
+
+        call_kwargs = dict(kwargs)
+        incremental = cached is not None and start_arg is not None
+        annotate(cache='incremental' if incremental else 'miss')
+        if incremental:
+            last = _dates(cached, date_col, date_format).max()
+            call_kwargs[start_arg] = last.strftime(start_format)
+
+        # 访问数据源时不持有文件锁：超时被放弃的调用仍在后台运行，不能挡住重试与对冲请求
+        try:
+            fresh = func(**call_kwargs)
+        except Exception as e:
+            if cached is None:
+                raise
+            if self.logger:
+                self.logger('缓存', 'warning', f'{name}: 更新失败，使用旧缓存 {str(e)[:100]}')
+            annotate(cache='stale')
+            return self._since(cached, date_col, date_format, requested_start)
+
+        with self._file_lock(path):
+            if fresh is None or fresh.empty:
+                frame = cached if cached is not None else pd.DataFrame()
+                if cached is not None:
+                    os.utime(path)  # 没有新数据，只刷新新鲜度
+                return self._since(frame, date_col, date_format, requested_start)
+            if incremental:
+                # 调用期间其他线程可能已写入更新的缓存，追加到文件中最新的内容上
+                latest = self.load(name, **key)
+                frame = merge_frames(latest if latest is not None else cached, fresh, date_col, date_format)
+            else:
+                frame = fresh
+            self.save(frame, name, **key)
+        return self._since(frame, date_col, date_format, requested_start)
+
+    def stale(self, func, name=None, date_col=None, date_format=None,
+              start_arg=None, start_format='%Y%m%d', exclude=(), max_age=None, **kwargs):
+        """
+        不访问数据源、不等待文件锁，直接按请求窗口读取已有缓存（参数同 fetch）；
+        数据源超时或熔断时兜底使用，没有缓存时返回 None
+        """
+        name = name or func.__name__
+        cached = self.load(name, **self._key(kwargs, start_arg, exclude))
+        if cached is None:
+            return None
+        annotate(cache='stale')
+        return self._since(cached, date_col, date_format, kwargs.get(start_arg) if start_arg else None)
+
+    @staticmethod
+    def _key(kwargs, start_arg, exclude):
+        """缓存键参数：去掉增量起始参数与排除的参数"""
+        return {k: v for k, v in kwargs.items() if k != start_arg and k not in exclude}
+
+    @staticmethod
+    def _since(frame, date_col, date_format, start):
+        """按请求的起始日期截取"""
+        if start is None or frame is None or frame.empty:
+            return frame.copy() if frame is not None else pd.DataFrame()
+        dates = _dates(frame, date_col, date_format)
+        start = pd.to_datetime(start)
+        if getattr(dates, 'tz', None) is not None:
+            start = start.tz_localize(dates.tz)
+        mask = (dates >= start)
+        return frame[mask.values if hasattr(mask, 'values') else mask].copy()
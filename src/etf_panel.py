@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+ETF 全市场面板：全部 ETF 的收盘价、成交额、份额按 日期 × 代码 放在一张宽表里，
+净申赎、分类型规模、成交额占比都是整表运算，覆盖上千只 ETF 也没有逐只的 Python 循环。
+面板整体缓存为一个文件；首次运行并发补齐各 ETF 的历史，之后每天只用一次全市场快照追加最新交易日。
+补历史的份额由成交量 / 换手率反推，只够估算规模，净申赎只用快照给出的实际份额计算
+"""
+import numpy as np
+import pandas as pd
+
+# 份额估算：1 为由成交量 / 换手率反推的份额，0 为快照给出的实际份额（缺失按估算处理）
+FIELDS = ('收盘', '成交额', '份额', '份额估算')
+ETF_TYPES = ('股票ETF', '跨境ETF', '债券ETF', '商品ETF', '货币ETF')
+# 基金类型 + 简称中的关键词 → ETF 大类（按顺序匹配，都不匹配为股票ETF）
+TYPE_PATTERNS = (
+    ('货币ETF', '货币'),
+    ('商品ETF', '商品|黄金|白银|豆粕|有色金属期货|能源化工'),
+    ('债券ETF', '固收|债'),
+    ('跨境ETF', '海外|QDII|港|HK|恒生|纳指|纳斯达克|标普|道琼斯|日经|中概|德国|法国|沙特|亚太|东南亚|H股'),
+)
+
+
+def classify(fund_types, names=None):
+    """
+    ETF 大类（整列正则匹配）
+    :param fund_types: 以代码为索引的基金类型（fund_name_em 的“基金类型”，如 指数型-海外股票）
+    :param names: 以代码为索引的基金简称（可选），类型缺失或不够细时按简称补充判断
+    """
+    text = pd.Series(fund_types, dtype=object).fillna('').astype(str)
+    if names is not None:
+        names = pd.Series(names, dtype=object)
+        text = text.reindex(text.index.union(names.index), fill_value='') + ' ' + \
+            names.reindex(text.index.union(names.index)).fillna('').astype(str)
+    conditions = [text.str.contains(pattern, regex=True).to_numpy() for _, pattern in TYPE_PATTERNS]
+    labels = [label for label, _ in TYPE_PATTERNS]
+    return pd.Series(np.select(conditions, labels, ETF_TYPES[0]), index=text.index, dtype=object)
+
+
+def _numeric(raw, column):
+    if column not in raw.columns:
+        return np.full(len(raw), np.nan)
+    return pd.to_numeric(raw[column], errors='coerce').to_numpy(dtype=float)
+
+
+def quote_rows(raw):
+    """
+    原始行情行 → (日期, 代码) 索引、FIELDS 列的长表
+    需含 代码、日期（快照为 数据日期）、收盘（快照为 最新价）、成交额；有 最新份额 时直接使用，
+    否则由 成交量(手) / 换手率(%) 反推份额并在 份额估算 中标记（换手率只有两位小数，反推份额只能用于规模，
+    不能差分成净申赎；日常运行的份额来自快照，逐日累积后替换反推值）
+    """
+    date_col = '日期' if raw is not None and '日期' in raw.columns else '数据日期'
+    if raw is None or raw.empty or '代码' not in raw.columns or date_col not in raw.columns:
+        return pd.DataFrame(columns=list(FIELDS), index=pd.MultiIndex.from_arrays([[], []], names=['日期', '代码']),
+                            dtype=float)
+    close = _numeric(raw, '收盘') if '收盘' in raw.columns else _numeric(raw, '最新价')
+    shares = _numeric(raw, '最新份额')
+    turnover = _numeric(raw, '换手率')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        implied = np.where(turnover > 0, _numeric(raw, '成交量') * 100 / (turnover / 100), np.nan)
+    index = pd.MultiIndex.from_arrays([
+        pd.to_datetime(raw[date_col], errors='coerce').to_numpy(),
+        raw['代码'].astype(str).str.zfill(6).to_numpy(),
+    ], names=['日期', '代码'])
+    rows = pd.DataFrame({
+        '收盘': close,
+        '成交额': _numeric(raw, '成交额'),
+        '份额': np.where(np.isnan(shares), implied, shares),
+        '份额估算': np.where(~np.isnan(shares), 0.0, np.where(np.isnan(implied), np.nan, 1.0)),
+    }, index=index)
+    rows = rows[rows.index.get_level_values('日期').notna() & ~np.isnan(close)]
+    return rows[~rows.index.duplicated(keep='last')]
+
+
+def history_rows(histories):
+    """
+    多只 ETF 的 fund_etf_hist_em 历史一次性转为长表
+    :param histories: {代码: 原始 DataFrame}
+    """
+    frames = {code: frame for code, frame in histories.items() if frame is not None and not frame.empty}
+    if not frames:
+        return quote_rows(None)
+    raw = pd.concat(frames, names=['代码', None]).reset_index(level='代码')
+    return quote_rows(raw)
+
+
+class EtfPanel:
+    def __init__(self, rows=None):
+        """
+        ETF 面板
+        :param rows: (日期, 代码) 索引、FIELDS 列的长表（如 quote_rows 的结果或缓存文件）
+        """
+        rows = quote_rows(None) if rows is None else rows
+        self._set(rows.reindex(columns=list(FIELDS)).astype(float).unstack('代码'))
+
+    def _set(self, wide):
+        self.frame = wide.sort_index()
+        self.dates = self.frame.index
+        self.codes = self.frame.columns.get_level_values('代码').unique()
+
+    @property
+    def empty(self):
+        return len(self.dates) == 0 or len(self.codes) == 0
+
+    def field(self, name):
+        """日期 × 代码 的宽表"""
+        if self.empty:
+            return pd.DataFrame(index=self.dates, columns=self.codes, dtype=float)
+        return self.frame[name].reindex(columns=self.codes)
+
+    def rows(self):
+        """长表（缓存用，去掉整行缺失）"""
+        return self.frame.stack('代码').dropna(how='all')
+
+    def merge(self, rows):
+        """
+        追加新的行情行（同一日期同一代码以新数据为准，但已有的实际份额不被反推的估算份额覆盖），返回新面板
+        """
+        fresh = EtfPanel(rows).frame
+        dates, columns = self.dates.union(fresh.index), self.frame.columns.union(fresh.columns)
+        old = self.frame.reindex(index=dates, columns=columns).to_numpy()
+        new = fresh.reindex(index=dates, columns=columns).to_numpy()
+        values = np.where(np.isnan(new), old, new)
+        field = columns.get_level_values(0)
+        shares, flag = field == '份额', field == '份额估算'
+        keep = (old[:, flag] == 0) & (new[:, flag] == 1)
+        values[:, shares] = np.where(keep, old[:, shares], values[:, shares])
+        values[:, flag] = np.where(keep, 0.0, values[:, flag])
+        panel = EtfPanel()
+        panel._set(pd.DataFrame(values, index=dates, columns=columns))
+        return panel
+
+    def since(self, start, end=None):
+        """只保留 [start, end] 内的日期"""
+        panel = EtfPanel()
+        panel._set(self.frame.loc[pd.Timestamp(start):pd.Timestamp(end) if end is not None else None])
+        return panel
+
+    def last_dates(self):
+        """各 ETF 最后一个有收盘价的日期（没有数据为 NaT）"""
+        valid = self.field('收盘').notna().to_numpy()
+        if not len(valid):
+            return pd.Series(pd.NaT, index=self.codes, dtype='datetime64[ns]')
+        last = len(valid) - 1 - np.argmax(valid[::-1], axis=0)
+        dates = pd.Series(self.dates[last], index=self.codes)
+        return dates.where(valid.any(axis=0))
+
+    # ---- 整表指标 ----
+    def shares(self):
+        """份额（停牌或缺失的日期沿用上一日）"""
+        return self.field('份额').ffill()
+
+    def aum(self):
+        """规模 = 份额 × 收盘价（以二级市场价格近似净值）"""
+        return self.shares() * self.field('收盘').ffill()
+
+    def exact_shares(self):
+        """快照给出的实际份额，反推的估算份额与缺失记为 NaN"""
+        return self.field('份额').where(self.field('份额估算') == 0)
+
+    def net_flow(self):
+        """
+        每日净申赎金额 = Δ份额 × 当日收盘价（正为净创设，负为净赎回）
+        只在实际份额之间差分：估算份额的日期与每只 ETF 第一个实际份额的日期为 NaN，
+        两个实际份额之间隔着估算或缺失的日期时，变动记在后一个实际份额的日期
+        """
+        exact = self.exact_shares()
+        return exact.ffill().diff().where(exact.notna()) * self.field('收盘').ffill()
+
+    def flow_rate(self):
+        """全市场每日净申赎率 = 净申赎金额合计 / 这些 ETF 前一日的规模合计"""
+        flow = self.net_flow()
+        base = self.aum().shift().where(flow.notna())
+        return flow.sum(axis=1, min_count=1) / base.sum(axis=1, min_count=1)
+
+    def amount(self):
+        """全部 ETF 每日成交额合计"""
+        return self.field('成交额').sum(axis=1, min_count=1)
+
+    def amount_ratio(self, market_amount):
+        """ETF 成交额占 A 股成交额的比例（按日期对齐）"""
+        return self.amount() / pd.Series(market_amount, dtype=float).reindex(self.dates)
+
+    def by_type(self, frame, types):
+        """
+        按大类汇总（日期 × 代码 的表与 代码 × 大类 的 0/1 矩阵相乘）
+        :param types: 以代码为索引的大类，classify 的结果；未分类的代码计入股票ETF
+        """
+        types = pd.Series(types, dtype=object).reindex(frame.columns).fillna(ETF_TYPES[0])
+        onehot = (types.to_numpy()[:, None] == np.array(ETF_TYPES)[None, :]).astype(float)
+        values = frame.to_numpy(dtype=float)
+        totals = np.nan_to_num(values) @ onehot
+        totals[~(~np.isnan(values)).any(axis=1)] = np.nan
+        return pd.DataFrame(totals, index=frame.index, columns=list(ETF_TYPES))
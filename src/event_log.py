@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+执行事件日志：每条事件追加一行 JSON（JSON Lines）并立即落盘，
+线程与子进程可同时写入同一文件；运行结束时只物化一份精简汇总，
+内存占用不随任务数增长，进程崩溃时已写入的事件也不会丢失。
+多次运行（常驻服务的每次刷新）追加到同一文件，以运行 ID 区分；文件按日期轮转
+"""
+import os
+import glob
+import json
+import threading
+from datetime import datetime, date
+
+# 汇总中保留的告警/错误/洞察条数上限（总数见 task_counts）
+MAX_MESSAGES = 200
+# 轮转后保留的历史日志份数（按天）
+KEEP_DAYS = 7
+
+
+class EventLog:
+    def __init__(self, path, fsync=False, keep_days=KEEP_DAYS):
+        """
+        追加写入的事件日志
+        :param path: JSONL 文件路径；跨天后旧文件改名为 <名称>.<日期>.jsonl
+        :param fsync: 每条事件后是否 fsync（默认只保证写入操作系统，进程崩溃不丢失）
+        :param keep_days: 保留的轮转文件份数
+        """
+        self.path = path
+        self.fsync = fsync
+        self.keep_days = keep_days
+        self.run_id = None
+        self._lock = threading.Lock()
+        self._fd = None
+        self._pid = None
+        self._day = None
+
+    def _handle(self):
+        # 子进程（fork / spawn）各自打开文件描述符，O_APPEND 保证整行写入不交错
+        if self._fd is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            self._pid = os.getpid()
+        return self._fd
+
+    def rotated_path(self, day):
+        root, ext = os.path.splitext(self.path)
+        return f'{root}.{day:%Y-%m-%d}{ext}'
+
+    def _rotate(self, today):
+        """当前文件不是今天写入的：改名为带日期的文件，删除超出 keep_days 的旧文件"""
+        if self._day is None:
+            try:
+                self._day = date.fromtimestamp(os.path.getmtime(self.path))
+            except OSError:
+                self._day = today
+        if self._day == today:
+            return
+        self._close()
+        try:
+            # 其他进程已经轮转过时，当前文件是今天新建的，不再改名
+            if date.fromtimestamp(os.path.getmtime(self.path)) != today:
+                os.replace(self.path, self.rotated_path(self._day))
+        except OSError:
+            pass    # 文件不存在
+        self._day = today
+        root, ext = os.path.splitext(self.path)
+        for old in sorted(glob.glob(f'{glob.escape(root)}.????-??-??{ext}'))[:-self.keep_days or None]:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+    def start(self, run_id=None):
+        """
+        开始新的一次运行：之后的事件带上新的运行 ID，追加在已有事件之后
+        :param run_id: 运行 ID，默认由当前时间与进程号生成
+        """
+        with self._lock:
+            self._rotate(date.today())
+            self.run_id = run_id or f'{datetime.now():%Y%m%d-%H%M%S-%f}-{os.getpid()}'
+        return self.run_id
+
+    def write(self, kind, payload):
+        """
+        追加一条事件（单次 write 调用写入整行）
+        :param kind: 事件类型，如 task / insight / signal / run
+        :param payload: 可 JSON 序列化的内容
+        """
+        now = datetime.now()
+        record = {'ts': now.isoformat(timespec='milliseconds'), 'pid': os.getpid(), 'run': self.run_id,
+                  'kind': kind, 'data': payload}
+        line = (json.dumps(record, ensure_ascii=False, default=str) + '\n').encode('utf-8')
+        with self._lock:
+            self._rotate(now.date())
+            fd = self._handle()
+            os.write(fd, line)
+            if self.fsync:
+                os.fsync(fd)
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self._fd is not None and self._pid == os.getpid():
+            os.close(self._fd)
+        self._fd = None
+        self._pid = None
+
+
+def read_records(path):
+    """逐行读取事件记录（流式，不整体载入），跳过崩溃时写了一半的行"""
+    try:
+        f = open(path, 'r', encoding='utf-8')
+    except FileNotFoundError:
+        return
+    with f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def read_events(path, run=None):
+    """
+    逐行读取事件
+    :param run: 只读取该运行 ID 的事件，None 为全部
+    """
+    for record in read_records(path):
+        if run is None or record.get('run') == run:
+            yield record['kind'], record['data']
+
+
+class LogSummary(dict):
+    def __init__(self, max_messages=MAX_MESSAGES):
+        """
+        执行日志的精简汇总（dict，可直接 JSON 序列化）：
+        任务只保留每个名称的最后状态与按状态计数，完整记录在 JSONL 事件日志中
+        :param max_messages: 告警/错误/洞察列表的保留上限
+        """
+        super().__init__()
+        self.max_messages = max_messages
+        self.reset()
+
+    def reset(self):
+        """清空汇总（新一次运行开始时调用），上次运行追加的字段也一并去掉"""
+        self.clear()
+        self.update({
+            'start_time': None,
+            'end_time': None,
+            'task_counts': {},
+            'task_status': {},
+            'errors': [],
+            'warnings': [],
+            'charts': [],
+            'insights': [],
+            'market_signals': {},
+        })
+
+    def _keep(self, key, item):
+        items = self[key]
+        if len(items) < self.max_messages:
+            items.append(item)
+
+    def apply(self, kind, payload):
+        """把一条事件计入汇总"""
+        if kind == 'task':
+            status = payload['status']
+            counts = self['task_counts']
+            counts[status] = counts.get(status, 0) + 1
+            self['task_status'][payload['task']] = status
+            if status == 'error':
+                self._keep('errors', payload['details'])
+            elif status == 'warning':
+                self._keep('warnings', payload['details'])
+            chart = payload.get('chart_path')
+            if chart and chart not in self['charts']:
+                self['charts'].append(chart)
+        elif kind == 'insight':
+            self._keep('insights', payload)
+        elif kind == 'signal':
+            key, value = payload
+            self['market_signals'][key] = value
+
+    def merge(self, other):
+        """
+        并入另一次运行的汇总（常驻服务把各刷新分组最近一次的结果合成整体报告）：
+        按状态计数相加，同名任务取后并入的状态
+        """
+        counts = self['task_counts']
+        for status, count in other.get('task_counts', {}).items():
+            counts[status] = counts.get(status, 0) + count
+        self['task_status'].update(other.get('task_status', {}))
+        for key in ('errors', 'warnings', 'insights'):
+            for item in other.get(key, []):
+                self._keep(key, item)
+        for chart in other.get('charts', []):
+            if chart not in self['charts']:
+                self['charts'].append(chart)
+        self['market_signals'].update(other.get('market_signals', {}))
+        starts = [t for t in (self['start_time'], other.get('start_time')) if t]
+        ends = [t for t in (self['end_time'], other.get('end_time')) if t]
+        self['start_time'] = min(starts, default=None)
+        self['end_time'] = max(ends, default=None)
+
+    @property
+    def task_total(self):
+        return sum(self['task_counts'].values())
+
+
+def summarize(path, run=None, max_messages=MAX_MESSAGES):
+    """
+    从事件日志重建一次运行的汇总（崩溃后复盘用）
+    :param run: 运行 ID，默认为文件中最后一次运行
+    """
+    summary = LogSummary(max_messages)
+    current = object()
+    for record in read_records(path):
+        if run is not None and record.get('run') != run:
+            continue
+        if run is None and record.get('run') != current:
+            current = record.get('run')
+            summary.reset()
+        summary.apply(record['kind'], record['data'])
+    return summary
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+向量化指标引擎：一次对齐全部价格序列，在同一个矩阵上计算涨跌幅、波动率、
+均线、趋势、分位数与相关矩阵，各解读函数只读取结果
+"""
+import numpy as np
+import pandas as pd
+
+
+def _clean(series):
+    """统一为无时区日期索引、无重复日期的浮点序列"""
+    series = pd.Series(series, dtype=float).dropna()
+    if isinstance(series.index, pd.DatetimeIndex) and series.index.tz is not None:
+        series.index = series.index.tz_localize(None)
+    return series[~series.index.duplicated(keep='last')]
+
+
+def _pack(values):
+    """
+    每列有效值按时间顺序压到矩阵底部，缺失值留在顶部
+    这样各列“倒数第 n 个有效值”落在同一行，按各自交易日历计算的指标可以整行运算
+    返回 (压缩后的矩阵, 行序号置换)
+    """
+    order = np.argsort(~np.isnan(values), axis=0, kind='stable')
+    return np.take_along_axis(values, order, axis=0), order
+
+
+def _unpack(packed, order):
+    """把压缩矩阵中的值放回原日期行"""
+    out = np.full(packed.shape, np.nan)
+    np.put_along_axis(out, order, packed, axis=0)
+    return out
+
+
+def _nanlast_rows(packed, n):
+    """最后 n 行（行数不足时顶部补 NaN）"""
+    if n <= len(packed):
+        return packed[len(packed) - n:]
+    pad = np.full((n - len(packed), packed.shape[1]), np.nan)
+    return np.vstack([pad, packed])
+
+
+def _corrcoef(matrix):
+    """完整行上的皮尔逊相关矩阵（行数不足时为 NaN）"""
+    complete = matrix[~np.isnan(matrix).any(axis=1)]
+    k = matrix.shape[1]
+    if len(complete) < 2:
+        return np.full((k, k), np.nan)
+    centered = complete - complete.mean(axis=0)
+    cov = centered.T @ centered
+    std = np.sqrt(np.diag(cov))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return cov / np.outer(std, std)
+
+
+class IndicatorEngine:
+    def __init__(self, prices, trend_period=10, vol_window=20, periods_per_year=252):
+        """
+        指标引擎
+        :param prices: {名称: pd.Series} 或宽表 DataFrame（列为标的，索引为日期）
+        :param trend_period: 趋势判断窗口（最近 N 日均值对比前 N 日均值）
+        :param vol_window: 波动率滚动窗口
+        :param periods_per_year: 年化系数
+        """
+        if not isinstance(prices, pd.DataFrame):
+            prices = pd.concat(
+                {name: _clean(series) for name, series in prices.items()}, axis=1
+            ) if prices else pd.DataFrame()
+        prices = prices.sort_index().astype(float)
+
+        self.prices = prices
+        self.columns = list(prices.columns)
+        self.trend_period = trend_period
+        self.vol_window = vol_window
+        self.periods_per_year = periods_per_year
+
+        values = prices.to_numpy(dtype=float) if len(prices) else np.empty((0, len(self.columns)))
+        self._packed, self._order = _pack(values)
+        self._count = (~np.isnan(values)).sum(axis=0)
+
+        packed = self._packed
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self._pct = packed[1:] / packed[:-1] - 1  # 各自日历上的日收益率
+        self._diff = packed[1:] - packed[:-1]
+
+        self.count = pd.Series(self._count, index=self.columns)
+        self.last = self._series(packed[-1] if len(packed) else np.full(len(self.columns), np.nan))
+        self.volatility = self._series(self._volatility())
+        self.trend = self._trend()
+        self.percentile = self._series(self._percentile())
+
+    def _series(self, values):
+        return pd.Series(values, index=self.columns, dtype=float)
+
+    def _volatility(self):
+        window = _nanlast_rows(self._pct, self.vol_window)
+        with np.errstate(invalid='ignore'):
+            std = np.std(window, axis=0, ddof=1)
+        return std * np.sqrt(self.periods_per_year) * 100
+
+    def _trend(self):
+        n = self.trend_period
+        recent = _nanlast_rows(self._packed, n).mean(axis=0)
+        previous = _nanlast_rows(self._packed, n * 2)[:n].mean(axis=0)
+        trend = np.where(recent > previous, 'up', 'down').astype(object)
+        trend[self._count < n * 2] = 'unknown'
+        return pd.Series(trend, index=self.columns)
+
+    def _percentile(self):
+        if not len(self._packed):
+            return np.full(len(self.columns), np.nan)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return (self._packed <= self._packed[-1]).sum(axis=0) / self._count * 100
+
+    def change(self, lookback):
+        """最新值相对倒数第 lookback 个有效值的涨跌幅（%），数据不足为 NaN"""
+        base = _nanlast_rows(self._packed, lookback)[0]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self._series((self._packed[-1] / base - 1) * 100 if len(self._packed) else base)
+
+    def moving_average(self, window):
+        """最新的 window 日均线值（有效值不足 window 个为 NaN）"""
+        return self._series(_nanlast_rows(self._packed, window).mean(axis=0))
+
+    def returns(self, diff=()):
+        """
+        各列按自身日历计算的日变化，放回原日期行
+        :param diff: 使用差值而非收益率的列（如收益率类指标）
+        """
+        changes = self._changes(diff)
+        changes = np.vstack([np.full((1, len(self.columns)), np.nan), changes])
+        return pd.DataFrame(_unpack(changes, self._order), index=self.prices.index, columns=self.columns)
+
+    def _changes(self, diff=()):
+        if not diff:
+            return self._pct
+        mask = np.isin(self.columns, list(diff))
+        return np.where(mask, self._diff, self._pct)
+
+    def corr(self, columns=None, tail=None, diff=()):
+        """
+        日变化相关矩阵（只使用所选列都有数据的日期）
+        :param columns: 参与计算的列，默认全部
+        :param tail: 每列只取最近 tail 个日变化
+        :param diff: 使用差值而非收益率的列
+        """
+        columns = list(columns) if columns is not None else self.columns
+        changes = self._changes(diff)
+        if tail is not None:
+            changes = changes.copy()
+            changes[:max(len(changes) - tail, 0)] = np.nan
+        changes = np.vstack([np.full((1, len(self.columns)), np.nan), changes])
+        aligned = _unpack(changes, self._order)
+        positions = [self.columns.index(c) for c in columns]
+        return pd.DataFrame(_corrcoef(aligned[:, positions]), index=columns, columns=columns)
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""
+盘中模式：日线指标的窗口累加量在每个交易日开始时算好一次，
+之后每根新的分钟线只改写当日的临时收盘价，涨跌幅、波动率、趋势、分位数和相关性都是 O(1) 更新，
+不再对整个窗口重新计算；读取接口与 IndicatorEngine 相同，解读函数可以直接使用
+"""
+import numpy as np
+import pandas as pd
+from rolling_corr import _WindowSums
+
+
+def _local_dates(index):
+    """时间戳 → 交易所当地日期（datetime64[D]）"""
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.normalize().to_numpy().astype('datetime64[D]')
+
+
+class _Track:
+    def __init__(self, dates, closes):
+        """
+        单个标的：已收盘的日线 (base) + 最新交易日的临时收盘价 (head)
+        最新交易日的日线收盘价先作为 head，该日的分钟线到来后被最新价替换
+        """
+        self.dates = dates[:-1]
+        self.closes = closes[:-1]
+        self.head_date = dates[-1]
+        self.head = closes[-1]
+        self.last_bar = None        # 最后喂入的分钟线时间戳（交易所当地时间）
+        self.bar_price = np.nan     # 当日上一根分钟线价格（计算分钟收益率，隔夜跳空不计入）
+        self.sum_sq = 0.0           # 当日分钟对数收益率平方和
+        self.bars = 0               # 当日分钟线数
+
+    def fold(self, date, price):
+        """head 所在交易日收盘，计入日线；date 成为新的最新交易日"""
+        self.dates = np.append(self.dates, self.head_date)
+        self.closes = np.append(self.closes, self.head)
+        self.head_date, self.head = date, price
+        self.bar_price, self.sum_sq, self.bars = np.nan, 0.0, 0
+
+
+class IntradayState:
+    def __init__(self, prices, trend_period=10, vol_window=20, periods_per_year=252):
+        """
+        盘中指标状态
+        :param prices: {名称: 日线收盘价 pd.Series}，可以包含当日尚未收盘的日线
+        其余参数与 IndicatorEngine 相同；change / trend / percentile / volatility 与
+        IndicatorEngine 在“日线 + 当日最新价”上的结果一致，相关性见 corr
+        """
+        self.trend_period = trend_period
+        self.vol_window = vol_window
+        self.periods_per_year = periods_per_year
+        self.columns = []
+        self._tracks = {}
+        for name, series in prices.items():
+            series = pd.Series(series, dtype=float).dropna().sort_index()
+            if series.empty:
+                continue
+            dates = _local_dates(series.index)
+            keep = np.append(dates[1:] != dates[:-1], True)     # 同一日期保留最后一个
+            track = _Track(dates[keep], series.to_numpy()[keep])
+            self._prepare(track)
+            self._tracks[name] = track
+            self.columns.append(name)
+        self._corr = {}
+        self.bars = 0
+        self.updated = None
+        self._publish()
+
+    # ---- 日线部分：每个交易日开始时计算一次 ----
+    def _prepare(self, track):
+        closes, n, v = track.closes, self.trend_period, self.vol_window
+        track.sorted = np.sort(closes)
+        # 最近 n 日均值 = (最后 n-1 个已收盘价之和 + head) / n，对比再往前 n 日的均值
+        track.trend_sum = closes[len(closes) - (n - 1):].sum() if n > 1 else 0.0
+        track.trend_prev = closes[len(closes) - (2 * n - 1):len(closes) - (n - 1)].mean() \
+            if len(closes) >= 2 * n - 1 else np.nan
+        # 波动率窗口 = 最后 v-1 个已收盘日收益率 + 当日收益率
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = closes[1:] / closes[:-1] - 1
+        window = returns[len(returns) - (v - 1):] if v > 1 else returns[:0]
+        track.vol_sums = (window.sum(), (window ** 2).sum()) if len(returns) >= v - 1 else None
+
+    # ---- 增量更新 ----
+    def update(self, bars):
+        """
+        喂入分钟线（只处理每个标的上次之后的新 K 线）
+        :param bars: {名称: 分钟线 DataFrame（含 Close 列）或收盘价 Series}，按时间顺序的时间戳索引
+        :return: 本次喂入的 K 线数
+        """
+        fed = 0
+        for name, frame in bars.items():
+            track = self._tracks.get(name)
+            if track is None or frame is None or len(frame) == 0:
+                continue
+            close = frame['Close'] if isinstance(frame, pd.DataFrame) else frame
+            index, values = pd.DatetimeIndex(close.index), np.asarray(close, dtype=float)
+            if index.tz is not None:
+                index = index.tz_localize(None)     # 按交易所当地时间比较与划分交易日
+            start = index.searchsorted(track.last_bar, side='right') if track.last_bar is not None else 0
+            if start >= len(index):
+                continue
+            index, values = index[start:], values[start:]
+            dates = _local_dates(index)
+            for date, price in zip(dates, values):
+                if np.isnan(price) or date < track.head_date:
+                    continue                    # 缺失值或已收盘交易日的迟到 K 线
+                if date > track.head_date:
+                    track.fold(date, price)
+                    self._prepare(track)
+                    self._corr.clear()
+                elif not np.isnan(track.bar_price):
+                    r = np.log(price / track.bar_price)
+                    track.sum_sq += r * r
+                    track.bars += 1
+                track.head = track.bar_price = price
+                fed += 1
+            track.last_bar = index[-1]
+            self.updated = index[-1] if self.updated is None else max(self.updated, index[-1])
+        self.bars += fed
+        self._publish()
+        return fed
+
+    def _publish(self):
+        """按各标的的累加量刷新读取用的 Series（每个标的 O(1)）"""
+        n, v = self.trend_period, self.vol_window
+        last, count, trend, percentile, volatility, realized = [], [], [], [], [], []
+        for name in self.columns:
+            track = self._tracks[name]
+            base = len(track.closes)
+            last.append(track.head)
+            count.append(base + 1)
+            if base + 1 < 2 * n:
+                trend.append('unknown')
+            else:
+                trend.append('up' if (track.trend_sum + track.head) / n > track.trend_prev else 'down')
+            percentile.append((np.searchsorted(track.sorted, track.head, side='right') + 1) / (base + 1) * 100)
+            if track.vol_sums is None or not base:
+                volatility.append(np.nan)
+            else:
+                s1, s2 = track.vol_sums
+                r = track.head / track.closes[-1] - 1
+                mean = (s1 + r) / v
+                var = (s2 + r * r - v * mean * mean) / (v - 1)
+                volatility.append(np.sqrt(max(var, 0.0)) * np.sqrt(self.periods_per_year) * 100)
+            realized.append(np.sqrt(track.sum_sq) * 100 if track.bars else np.nan)
+        self.last = self._series(last)
+        self.count = pd.Series(count, index=self.columns, dtype=int)
+        self.trend = pd.Series(trend, index=self.columns, dtype=object)
+        self.percentile = self._series(percentile)
+        self.volatility = self._series(volatility)
+        self.realized_vol = self._series(realized)
+        self.dates = pd.Series([pd.Timestamp(self._tracks[c].head_date) for c in self.columns],
+                               index=self.columns, dtype='datetime64[ns]')
+        self.session = self.dates.max() if self.columns else None
+
+    def _series(self, values):
+        return pd.Series(values, index=self.columns, dtype=float)
+
+    # ---- 读取 ----
+    def change(self, lookback):
+        """最新价相对倒数第 lookback 个值的涨跌幅（%），同 IndicatorEngine.change"""
+        values = []
+        for name in self.columns:
+            track = self._tracks[name]
+            if lookback <= 1:
+                base = track.head
+            elif len(track.closes) >= lookback - 1:
+                base = track.closes[-(lookback - 1)]
+            else:
+                base = np.nan
+            values.append((track.head / base - 1) * 100)
+        return self._series(values)
+
+    def _changes(self, name, diff):
+        """已收盘部分的日变化：(日期, 值)，diff 中的列用差值"""
+        track = self._tracks[name]
+        closes = track.closes
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = closes[1:] - closes[:-1] if name in diff else closes[1:] / closes[:-1] - 1
+        return track.dates[1:], values
+
+    def _live_change(self, name, diff):
+        """最新交易日的日变化（最新价相对上一收盘价）"""
+        track = self._tracks[name]
+        if not len(track.closes):
+            return np.nan
+        previous = track.closes[-1]
+        return track.head - previous if name in diff else track.head / previous - 1
+
+    def corr(self, columns=None, tail=None, diff=()):
+        """
+        日变化相关矩阵，最新交易日的变化取最新价
+        已收盘日期的累加和在每个交易日首次读取时计算一次，之后每次读取只加上最新交易日起那一两行；
+        与 IndicatorEngine 相同，只使用所选列都有数据的日期
+        :param tail: 只用最近 tail 个日期行
+        :param diff: 使用差值而非收益率的列
+        """
+        columns = list(columns) if columns is not None else list(self.columns)
+        diff = tuple(sorted(diff))
+        key = (tuple(columns), tail, diff)
+        if key not in self._corr:
+            self._corr[key] = self._corr_base(columns, diff, tail)
+        fixed, pending = self._corr[key]
+        live = _WindowSums(len(columns))
+        for date, known in pending:
+            row = np.full(len(columns), np.nan)
+            for j, value in known:
+                row[j] = value
+            for j, name in enumerate(columns):
+                if self._tracks[name].head_date == date:
+                    row[j] = self._live_change(name, diff)
+            if not np.isnan(row).any():
+                live.add(row)
+        for attr in ('count', 'sx', 'sxx', 'sxy'):
+            setattr(live, attr, getattr(live, attr) + getattr(fixed, attr))
+        return pd.DataFrame(live.corr(2), index=columns, columns=columns)
+
+    def _corr_base(self, columns, diff, tail):
+        """
+        以各列最新交易日中最早的一天为界：之前的日期行只含已收盘数据，累加和固定；
+        之后的待定行含临时值，每次读取时重新加入
+        :return: (固定部分累加和, [(待定行日期, [(列号, 已收盘的值)])])
+        """
+        changes = [self._changes(name, diff) for name in columns]
+        heads = [self._tracks[name].head_date for name in columns]
+        dates = np.unique(np.concatenate([d for d, _ in changes] + [heads]))
+        rows = np.full((len(dates), len(columns)), np.nan)
+        for j, (d, values) in enumerate(changes):
+            rows[np.searchsorted(dates, d), j] = values
+        split = np.searchsorted(dates, min(heads))
+        fixed = rows[:split]
+        fixed[np.isnan(fixed).any(axis=1)] = np.nan
+        if tail is not None:
+            fixed = fixed[max(split - max(tail - (len(dates) - split), 0), 0):]
+        sums = _WindowSums(len(columns))
+        sums.rebuild(fixed)
+        pending = [(dates[i], [(j, v) for j, v in enumerate(rows[i]) if not np.isnan(v)])
+                   for i in range(split, len(dates))]
+        return sums, pending
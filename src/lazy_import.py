@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""
+延迟导入：模块在第一次访问属性时才导入，导入耗时计入真正用到它的任务而不是启动
+"""
+import importlib
+import threading
+
+
+class LazyModule:
+    def __init__(self, name, on_import=None):
+        """
+        延迟导入的模块代理
+        :param name: 模块名，如 akshare
+        :param on_import: 首次导入后调用一次的函数（如给其依赖的 requests 安装钩子）
+        """
+        self._name = name
+        self._on_import = on_import
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._module is None:
+                module = importlib.import_module(self._name)
+                if self._on_import is not None:
+                    self._on_import()
+                self._module = module
+            return self._module
+
+    def __getattr__(self, attr):
+        module = self._module or self._load()
+        return getattr(module, attr)
+
+    def __repr__(self):
+        return f'<lazy module {self._name!r}>'
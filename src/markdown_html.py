@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""
+Markdown -> 精简 HTML（构建时预渲染用，只依赖标准库）
+覆盖站点报告用到的语法：标题、段落（换行即 <br>，与页面 marked 的 breaks: true 一致）、
+粗体/斜体/删除线/行内代码、链接与图片、有序/无序（嵌套）列表、GFM 表格、引用、分隔线、
+代码块；mermaid 代码块输出为 <div class="mermaid">，由页面按需加载 mermaid 渲染
+原始 HTML 一律转义，输出无需再经 DOMPurify
+"""
+import re
+from html import escape
+
+# 渲染规则改变输出时递增
+RENDER_VERSION = 1
+
+_FENCE_RE = re.compile(r'^ {0,3}(`{3,}|~{3,})\s*([\w+-]*)')
+_HEADING_RE = re.compile(r'^ {0,3}(#{1,6})(?:\s+(.*?))?\s*#*\s*$')
+_HR_RE = re.compile(r'^ {0,3}([-*_])(?:\s*\1){2,}\s*$')
+_SETEXT_RE = re.compile(r'^ {0,3}(=+|-+)\s*$')
+_LIST_RE = re.compile(r'^( *)([-*+]|\d{1,9}[.)])(?:\s+(.*)|\s*$)')
+_QUOTE_RE = re.compile(r'^ {0,3}> ?(.*)$')
+_TABLE_DELIM_RE = re.compile(r'^ *\|? *:?-+:? *(?:\| *:?-+:? *)*\|? *$')
+
+_INLINE_RE = re.compile(
+    r'(?P<code>(?P<ticks>`+)(?P<code_text>.+?)(?P=ticks))'
+    r'|(?P<image>!\[(?P<alt>[^\]]*)\]\((?P<src>[^)\s]+)(?:\s+"(?P<img_title>[^"]*)")?\))'
+    r'|(?P<link>\[(?P<link_text>[^\]]+)\]\((?P<href>[^)\s]+)(?:\s+"(?P<link_title>[^"]*)")?\))'
+    r'|(?P<autolink><(?P<auto_url>https?://[^>\s]+)>)'
+    r'|(?P<url>https?://[^\s<>()　-〿＀-￯]+)'
+    r'|(?P<strong>\*\*(?P<strong_text>\S(?:.*?\S)?)\*\*|__(?P<strong_text2>\S(?:.*?\S)?)__)'
+    r'|(?P<em>\*(?P<em_text>[^\s*](?:[^*]*?[^\s*])?)\*|(?<![\w])_(?P<em_text2>[^\s_](?:[^_]*?[^\s_])?)_(?![\w]))'
+    r'|(?P<del>~~(?P<del_text>\S(?:.*?\S)?)~~)'
+    r'|(?P<escape>\\(?P<escaped>[\\`*_{}\[\]()#+\-.!|~>]))'
+)
+_SAFE_URL_RE = re.compile(r'^(?:https?:|mailto:|#|/|\./|\.\./|[^:]*$)', re.IGNORECASE)
+
+
+def _safe_url(url):
+    return url if _SAFE_URL_RE.match(url) else '#'
+
+
+class MarkdownRenderer:
+    def __init__(self, resolve_image=None):
+        """
+        :param resolve_image: 图片地址改写函数 (src) -> src，用于把报告中的相对路径改为站点根路径
+        """
+        self.resolve_image = resolve_image
+        self.images = []
+        self.has_mermaid = False
+
+    # ---- 行内 ----
+    def inline(self, text):
+        parts = []
+        pos = 0
+        for match in _INLINE_RE.finditer(text):
+            parts.append(escape(text[pos:match.start()], quote=False))
+            parts.append(self._inline_token(match))
+            pos = match.end()
+        parts.append(escape(text[pos:], quote=False))
+        return ''.join(parts)
+
+    def _inline_token(self, m):
+        if m.group('code'):
+            return f"<code>{escape(m.group('code_text').strip(), quote=False)}</code>"
+        if m.group('image'):
+            src = m.group('src')
+            if self.resolve_image:
+                src = self.resolve_image(src)
+            self.images.append(src)
+            title = f' title="{escape(m.group("img_title"))}"' if m.group('img_title') else ''
+            return (f'<img src="{escape(_safe_url(src))}" alt="{escape(m.group("alt"))}"{title}'
+                    f' loading="lazy" decoding="async">')
+        if m.group('link'):
+            title = f' title="{escape(m.group("link_title"))}"' if m.group('link_title') else ''
+            return (f'<a href="{escape(_safe_url(m.group("href")))}"{title}>'
+                    f'{self.inline(m.group("link_text"))}</a>')
+        if m.group('autolink') or m.group('url'):
+            url = m.group('auto_url') or m.group('url')
+            return f'<a href="{escape(url)}">{escape(url, quote=False)}</a>'
+        if m.group('strong'):
+            return f"<strong>{self.inline(m.group('strong_text') or m.group('strong_text2'))}</strong>"
+        if m.group('em'):
+            return f"<em>{self.inline(m.group('em_text') or m.group('em_text2'))}</em>"
+        if m.group('del'):
+            return f"<del>{self.inline(m.group('del_text'))}</del>"
+        return escape(m.group('escaped'), quote=False)
+
+    def paragraph_lines(self, lines):
+        """段落内每个换行都输出 <br>（breaks: true）"""
+        return '<br>'.join(self.inline(line.strip().rstrip('\\').rstrip()) for line in lines)
+
+    # ---- 块级 ----
+    def render(self, text):
+        return ''.join(self.blocks(text.replace('\r\n', '\n').replace('\t', '    ').split('\n')))
+
+    def _starts_block(self, lines, i):
+        line = lines[i]
+        return bool(
+            not line.strip() or _FENCE_RE.match(line) or _HEADING_RE.match(line)
+            or _HR_RE.match(line) or _QUOTE_RE.match(line) or _LIST_RE.match(line)
+            or self._is_table(lines, i)
+        )
+
+    @staticmethod
+    def _is_table(lines, i):
+        return ('|' in lines[i] and i + 1 < len(lines) and '|' in lines[i + 1]
+                and '-' in lines[i + 1] and bool(_TABLE_DELIM_RE.match(lines[i + 1])))
+
+    def blocks(self, lines):
+        out = []
+        i = 0
+        while i < len(lines):
+            line = lines[i]
+            if not line.strip():
+                i += 1
+                continue
+
+            fence = _FENCE_RE.match(line)
+            if fence:
+                marker, lang = fence.group(1), fence.group(2)
+                body = []
+                i += 1
+                while i < len(lines) and not lines[i].strip().startswith(marker):
+                    body.append(lines[i])
+                    i += 1
+                i += 1
+                code = escape('\n'.join(body), quote=False)
+                if lang == 'mermaid':
+                    self.has_mermaid = True
+                    out.append(f'<div class="mermaid">{code}</div>')
+                else:
+                    cls = f' class="language-{lang}"' if lang else ''
+                    out.append(f'<pre><code{cls}>{code}\n</code></pre>')
+                continue
+
+            heading = _HEADING_RE.match(line)
+            if heading:
+                level = len(heading.group(1))
+                out.append(f'<h{level}>{self.inline(heading.group(2) or "")}</h{level}>')
+                i += 1
+                continue
+
+            if _HR_RE.match(line):
+                out.append('<hr>')
+                i += 1
+                continue
+
+            if self._is_table(lines, i):
+                i = self._table(lines, i, out)
+                continue
+
+            if _QUOTE_RE.match(line):
+                body = []
+                while i < len(lines) and lines[i].strip():
+                    quote = _QUOTE_RE.match(lines[i])
+                    body.append(quote.group(1) if quote else lines[i])
+                    i += 1
+                out.append(f'<blockquote>{"".join(self.blocks(body))}</blockquote>')
+                continue
+
+            if _LIST_RE.match(line):
+                i = self._list(lines, i, out)
+                continue
+
+            # 段落（下一行为 === / --- 时是 setext 标题）
+            para = [line]
+            i += 1
+            while i < len(lines) and lines[i].strip():
+                setext = _SETEXT_RE.match(lines[i])
+                if setext:
+                    level = 1 if setext.group(1)[0] == '=' else 2
+                    out.append(f'<h{level}>{self.inline(" ".join(l.strip() for l in para))}</h{level}>')
+                    para = []
+                    i += 1
+                    break
+                if self._starts_block(lines, i):
+                    break
+                para.append(lines[i])
+                i += 1
+            if para:
+                out.append(f'<p>{self.paragraph_lines(para)}</p>')
+        return out
+
+    def _table(self, lines, i, out):
+        def cells(row):
+            row = row.strip()
+            if row.startswith('|'):
+                row = row[1:]
+            if row.endswith('|') and not row.endswith('\\|'):
+                row = row[:-1]
+            return [c.strip().replace('\\|', '|') for c in re.split(r'(?<!\\)\|', row)]
+
+        header = cells(lines[i])
+        aligns = []
+        for spec in cells(lines[i + 1]):
+            if spec.startswith(':') and spec.endswith(':'):
+                aligns.append(' align="center"')
+            elif spec.endswith(':'):
+                aligns.append(' align="right"')
+            elif spec.startswith(':'):
+                aligns.append(' align="left"')
+            else:
+                aligns.append('')
+        aligns += [''] * (len(header) - len(aligns))
+        parts = ['<table><thead><tr>']
+        parts += [f'<th{aligns[k]}>{self.inline(c)}</th>' for k, c in enumerate(header)]
+        parts.append('</tr></thead>')
+        i += 2
+        rows = []
+        while i < len(lines) and lines[i].strip() and '|' in lines[i]:
+            row = cells(lines[i])[:len(header)]
+            row += [''] * (len(header) - len(row))
+            rows.append('<tr>' + ''.join(f'<td{aligns[k]}>{self.inline(c)}</td>' for k, c in enumerate(row)) + '</tr>')
+            i += 1
+        if rows:
+            parts.append('<tbody>' + ''.join(rows) + '</tbody>')
+        parts.append('</table>')
+        out.append(''.join(parts))
+        return i
+
+    def _list(self, lines, i, out):
+        first = _LIST_RE.match(lines[i])
+        indent = len(first.group(1))
+        ordered = first.group(2)[0].isdigit()
+        start = int(first.group(2)[:-1]) if ordered else 1
+        items = []
+        loose = False
+        while i < len(lines):
+            match = _LIST_RE.match(lines[i])
+            if not match or len(match.group(1)) != indent or match.group(2)[0].isdigit() != ordered:
+                break
+            content_indent = indent + len(match.group(2)) + 1
+            body = [match.group(3) or '']
+            i += 1
+            blank = False
+            while i < len(lines):
+                line = lines[i]
+                if not line.strip():
+                    blank = True
+                    i += 1
+                    continue
+                line_indent = len(line) - len(line.lstrip(' '))
+                if line_indent > indent:
+                    # 子列表或续行：去掉内容缩进
+                    if blank:
+                        body.append('')
+                        loose = loose or not _LIST_RE.match(line)
+                    body.append(line[min(line_indent, content_indent):])
+                    blank = False
+                    i += 1
+                    continue
+                if blank or self._starts_block(lines, i):
+                    break
+                body.append(line.strip())  # 惰性续行
+                i += 1
+            if blank and i < len(lines):
+                next_item = _LIST_RE.match(lines[i])
+                if next_item and len(next_item.group(1)) == indent:
+                    loose = True
+            items.append(body)
+
+        parts = []
+        for body in items:
+            blocks = self.blocks(body)
+            if not loose:
+                blocks = [b[3:-4] if b.startswith('<p>') and b.endswith('</p>') else b for b in blocks]
+            parts.append(f'<li>{"".join(blocks)}</li>')
+        tag = 'ol' if ordered else 'ul'
+        start_attr = f' start="{start}"' if ordered and start != 1 else ''
+        out.append(f'<{tag}{start_attr}>{"".join(parts)}</{tag}>')
+        return i
+
+
+def render_markdown(text, resolve_image=None):
+    """
+    渲染 Markdown
+    :return: (html, {'images': [...], 'mermaid': bool})
+    """
+    renderer = MarkdownRenderer(resolve_image)
+    html = renderer.render(text)
+    return html, {'images': renderer.images, 'mermaid': renderer.has_mermaid}
@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+import re
+import threading
+import pandas as pd
+from disk_cache import merge_frames
+from tracing import annotate
+
+_PERIOD_RE = re.compile(r'^(\d+)(d|wk|mo|y)$')
+_PERIOD_DAYS = {'d': 1, 'wk': 7, 'mo': 31, 'y': 366}
+
+
+def period_days(period):
+    """yfinance period 字符串换算为天数上限（用于比较窗口宽窄）"""
+    if period == 'max':
+        return float('inf')
+    if period == 'ytd':
+        return pd.Timestamp.now().dayofyear
+    match = _PERIOD_RE.match(period)
+    if not match:
+        raise ValueError(f'无法识别的 period: {period}')
+    return int(match.group(1)) * _PERIOD_DAYS[match.group(2)]
+
+
+def period_offset(period):
+    """yfinance period 字符串换算为日期偏移（用于切片），max 返回 None"""
+    if period == 'max':
+        return None
+    if period == 'ytd':
+        now = pd.Timestamp.now()
+        return now - now.replace(month=1, day=1)
+    match = _PERIOD_RE.match(period)
+    if not match:
+        raise ValueError(f'无法识别的 period: {period}')
+    n, unit = int(match.group(1)), match.group(2)
+    if unit == 'd':
+        return pd.DateOffset(days=n)
+    if unit == 'wk':
+        return pd.DateOffset(weeks=n)
+    if unit == 'mo':
+        return pd.DateOffset(months=n)
+    return pd.DateOffset(years=n)
+
+
+def flatten_ohlc(frame, symbol=None):
+    """把 yf.download 返回的多级列统一为单标的 OHLC 列"""
+    if frame is None or frame.empty:
+        return pd.DataFrame()
+    if isinstance(frame.columns, pd.MultiIndex):
+        for level in range(frame.columns.nlevels):
+            if symbol in frame.columns.get_level_values(level):
+                frame = frame.xs(symbol, axis=1, level=level)
+                break
+        else:
+            if symbol is not None:
+                raise KeyError(symbol)
+            frame = frame.droplevel(-1, axis=1)
+    return frame.dropna(how='all')
+
+
+def _yf_download(symbol, period, interval, start=None):
+    """默认下载器：单标的 yfinance 下载，给出 start 时只取该日期之后的数据"""
+    import yfinance as yf
+    window = {'start': start} if start is not None else {'period': period}
+    raw = yf.download(symbol, interval=interval, progress=False, **window)
+    return flatten_ohlc(raw, symbol)
+
+
+def _yf_download_batch(symbols, period, interval, start=None):
+    """默认批量下载器：一次分组下载多个标的（多线程后端），按标的拆分为 OHLC"""
+    import yfinance as yf
+    window = {'start': start} if start is not None else {'period': period}
+    raw = yf.download(
+        list(symbols), interval=interval,
+        group_by='ticker', threads=True, progress=False, **window
+    )
+    frames = {}
+    for symbol in symbols:
+        try:
+            frame = flatten_ohlc(raw, symbol)
+        except KeyError:
+            continue
+        if not frame.empty:
+            frames[symbol] = frame
+    return frames
+
+
+class MarketDataStore:
+    def __init__(self, downloader=None, batch_downloader=None, disk_cache=None, max_age=3600, clock=None):
+        """
+        进程内行情数据仓库
+        以 (symbol, period, interval) 请求数据，同一 (symbol, interval) 只保留一份最宽窗口的下载，
+        更窄的 period 直接从这份数据切片返回
+        :param downloader: 下载函数 (symbol, period, interval) -> DataFrame，默认使用 yfinance
+        :param batch_downloader: 批量下载函数 (symbols, period, interval) -> {symbol: DataFrame}
+        :param disk_cache: DiskCache 实例（可选），提供时跨运行持久化并只增量下载新数据
+        :param max_age: 磁盘缓存在该秒数内视为新鲜，不访问网络
+        :param clock: 返回当前时间的函数（回放时为录制时间），默认 pd.Timestamp.now
+        as_of 属性设为历史日期时按该日运行：下载窗口加宽到覆盖该日之前的 period，返回的数据截止到该日
+        """
+        self._download = downloader or _yf_download
+        self._download_batch = batch_downloader or _yf_download_batch
+        self.disk_cache = disk_cache
+        self.max_age = max_age
+        self.clock = clock or pd.Timestamp.now
+        self.as_of = None
+        self._frames = {}      # (symbol, interval) -> (period, DataFrame)
+        self._required = {}    # (symbol, interval) -> 本次运行登记的最宽 period
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def require(self, symbol, period, interval='1d'):
+        """登记本次运行需要的窗口，首次下载时直接取登记过的最宽窗口"""
+        key = (symbol, interval)
+        with self._lock:
+            current = self._required.get(key)
+            if current is None or period_days(period) > period_days(current):
+                self._required[key] = period
+
+    def required(self, interval='1d'):
+        """返回已登记的 {symbol: period}"""
+        with self._lock:
+            return {s: p for (s, i), p in self._required.items() if i == interval}
+
+    def put(self, symbol, period, interval, frame):
+        """写入一份已下载的数据（批量下载后回填），只保留 period 窗口内的部分"""
+        frame = self._slice(frame, period)
+        with self._lock:
+            self._frames[(symbol, interval)] = (period, frame)
+
+    def _slice(self, frame, period):
+        """截取 period 窗口（磁盘缓存逐日累积，会比登记的窗口更长）；按历史日期运行时截止到该日"""
+        if frame is None or frame.empty:
+            return frame
+        today = self._today(frame.index.tz)
+        offset = period_offset(period)
+        if offset is not None:
+            frame = frame[frame.index >= today - offset]
+        if self.as_of is not None:
+            frame = frame[frame.index < today + pd.Timedelta(days=1)]
+        return frame
+
+    def prefetch(self, interval='1d'):
+        """
+        把已登记但尚未缓存的标的合并为一次分组下载
+        磁盘缓存已覆盖的标的只按最早的缓存末日增量下载，其余取登记中最宽的窗口；
+        下载失败的标的留给 get() 单独补取
+        :return: (成功标的列表, 失败标的列表)
+        """
+        with self._lock:
+            pending = {
+                s: p for (s, i), p in self._required.items()
+                if i == interval and not self._covers((s, i), p)
+            }
+        if not pending:
+            return [], []
+
+        fetched = []
+        on_disk = {}
+        for symbol, period in pending.items():
+            cached, fresh = self._load_disk(symbol, period, interval)
+            if cached is None:
+                continue
+            if fresh:
+                self.put(symbol, period, interval, cached)
+                fetched.append(symbol)
+            else:
+                on_disk[symbol] = cached
+
+        if on_disk:
+            start = min(frame.index[-1] for frame in on_disk.values())
+            try:
+                frames = self._download_batch(sorted(on_disk), None, interval, start=start.strftime('%Y-%m-%d'))
+            except Exception:
+                frames = {}
+            for symbol, cached in on_disk.items():
+                frame = cached
+                if symbol in frames:
+                    frame = merge_frames(cached, frames[symbol])
+                    self._save_disk(symbol, interval, frame)
+                self.put(symbol, pending[symbol], interval, frame)
+                fetched.append(symbol)
+
+        remaining = {s: p for s, p in pending.items() if s not in fetched}
+        annotate(cache_hit=len(fetched) - len(on_disk), cache_incremental=len(on_disk),
+                 cache_miss=len(remaining))
+        if remaining:
+            period = max(remaining.values(), key=period_days)
+            frames = self._download_batch(sorted(remaining), self._window(period), interval)
+            for symbol, frame in frames.items():
+                self._save_disk(symbol, interval, frame)
+                self.put(symbol, period, interval, frame)
+                fetched.append(symbol)
+        missing = sorted(set(pending) - set(fetched))
+        return sorted(fetched), missing
+
+    def _load_disk(self, symbol, period, interval):
+        """
+        读取磁盘缓存
+        :return: (DataFrame 或 None, 是否新鲜)；缓存覆盖不到所需窗口时返回 None
+        """
+        if self.disk_cache is None:
+            return None, False
+        name = f'yf_{interval}'
+        frame = self.disk_cache.load(name, symbol=symbol)
+        offset = period_offset(period)
+        if frame is None or frame.empty or offset is None:
+            return None, False
+        # 起点留一周余量给周末与假期
+        cutoff = self._today(frame.index.tz) - offset + pd.Timedelta(days=7)
+        if frame.index[0] > cutoff:
+            return None, False
+        age = self.disk_cache.age(name, symbol=symbol)
+        return frame, age is not None and age < self.max_age
+
+    def _save_disk(self, symbol, interval, frame):
+        if self.disk_cache is not None:
+            self.disk_cache.save(frame, f'yf_{interval}', symbol=symbol)
+
+    def _today(self, tz=None):
+        today = pd.Timestamp(self.as_of if self.as_of is not None else self.clock()).normalize()
+        return today.tz_localize(tz) if tz is not None else today
+
+    def _window(self, period):
+        """下载用的 period：按历史日期运行时加上该日距今的天数（yfinance 的 period 总是从今天往前数）"""
+        if self.as_of is None or period == 'max':
+            return period
+        lag = (pd.Timestamp.now().normalize() - self._today()).days
+        return f'{int(period_days(period)) + lag}d' if lag > 0 else period
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _covers(self, key, period):
+        cached = self._frames.get(key)
+        return cached is not None and period_days(cached[0]) >= period_days(period)
+
+    def get(self, symbol, period='3mo', interval='1d'):
+        """获取 OHLC 数据（截取到 period 窗口），已有更宽窗口时不再下载"""
+        key = (symbol, interval)
+        with self._key_lock(key):
+            if not self._covers(key, period):
+                wanted = period
+                required = self._required.get(key)
+                if required and period_days(required) > period_days(wanted):
+                    wanted = required
+                frame = self._fetch(symbol, wanted, interval)
+                if frame is None or frame.empty:
+                    return pd.DataFrame()
+                self.put(symbol, wanted, interval, frame)
+            frame = self._frames[key][1]
+        return self._slice(frame, period).copy()
+
+    def _fetch(self, symbol, period, interval):
+        """单标的下载：磁盘缓存可用时只追加缓存末日之后的数据"""
+        cached, fresh = self._load_disk(symbol, period, interval)
+        if cached is not None:
+            if fresh:
+                return cached
+            try:
+                update = self._download(symbol, period, interval, start=cached.index[-1].strftime('%Y-%m-%d'))
+            except Exception:
+                return cached
+            if update is None or update.empty:
+                return cached
+            frame = merge_frames(cached, update)
+        else:
+            frame = self._download(symbol, self._window(period), interval)
+        if frame is not None and not frame.empty:
+            self._save_disk(symbol, interval, frame)
+        return frame
+
+    def poll(self, symbols, interval='1m', period='1d'):
+        """
+        盘中轮询：一次分组下载最新交易日的分钟线，不进缓存也不写磁盘
+        :return: {symbol: DataFrame}，下载失败的标的缺失
+        """
+        return self._download_batch(list(symbols), period, interval)
+
+    def close(self, symbol, period='3mo', interval='1d'):
+        """获取收盘价序列"""
+        frame = self.get(symbol, period, interval)
+        if frame.empty or 'Close' not in frame.columns:
+            return pd.Series(dtype=float, name=symbol)
+        return frame['Close'].rename(symbol)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._frames.clear()
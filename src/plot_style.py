@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+matplotlib 字体与样式
+字体解析结果按字体目录的修改时间缓存到磁盘，目录未变化时不加载字体管理器、不扫描磁盘；
+matplotlib 只在真正设置样式（渲染进程）时才导入
+"""
+import os
+import sys
+import json
+import hashlib
+from importlib import metadata
+from disk_cache import CACHE_DIR
+
+FONT_CANDIDATES = [
+    'WenQuanYi Micro Hei', 'WenQuanYi Zen Hei',
+    'Noto Sans CJK SC', 'Noto Sans SC', 'DejaVu Sans',
+]
+CJK_FONT_MARKERS = ('wqy', 'noto', 'cjk')
+FONT_CACHE_NAME = 'font_resolution.json'
+
+
+def font_directories():
+    """matplotlib 会查找字体的系统与用户目录（与 font_manager 的目录列表一致）"""
+    home = os.path.expanduser('~')
+    if sys.platform == 'win32':
+        return [os.path.join(os.environ.get('WINDIR', r'C:\Windows'), 'Fonts'),
+                os.path.join(os.environ.get('LOCALAPPDATA', home), 'Microsoft', 'Windows', 'Fonts')]
+    dirs = ['/usr/X11R6/lib/X11/fonts/TTF/', '/usr/X11/lib/X11/fonts', '/usr/share/fonts/',
+            '/usr/local/share/fonts/', '/usr/lib/openoffice/share/fonts/truetype/',
+            os.path.join(home, '.local/share/fonts'), os.path.join(home, '.fonts')]
+    if sys.platform == 'darwin':
+        dirs += ['/Library/Fonts/', '/Network/Library/Fonts/', '/System/Library/Fonts/',
+                 '/opt/local/share/fonts', os.path.join(home, 'Library/Fonts')]
+    return dirs
+
+
+def font_cache_key():
+    """字体目录（含子目录）的修改时间 + matplotlib 版本 + 候选字体；安装或删除字体后变化"""
+    stamps = []
+    for top in font_directories():
+        for root, _dirs, _files in os.walk(top):
+            try:
+                stamps.append((root, os.stat(root).st_mtime_ns))
+            except OSError:
+                continue
+    try:
+        version = metadata.version('matplotlib')
+    except metadata.PackageNotFoundError:
+        version = None
+    payload = json.dumps([version, FONT_CANDIDATES, sorted(stamps)])
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _scan_fonts():
+    """用 matplotlib 字体管理器解析：第一个真正已安装的候选字体与中文字体文件"""
+    from matplotlib import font_manager
+    installed = {entry.name for entry in font_manager.fontManager.ttflist}
+    font = next((name for name in FONT_CANDIDATES if name in installed), None)
+    cjk_files = sorted({
+        entry.fname for entry in font_manager.fontManager.ttflist
+        if any(marker in entry.fname.lower() for marker in CJK_FONT_MARKERS)
+    })
+    return {'font': font, 'cjk_files': cjk_files}
+
+
+def resolve_fonts(cache_dir=CACHE_DIR):
+    """
+    解析可用字体（磁盘缓存，字体目录未变化时直接返回）
+    :return: {'font': 可用的候选字体或 None, 'cjk_files': 中文字体文件列表}
+    """
+    path = os.path.join(cache_dir, FONT_CACHE_NAME)
+    key = font_cache_key()
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached.get('key') == key:
+            return cached['fonts']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    fonts = _scan_fonts()
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'key': key, 'fonts': fonts}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return fonts
+
+
+def setup_matplotlib_fonts(logger=None, verbose=True):
+    """
+    设置matplotlib字体（服务器环境优化）
+    :param logger: 日志回调函数（可选）
+    :param verbose: 是否打印所选字体（渲染子进程中关闭）
+    """
+    import matplotlib
+
+    available_font = resolve_fonts()['font']
+    if available_font:
+        if verbose:
+            print(f"✅ 使用字体: {available_font}")
+        if logger:
+            logger('字体设置', 'success', f'使用字体: {available_font}')
+    else:
+        if verbose:
+            print("⚠️  未找到中文字体，使用默认字体")
+        available_font = 'sans-serif'
+        if logger:
+            logger('字体设置', 'warning', '未找到中文字体')
+
+    matplotlib.rcParams.update({
+        'figure.figsize': (12, 8), 'figure.dpi': 100, 'savefig.dpi': 150,
+        'figure.facecolor': 'black', 'axes.facecolor': 'black',
+        'savefig.facecolor': 'black', 'savefig.transparent': False,
+        'axes.labelcolor': 'white', 'xtick.color': 'white', 'ytick.color': 'white',
+        'text.color': 'white', 'axes.titlecolor': 'white', 'legend.labelcolor': 'white',
+        'font.family': 'sans-serif', 'font.sans-serif': [available_font],
+        'font.size': 9, 'axes.titlesize': 13, 'legend.fontsize': 8,
+        'xtick.labelsize': 8, 'ytick.labelsize': 8,
+        'lines.linewidth': 1.5, 'lines.markersize': 4,
+        'axes.prop_cycle': matplotlib.cycler(color=['#3498db', '#e74c3c', '#2ecc71', '#f1c40f', '#9b59b6']),
+        'axes.grid': True, 'grid.color': '#666666', 'grid.alpha': 0.5, 'grid.linestyle': '--',
+        'axes.spines.top': False, 'axes.spines.right': False,
+        'axes.spines.left': True, 'axes.spines.bottom': True,
+        'xtick.direction': 'in', 'ytick.direction': 'in',
+        'legend.frameon': True, 'legend.facecolor': '#333333',
+        'legend.edgecolor': 'white', 'legend.framealpha': 0.8,
+        'figure.subplot.left': 0.06, 'figure.subplot.right': 0.96,
+        'figure.subplot.top': 0.94, 'figure.subplot.bottom': 0.08,
+        'figure.subplot.wspace': 0.1, 'figure.subplot.hspace': 0.1,
+        'axes.unicode_minus': False, 'figure.constrained_layout.use': False,
+    })
+    return available_font
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+报告预渲染：把站点上的 Markdown 报告渲染为精简 HTML 片段（output/html/<key>.html），
+并写出索引 output/html/index.json，页面直接插入片段，无需下载和运行 marked / mermaid
+只依赖标准库，构建流程（CI 同步报告后）也可以单独运行：
+
+    python src/prerender.py [站点根目录]
+"""
+import os
+import sys
+import json
+import hashlib
+import posixpath
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from markdown_html import render_markdown, RENDER_VERSION
+
+# 站点报告 (键, 标题, 相对站点根目录的路径)，与 index.html 的 CONFIG / depthReports 对应
+SITE_REPORTS = (
+    ('today', '今日报告', 'today_report.md'),
+    ('5day', '5天报告', '5day_report.md'),
+    ('market', '每日市场分析报告', 'output/市场分析报告.md'),
+    ('depth-zf', '涨幅分布', 'output/1-涨幅分布报.md'),
+    ('depth-zs', '主升概念', 'output/2-主升概念报.md'),
+    ('depth-ai', 'AI分析汇总', 'output/3-ai_analysis_summary.md'),
+    ('depth-zsai', '走势AI分析', 'output/3-走势AI分析报.md'),
+    ('depth-hb', '合并解读', 'output/4-合并解读.md'),
+    ('depth-tdx', 'TDX综合分析', 'output/5-TDX综合分析报.md'),
+    ('depth-etf', 'ETF报告', 'output/etf_report.md'),
+    ('depth-etf-flow', 'ETF资金面板', 'output/etf_flow_report.md'),
+)
+HTML_DIR = 'html'
+INDEX_NAME = 'index.json'
+
+
+def image_resolver(source):
+    """
+    图片地址改写：报告中的相对路径按报告所在目录解析为站点根路径，
+    外链、绝对路径与 data URI 保持不变
+    :param source: 报告相对站点根目录的路径
+    """
+    base = posixpath.dirname(source)
+
+    def resolve(src):
+        if '://' in src or src.startswith(('/', 'data:', '#')):
+            return src
+        return posixpath.normpath(posixpath.join(base, src)) if base else posixpath.normpath(src)
+    return resolve
+
+
+def _write_if_changed(path, content):
+    """内容未变化时不重写（保持文件时间戳，避免无意义的提交与缓存失效）"""
+    data = content.encode('utf-8')
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    except OSError:
+        pass
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return True
+
+
+def prerender_reports(site_root, output_dir=None, reports=SITE_REPORTS, logger=None):
+    """
+    预渲染站点报告
+    :param site_root: 站点根目录（index.html 所在目录）
+    :param output_dir: 输出目录，默认 <site_root>/output
+    :param reports: [(键, 标题, 路径)]
+    :param logger: 日志回调函数 (task, status, details)（可选）
+    :return: 索引字典
+    """
+    output_dir = output_dir or os.path.join(site_root, 'output')
+    html_dir = os.path.join(output_dir, HTML_DIR)
+    os.makedirs(html_dir, exist_ok=True)
+    fragment_base = posixpath.join(
+        os.path.relpath(html_dir, site_root).replace(os.sep, '/'), '')
+
+    index = {'version': RENDER_VERSION, 'reports': {}}
+    written = 0
+    for key, title, source in reports:
+        path = os.path.join(site_root, *source.split('/'))
+        if not os.path.exists(path):
+            continue
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+            html, meta = render_markdown(text, image_resolver(source))
+        except Exception as e:
+            print(f"⚠️  预渲染失败 {source}: {e}")
+            if logger:
+                logger('HTML预渲染', 'warning', f'{source}: {str(e)[:100]}')
+            continue
+        fragment = f'{key}.html'
+        written += _write_if_changed(os.path.join(html_dir, fragment), html)
+        index['reports'][key] = {
+            'title': title,
+            'source': source,
+            'fragment': fragment_base + fragment,
+            'hash': hashlib.sha1(html.encode('utf-8')).hexdigest()[:12],
+            'bytes': len(html.encode('utf-8')),
+            'mermaid': meta['mermaid'],
+            'charts': meta['images'],
+        }
+
+    # 索引不含时间戳，内容不变时文件不变
+    payload = json.dumps(index, ensure_ascii=False, indent=1, sort_keys=True) + '\n'
+    _write_if_changed(os.path.join(html_dir, INDEX_NAME), payload)
+    print(f"🧾 HTML预渲染: {len(index['reports'])} 份报告，更新 {written} 个片段 -> {html_dir}")
+    if logger:
+        logger('HTML预渲染', 'success', f"{len(index['reports'])} 份报告，更新 {written} 个片段")
+    return index
+
+
+if __name__ == '__main__':
+    root = sys.argv[1] if len(sys.argv) > 1 else os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    prerender_reports(root)
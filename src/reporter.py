@@ -3,16 +3,20 @@ import os
 import json
 from datetime import datetime
 from config import OUTPUT_DIR
+from build_manifest import log_fingerprint
+from prerender import prerender_reports
 
 class ReportGenerator:
-    def __init__(self, execution_log, logger_callback=None):  # 🔧 添加 logger 参数
+    def __init__(self, execution_log, logger_callback=None, manifest=None):  # 🔧 添加 logger 参数
         """
         报告生成器
         :param execution_log: 执行日志字典
         :param logger_callback: 日志回调函数（可选）
+        :param manifest: 增量构建清单（可选），输入未变化时不重写报告
         """
         self.log = execution_log
         self.logger = logger_callback  # 🔧 保存 logger 引用
+        self.manifest = manifest
     
     def save_json_report(self):
         """保存JSON格式执行报告"""
@@ -21,7 +25,7 @@ class ReportGenerator:
             self.log['end_time'] = datetime.now().isoformat()
             
             with open(report_path, 'w', encoding='utf-8') as f:
-                json.dump(self.log, f, ensure_ascii=False, indent=2)
+                json.dump(self.log, f, ensure_ascii=False, separators=(',', ':'))
             
             print(f"\n📋 JSON报告已保存: {report_path}")
             
@@ -44,7 +48,14 @@ class ReportGenerator:
         print("\n" + "📝 生成Markdown报告".center(70, "="))
         
         try:
-            report_path = os.path.join(OUTPUT_DIR, '市场分析报告.md')
+            report_name = '市场分析报告.md'
+            report_path = os.path.join(OUTPUT_DIR, report_name)
+            digest = log_fingerprint(self.log, kwargs)
+            if self.manifest is not None and self.manifest.fresh(report_name, digest):
+                print(f"⏭️  报告输入未变化，保留: {report_path}")
+                if self.logger:
+                    self.logger('Markdown报告', 'success', f'输入未变化: {report_path}')
+                return report_path
             
             # 提取洞察
             insights = {}
@@ -52,11 +63,20 @@ class ReportGenerator:
                 insights[category] = insight
             
             # 统计信息
-            total_tasks = len(self.log.get('tasks', []))
-            success_tasks = len([t for t in self.log.get('tasks', []) if t.get('status') == 'success'])
-            warnings = len(self.log.get('warnings', []))
-            errors = len(self.log.get('errors', []))
-            charts = len([t for t in self.log.get('tasks', []) if t.get('chart_path')])
+            if 'task_counts' in self.log:
+                # 精简汇总（event_log.LogSummary）
+                counts = self.log['task_counts']
+                total_tasks = sum(counts.values())
+                success_tasks = counts.get('success', 0)
+                warnings = counts.get('warning', 0)
+                errors = counts.get('error', 0)
+                charts = len(self.log.get('charts', []))
+            else:
+                total_tasks = len(self.log.get('tasks', []))
+                success_tasks = len([t for t in self.log.get('tasks', []) if t.get('status') == 'success'])
+                warnings = len(self.log.get('warnings', []))
+                errors = len(self.log.get('errors', []))
+                charts = len([t for t in self.log.get('tasks', []) if t.get('chart_path')])
             
             with open(report_path, 'w', encoding='utf-8') as f:
                 # 报告头部
@@ -397,6 +417,8 @@ class ReportGenerator:
 *免责声明: 仅供参考，不构成投资建议。投资有风险，决策需谨慎。*
 """)
             
+            if self.manifest is not None:
+                self.manifest.record(report_name, digest)
             print(f"✅ Markdown报告已生成: {report_path}")
             
             # 🔧 使用 logger 记录
@@ -410,3 +432,13 @@ class ReportGenerator:
             if self.logger:
                 self.logger('Markdown报告', 'error', str(e))
             return None
+
+    def prerender_html(self):
+        """预渲染站点报告为 HTML 片段与索引（output/html/），页面无需在浏览器中解析 Markdown"""
+        try:
+            return prerender_reports(os.path.dirname(OUTPUT_DIR), OUTPUT_DIR, logger=self.logger)
+        except Exception as e:
+            print(f"❌ HTML预渲染失败: {e}")
+            if self.logger:
+                self.logger('HTML预渲染', 'error', str(e))
+            return None
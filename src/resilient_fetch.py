@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+容错数据获取层：每个数据源有独立的时间预算（单次超时 + 总期限），
+失败后按带抖动的指数退避重试，连续失败触发熔断；
+主数据源迟迟不返回时可对冲启动备用数据源，先成功者胜出。
+上游卡死的调用无法强行中止，只会被放弃在守护线程里（与调度器的 I/O 任务相同），
+保证整次运行的尾延迟有界
+"""
+import time
+import random
+import functools
+import threading
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+
+
+class FetchError(Exception):
+    """数据源不可用（超时或熔断）"""
+
+
+class FetchTimeout(FetchError):
+    pass
+
+
+class CircuitOpen(FetchError):
+    pass
+
+
+class FetchPolicy:
+    def __init__(self, timeout=30, deadline=60, attempts=3, backoff=1.0, max_backoff=10, hedge_after=None):
+        """
+        单个数据源的时间预算与重试策略
+        :param timeout: 单次调用超时（秒）
+        :param deadline: 含重试与退避在内的总期限（秒）
+        :param attempts: 最多尝试次数
+        :param backoff: 退避基数（秒），第 n 次重试前等待 uniform(0, min(max_backoff, backoff·2ⁿ))
+        :param max_backoff: 单次退避上限（秒）
+        :param hedge_after: 作为对冲请求的主数据源时，超过该秒数未返回即启动备用数据源
+        """
+        self.timeout = timeout
+        self.deadline = deadline
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge_after = hedge_after
+
+
+class CircuitBreaker:
+    def __init__(self, threshold=3, cooldown=300, clock=time.monotonic):
+        """
+        熔断器：连续失败 threshold 次后打开，cooldown 秒内直接拒绝；
+        冷却结束后放行一次探测调用（半开），成功则关闭，失败则重新计时
+        """
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'half_open' if self.clock() - self.opened_at >= self.cooldown else 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def failure(self):
+        """记录一次失败，返回熔断器是否因此打开"""
+        with self._lock:
+            self.failures += 1
+            was_open = self.opened_at is not None
+            if was_open or self.failures >= self.threshold:
+                self.opened_at = self.clock()
+            self._probing = False
+            return not was_open and self.opened_at is not None
+
+
+def _run_async(func, context=None):
+    """在守护线程中执行，返回 Future；超时后线程被放弃，不阻塞进程退出"""
+    future = Future()
+    target = context(func) if context else func
+
+    def runner():
+        try:
+            future.set_result(target())
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=runner, name='fetch', daemon=True).start()
+    return future
+
+
+def _usable(result):
+    return result is not None and not getattr(result, 'empty', False)
+
+
+class ResilientFetcher:
+    def __init__(self, policies=None, default=None, threshold=3, cooldown=300,
+                 logger=None, context=None, clock=time.monotonic, sleep=time.sleep):
+        """
+        容错数据获取
+        :param policies: {数据源名称: FetchPolicy}
+        :param default: 未登记数据源的策略
+        :param threshold: 熔断前允许的连续失败次数
+        :param cooldown: 熔断持续秒数
+        :param logger: 日志回调函数 (task, status, details)（可选）
+        :param context: 包装在工作线程中执行的函数（传递任务上下文），可选
+        """
+        self.policies = dict(policies or {})
+        self.default = default or FetchPolicy()
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.logger = logger
+        self.context = context
+        self.clock = clock
+        self.sleep = sleep
+        self._breakers = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def policy(self, name):
+        return self.policies.get(name, self.default)
+
+    def breaker(self, name):
+        with self._lock:
+            if name not in self._breakers:
+                self._breakers[name] = CircuitBreaker(self.threshold, self.cooldown, self.clock)
+            return self._breakers[name]
+
+    def _count(self, name, key):
+        with self._lock:
+            stats = self._stats.setdefault(name, {'calls': 0, 'failures': 0, 'timeouts': 0,
+                                                  'retries': 0, 'rejected': 0, 'hedged': 0})
+            stats[key] += 1
+
+    def call(self, name, func, *args, **kwargs):
+        """
+        在时间预算内调用数据源，失败按抖动退避重试
+        :raises CircuitOpen: 熔断中
+        :raises FetchTimeout: 超出单次超时或总期限
+        其余异常为最后一次尝试的原异常
+        """
+        policy = self.policy(name)
+        breaker = self.breaker(name)
+        self._count(name, 'calls')
+        if not breaker.allow():
+            self._count(name, 'rejected')
+            raise CircuitOpen('熔断中')
+
+        give_up = self.clock() + policy.deadline
+        attempt = 0
+        while True:
+            remaining = give_up - self.clock()
+            future = _run_async(lambda: func(*args, **kwargs), self.context)
+            done, _ = wait([future], timeout=max(0.0, min(policy.timeout, remaining)))
+            if done and future.exception() is None:
+                breaker.success()
+                return future.result()
+
+            if done:
+                error = future.exception()
+                self._count(name, 'failures')
+            else:
+                error = FetchTimeout(f'第{attempt + 1}次调用超时（单次 {policy.timeout}s，总期限 {policy.deadline}s）')
+                self._count(name, 'timeouts')
+            attempt += 1
+            delay = random.uniform(0, min(policy.max_backoff, policy.backoff * 2 ** (attempt - 1)))
+            if attempt >= policy.attempts or self.clock() + delay >= give_up:
+                if breaker.failure() and self.logger:
+                    self.logger('数据获取', 'warning', f'{name}: 连续失败，熔断 {self.cooldown}s')
+                raise error
+            self._count(name, 'retries')
+            self.sleep(delay)
+
+    def wrap(self, name, func):
+        """包装数据源函数，每次调用都经过 call()（保留函数名）"""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return self.call(name, func, *args, **kwargs)
+        return wrapper
+
+    def hedged(self, primary, fallback):
+        """
+        对冲请求：主数据源超过 hedge_after 秒未返回（或已失败）时启动备用数据源，
+        先拿到非空结果者胜出；被放弃的主请求继续在后台完成（例如写入本地缓存）
+        两个函数各自负责超时与重试（通常内部已经过 call()），名称只用于查策略与统计
+        :param primary: (名称, 无参函数)
+        :param fallback: (名称, 无参函数)
+        :return: (结果, 实际使用的数据源名称)
+        """
+        (primary_name, primary_func), (fallback_name, fallback_func) = primary, fallback
+        hedge_after = self.policy(primary_name).hedge_after
+        futures = {_run_async(primary_func, self.context): primary_name}
+        done, _ = wait(list(futures), timeout=hedge_after)
+        for future in done:
+            if future.exception() is None and _usable(future.result()):
+                return future.result(), primary_name
+
+        self._count(primary_name, 'hedged')
+        futures[_run_async(fallback_func, self.context)] = fallback_name
+        pending = set(futures) - set(done)
+        errors = {}
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                if future.exception() is None and _usable(future.result()):
+                    return future.result(), futures[future]
+                errors[futures[future]] = future.exception()
+        for future in done:
+            errors[primary_name] = future.exception()
+        error = errors.get(primary_name) or errors.get(fallback_name)
+        if error is not None:
+            raise error
+        return None, primary_name
+
+    def reset_stats(self):
+        """清空调用统计（熔断状态保留，跨运行继续生效）"""
+        with self._lock:
+            self._stats.clear()
+
+    def stats(self):
+        """{数据源名称: 调用统计 + 熔断状态}"""
+        with self._lock:
+            names = sorted(self._stats)
+            result = {name: dict(self._stats[name]) for name in names}
+        for name in names:
+            result[name]['state'] = self.breaker(name).state
+        return result
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+在线滚动相关矩阵：对全部跟踪序列在多个窗口上维护成对累加和
+（样本数、Σx、Σx²、Σxy），每个新交易日 O(N²) 更新，任意时刻 O(N²) 读出相关矩阵；
+短窗口相关显著偏离长窗口水平的序列对标记为“偏离”
+状态可以存盘，下次运行只喂入新增日期，并把最后几个交易日撤回重喂，
+补上滞后到达的数据（融资余额 T+1 公布、A 股数据晚于美股更新）
+"""
+import os
+import numpy as np
+import pandas as pd
+
+DEFAULT_WINDOWS = (20, 60, 120)
+# 每次增量喂入时撤回重喂的最近交易日数
+DEFAULT_OVERLAP = 10
+
+
+class _WindowSums:
+    def __init__(self, size):
+        """单个窗口的成对累加和（只统计两列都有值的行）"""
+        self.count = np.zeros((size, size))
+        self.sx = np.zeros((size, size))    # sx[i, j] = 两列都有值时 Σx_i
+        self.sxx = np.zeros((size, size))   # sxx[i, j] = 两列都有值时 Σx_i²
+        self.sxy = np.zeros((size, size))
+
+    def add(self, row, sign=1.0):
+        valid = ~np.isnan(row)
+        x = np.where(valid, row, 0.0)
+        v = valid.astype(float)
+        self.count += sign * np.outer(v, v)
+        self.sx += sign * np.outer(x, v)
+        self.sxx += sign * np.outer(x * x, v)
+        self.sxy += sign * np.outer(x, x)
+
+    def rebuild(self, rows):
+        """由窗口内的原始行重算（消除长期增减累积的浮点误差）"""
+        valid = ~np.isnan(rows)
+        x = np.where(valid, rows, 0.0)
+        v = valid.astype(float)
+        self.count = v.T @ v
+        self.sx = x.T @ v
+        self.sxx = (x * x).T @ v
+        self.sxy = x.T @ x
+
+    def corr(self, min_periods):
+        n = self.count
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = self.sxy - self.sx * self.sx.T / n
+            var = self.sxx - self.sx ** 2 / n
+            result = cov / np.sqrt(var * var.T)
+        result[(n < min_periods) | ~(var > 0) | ~(var.T > 0)] = np.nan
+        return np.clip(result, -1.0, 1.0)
+
+
+class RollingCorrelation:
+    def __init__(self, names, windows=DEFAULT_WINDOWS, overlap=DEFAULT_OVERLAP):
+        """
+        滚动相关引擎
+        :param names: 跟踪的序列名称（列顺序固定）
+        :param windows: 窗口长度（交易日），共用一个环形缓冲区
+        :param overlap: update_frame 撤回重喂的最近行数；缓冲区比最大窗口多留这么多行，撤回后各窗口仍能重算
+        """
+        self.names = list(names)
+        self.windows = tuple(sorted(set(windows)))
+        self.overlap = overlap
+        size = len(self.names)
+        self.capacity = self.windows[-1] + overlap
+        self._buffer = np.full((self.capacity, size), np.nan)
+        self._dates = np.full(self.capacity, np.datetime64('NaT'), dtype='datetime64[ns]')
+        self._sums = {w: _WindowSums(size) for w in self.windows}
+        self.steps = 0
+        self.last_date = None
+
+    # ---- 更新 ----
+    def update(self, date, row):
+        """
+        喂入一天的日变化（缺失为 NaN），每个窗口 O(N²)
+        与最后一天同日期时替换该行（盘中数据被收盘数据修正）
+        """
+        row = np.asarray(row, dtype=float)
+        date = pd.Timestamp(date)
+        if self.last_date is not None and date == self.last_date:
+            self._replace_last(row)
+            return
+        if self.last_date is not None and date < self.last_date:
+            return
+        slot = self.steps % self.capacity
+        for w, sums in self._sums.items():
+            if self.steps >= w:
+                sums.add(self._buffer[(self.steps - w) % self.capacity], -1.0)
+        self._buffer[slot] = row
+        self._dates[slot] = date.to_datetime64()
+        for sums in self._sums.values():
+            sums.add(row)
+        self.steps += 1
+        self.last_date = date
+        if self.steps % self.capacity == 0:
+            self._rebuild()
+
+    def _replace_last(self, row):
+        slot = (self.steps - 1) % self.capacity
+        for sums in self._sums.values():
+            sums.add(self._buffer[slot], -1.0)
+            sums.add(row)
+        self._buffer[slot] = row
+
+    def update_frame(self, frame):
+        """
+        按日期顺序喂入宽表（列按名称对齐，缺列为 NaN）：最近 overlap 行撤回后与新数据合并重喂，
+        新数据优先，新数据缺失的值（滞后或本次获取失败的序列）沿用原有的行；更早的行不再处理
+        :return: 喂入的行数
+        """
+        frame = frame.reindex(columns=self.names).sort_index()
+        frame = frame[~frame.index.duplicated(keep='last')]
+        if self.last_date is not None:
+            n = min(self.overlap, self.steps)
+            if n:
+                slots = [(self.steps - n + k) % self.capacity for k in range(n)]
+                old = pd.DataFrame(self._buffer[slots], index=pd.DatetimeIndex(self._dates[slots]),
+                                   columns=self.names)
+                frame = frame[frame.index >= old.index[0]].combine_first(old)
+                self._rewind(n)
+            else:
+                frame = frame[frame.index >= self.last_date]
+        for date, row in zip(frame.index, frame.to_numpy(dtype=float)):
+            self.update(date, row)
+        return len(frame)
+
+    def _rewind(self, n):
+        """撤回最后 n 行，累加和由缓冲区中剩余的行重算"""
+        self.steps -= n
+        self.last_date = pd.Timestamp(self._dates[(self.steps - 1) % self.capacity]) if self.steps else None
+        self._rebuild()
+
+    def _window_rows(self, w):
+        n = min(w, self.steps)
+        slots = [(self.steps - 1 - k) % self.capacity for k in range(n)]
+        return self._buffer[slots[::-1]]
+
+    def _rebuild(self):
+        for w, sums in self._sums.items():
+            sums.rebuild(self._window_rows(w))
+
+    # ---- 读取 ----
+    def corr(self, window, min_periods=None):
+        """
+        窗口内的相关矩阵（成对完整样本）
+        :param min_periods: 最少共同样本数，默认窗口的一半
+        """
+        min_periods = min_periods or max(window // 2, 3)
+        values = self._sums[window].corr(min_periods)
+        return pd.DataFrame(values, index=self.names, columns=self.names)
+
+    def drift(self, short=None, long=None, threshold=0.3, min_z=2.0, min_periods=None):
+        """
+        短窗口相关偏离长窗口水平的序列对
+        偏离幅度之外再做 Fisher z 检验（以长窗口相关为基准），
+        跟踪几百对时过滤掉短窗口样本少造成的随机波动
+        :param threshold: 偏离阈值（相关系数差的绝对值）
+        :param min_z: 最小 z 值
+        :return: [dict(a, b, long, short, drift, z)]，按偏离幅度降序
+        """
+        short = short or self.windows[0]
+        long = long or self.windows[-1]
+        recent = self._sums[short].corr(min_periods or max(short // 2, 3))
+        base = self._sums[long].corr(min_periods or max(long // 2, 3))
+        delta = recent - base
+        bound = 1 - 1e-9
+        with np.errstate(invalid='ignore', divide='ignore'):
+            z = (np.arctanh(np.clip(recent, -bound, bound)) - np.arctanh(np.clip(base, -bound, bound))) \
+                * np.sqrt(np.maximum(self._sums[short].count - 3, 0))
+            upper = np.triu(np.ones_like(delta, dtype=bool), k=1)
+            flagged = upper & (np.abs(delta) >= threshold) & (np.abs(z) >= min_z)
+        rows, cols = np.nonzero(flagged)
+        pairs = [
+            {'a': self.names[i], 'b': self.names[j], 'long': float(base[i, j]),
+             'short': float(recent[i, j]), 'drift': float(delta[i, j]), 'z': float(z[i, j])}
+            for i, j in zip(rows, cols)
+        ]
+        return sorted(pairs, key=lambda p: abs(p['drift']), reverse=True)
+
+    # ---- 持久化 ----
+    def save(self, path):
+        """原子写出状态（环形缓冲区与最后日期；累加和加载时重算）"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp.npz'
+        try:
+            np.savez(tmp_path, names=np.array(self.names), windows=np.array(self.windows),
+                     buffer=self._buffer, dates=self._dates, steps=self.steps)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path, names, windows=DEFAULT_WINDOWS, overlap=DEFAULT_OVERLAP):
+        """读取状态；文件不存在、损坏或序列/窗口/缓冲区配置变化时返回空引擎"""
+        engine = cls(names, windows, overlap)
+        if not path or not os.path.exists(path):
+            return engine
+        try:
+            with np.load(path) as state:
+                if list(state['names']) != engine.names or tuple(state['windows']) != engine.windows \
+                        or state['buffer'].shape != engine._buffer.shape:
+                    return engine
+                engine._buffer = state['buffer']
+                engine._dates = state['dates']
+                engine.steps = int(state['steps'])
+        except (OSError, ValueError, KeyError):
+            return cls(names, windows, overlap)
+        if engine.steps:
+            engine.last_date = pd.Timestamp(engine._dates[(engine.steps - 1) % engine.capacity])
+            engine._rebuild()
+        return engine
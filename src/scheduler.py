@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+import io
+import os
+import sys
+import time
+import threading
+import multiprocessing
+from contextlib import nullcontext
+from concurrent.futures import Future, InvalidStateError, ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+_CONTEXT = threading.local()
+
+
+def emit(event):
+    """在任务上下文中缓存日志事件；不在任务中时返回 False，由调用方直接落地"""
+    events = getattr(_CONTEXT, 'events', None)
+    if events is None:
+        return False
+    events.append(event)
+    return True
+
+
+def carry_context(func):
+    """
+    把当前任务的事件与输出缓冲带入辅助线程执行 func（在调用线程中包装）；
+    任务结束后仍未返回的辅助线程再写入的内容随缓冲一起丢弃
+    """
+    events = getattr(_CONTEXT, 'events', None)
+    stdout = getattr(_CONTEXT, 'stdout', None)
+    if events is None:
+        return func
+
+    def wrapper(*args, **kwargs):
+        _CONTEXT.events, _CONTEXT.stdout = events, stdout
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _CONTEXT.events = _CONTEXT.stdout = None
+    return wrapper
+
+
+def map_captured(func, items, max_workers=None):
+    """
+    在线程池中并发执行 func(item)，返回按 items 顺序的结果列表；
+    在任务中调用时每个调用单独缓存事件与输出，全部结束后按 items 顺序并入当前任务，
+    执行日志顺序不受完成先后影响。任一调用抛出的异常在合并后重新抛出
+    """
+    items = list(items)
+    events = getattr(_CONTEXT, 'events', None)
+    if events is None:
+        with ThreadPoolExecutor(max_workers=max_workers or len(items) or 1) as pool:
+            return list(pool.map(func, items))
+
+    def captured(item):
+        _CONTEXT.events = []
+        _CONTEXT.stdout = io.StringIO()
+        try:
+            try:
+                return func(item), None, _CONTEXT.events, _CONTEXT.stdout.getvalue()
+            except Exception as e:
+                return None, e, _CONTEXT.events, _CONTEXT.stdout.getvalue()
+        finally:
+            _CONTEXT.events = _CONTEXT.stdout = None
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(items) or 1) as pool:
+        outcomes = list(pool.map(captured, items))
+    values = []
+    for value, error, item_events, output in outcomes:
+        events.extend(item_events)
+        _CONTEXT.stdout.write(output)
+        values.append(value)
+    errors = [error for _, error, _, _ in outcomes if error is not None]
+    if errors:
+        raise errors[0]
+    return values
+
+
+class _ThreadLocalStdout:
+    """按线程把 print 输出写入当前任务的缓冲区，任务外照常输出"""
+    def __init__(self, stream):
+        self._stream = stream
+
+    def write(self, text):
+        buffer = getattr(_CONTEXT, 'stdout', None)
+        return (buffer if buffer is not None else self._stream).write(text)
+
+    def flush(self):
+        self._stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+def install_stdout_capture():
+    """安装按线程分流的 stdout（可重复调用）"""
+    if not isinstance(sys.stdout, _ThreadLocalStdout):
+        sys.stdout = _ThreadLocalStdout(sys.stdout)
+
+
+class TaskResult:
+    def __init__(self, name, status, value=None, error=None, events=None, output='', elapsed=0.0):
+        """
+        任务执行结果
+        :param status: success / error / timeout / skipped
+        :param events: 任务执行期间缓存的日志事件，按声明顺序回放
+        :param output: 任务执行期间的 print 输出
+        """
+        self.name = name
+        self.status = status
+        self.value = value
+        self.error = error
+        self.events = events or []
+        self.output = output
+        self.elapsed = elapsed
+
+
+def run_captured(name, func, args):
+    """在独立的事件与输出缓冲中执行任务（线程与子进程共用）"""
+    install_stdout_capture()
+    _CONTEXT.events = []
+    _CONTEXT.stdout = io.StringIO()
+    start = time.time()
+    try:
+        value, status, error = func(*args), 'success', None
+    except Exception as e:
+        value, status, error = None, 'error', f'{type(e).__name__}: {e}'
+    finally:
+        events, output = _CONTEXT.events, _CONTEXT.stdout.getvalue()
+        _CONTEXT.events = None
+        _CONTEXT.stdout = None
+    return TaskResult(name, status, value, error, events, output, time.time() - start)
+
+
+class Task:
+    def __init__(self, name, func, args=(), inputs=(), after=(), kind='io', timeout=None):
+        """
+        DAG 中的一个任务
+        :param args: 固定参数
+        :param inputs: 依赖任务名，其结果按顺序追加到参数末尾
+        :param after: 仅需先完成、不传结果的依赖任务名
+        :param kind: io 走线程，cpu 走进程池（func 与参数需可序列化）
+        :param timeout: 超时秒数，超时后任务记为 timeout，下游任务跳过
+        """
+        if kind not in ('io', 'cpu'):
+            raise ValueError(f'未知任务类型: {kind}')
+        self.name = name
+        self.func = func
+        self.args = tuple(args)
+        self.inputs = tuple(inputs)
+        self.after = tuple(after)
+        self.kind = kind
+        self.timeout = timeout
+
+    @property
+    def deps(self):
+        return self.inputs + self.after
+
+
+class TaskScheduler:
+    def __init__(self, io_workers=8, cpu_workers=None, mp_context='spawn', tracer=None):
+        """
+        基于依赖关系的并发任务调度器
+        I/O 任务在守护线程中执行（超时后不阻塞进程退出），CPU 任务在进程池中执行；
+        结果与日志事件按任务声明顺序回放，保证执行日志顺序确定
+        :param io_workers: 同时运行的 I/O 任务数上限
+        :param cpu_workers: 进程池大小，默认 min(4, CPU 核数)
+        :param mp_context: 进程启动方式，默认 spawn（避免在多线程进程中 fork）
+        :param tracer: 追踪器（可选），每个 I/O 任务记录为一个 task span
+        """
+        self.io_workers = io_workers
+        self.tracer = tracer
+        self.cpu_workers = cpu_workers or min(4, os.cpu_count() or 1)
+        self.mp_context = mp_context
+        self.tasks = {}
+
+    def add(self, name, func, args=(), inputs=(), after=(), kind='io', timeout=None):
+        """声明任务，依赖必须已先声明（保证无环且顺序确定）"""
+        if name in self.tasks:
+            raise ValueError(f'重复的任务名: {name}')
+        task = Task(name, func, args, inputs, after, kind, timeout)
+        missing = [d for d in task.deps if d not in self.tasks]
+        if missing:
+            raise ValueError(f'{name} 依赖未声明的任务: {", ".join(missing)}')
+        self.tasks[name] = task
+        return task
+
+    def select(self, names):
+        """
+        只保留 names 及其传递依赖，返回新的调度器（保持声明顺序）
+        名称可以是任务名，也可以是“前缀:”形式任务名的前缀（如 K线 选中全部 K线:*）
+        """
+        wanted = set()
+        stack = []
+        for name in names:
+            matched = [n for n in self.tasks if n == name or n.split(':', 1)[0] == name]
+            if not matched:
+                raise ValueError(f'未知任务: {name}')
+            stack.extend(matched)
+        while stack:
+            name = stack.pop()
+            if name not in wanted:
+                wanted.add(name)
+                stack.extend(self.tasks[name].deps)
+        selected = TaskScheduler(self.io_workers, self.cpu_workers, self.mp_context, self.tracer)
+        selected.tasks = {name: task for name, task in self.tasks.items() if name in wanted}
+        return selected
+
+    def _start_io(self, task, args):
+        future = Future()
+
+        def runner():
+            span = self.tracer.span(task.name, 'task') if self.tracer else nullcontext()
+            with span:
+                result = run_captured(task.name, task.func, args)
+                if self.tracer:
+                    self.tracer.annotate(status=result.status)
+            try:
+                future.set_result(result)
+            except InvalidStateError:
+                pass    # 已超时被取消，结果丢弃
+
+        threading.Thread(target=runner, name=f'task-{task.name}', daemon=True).start()
+        return future
+
+    def run(self, on_result=None):
+        """
+        执行全部任务
+        :param on_result: 回调 (TaskResult)，按声明顺序在主线程中调用
+        :return: {任务名: TaskResult}，按声明顺序
+        """
+        order = list(self.tasks)
+        pending = list(order)
+        results = {}
+        running = {}
+        deadlines = {}
+        cpu_pool = None
+        flushed = 0
+
+        try:
+            while True:
+                running_io = sum(1 for n in running.values() if self.tasks[n].kind == 'io')
+                for name in list(pending):
+                    task = self.tasks[name]
+                    failed = [d for d in task.deps if d in results and results[d].status != 'success']
+                    if failed:
+                        results[name] = TaskResult(name, 'skipped', error=f'依赖失败: {", ".join(failed)}')
+                        pending.remove(name)
+                        continue
+                    if not all(d in results for d in task.deps):
+                        continue
+                    if task.kind == 'io' and running_io >= self.io_workers:
+                        continue
+
+                    args = task.args + tuple(results[d].value for d in task.inputs)
+                    if task.kind == 'io':
+                        future = self._start_io(task, args)
+                        running_io += 1
+                    else:
+                        if cpu_pool is None:
+                            cpu_pool = ProcessPoolExecutor(
+                                self.cpu_workers, mp_context=multiprocessing.get_context(self.mp_context)
+                            )
+                        future = cpu_pool.submit(run_captured, name, task.func, args)
+                    running[future] = name
+                    deadlines[name] = time.time() + task.timeout if task.timeout else None
+                    pending.remove(name)
+
+                while flushed < len(order) and order[flushed] in results:
+                    if on_result:
+                        on_result(results[order[flushed]])
+                    flushed += 1
+                if flushed == len(order):
+                    break
+
+                active = [d for n, d in deadlines.items() if d and n not in results]
+                wait_timeout = max(0.0, min(active) - time.time()) if active else None
+                done, _ = wait(list(running), timeout=wait_timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = TaskResult(name, 'error', error=f'{type(e).__name__}: {e}')
+                    results[name] = result
+
+                now = time.time()
+                for future, name in list(running.items()):
+                    deadline = deadlines.get(name)
+                    if future in running and deadline and now >= deadline:
+                        running.pop(future)
+                        future.cancel()
+                        timeout = self.tasks[name].timeout
+                        results[name] = TaskResult(name, 'timeout', error=f'超时 ({timeout}s)', elapsed=timeout)
+                        if self.tasks[name].kind == 'cpu' and cpu_pool is not None:
+                            # 卡住的子进程无法单独取消，整体回收后按需重建
+                            self._terminate(cpu_pool, running, results)
+                            cpu_pool = None
+        finally:
+            if cpu_pool is not None:
+                cpu_pool.shutdown(wait=True)
+
+        return {name: results[name] for name in order}
+
+    def _terminate(self, pool, running, results):
+        """强制回收进程池，池中其余进行中的任务记为失败"""
+        terminate = getattr(pool, 'terminate_workers', None)
+        if terminate:
+            terminate()
+        else:
+            for process in list(getattr(pool, '_processes', {}).values()):
+                process.terminate()
+            pool.shutdown(wait=False, cancel_futures=True)
+        for future, name in list(running.items()):
+            if self.tasks[name].kind == 'cpu':
+                running.pop(future)
+                results[name] = TaskResult(name, 'error', error='进程池因其他任务超时被回收')
@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+常驻服务：数据与计算结果留在内存中，各刷新分组按自己的周期重跑，
+最新信号、洞察与图表通过本地 HTTP JSON 接口提供。
+每次刷新完成后把全部接口的响应预先编码成字节并整体替换，读取只是一次字典查找，
+不加锁、不重新序列化，也不会读到刷新到一半的状态
+"""
+import os
+import json
+import time
+import threading
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, unquote
+
+CONTENT_TYPES = {
+    '.png': 'image/png', '.svg': 'image/svg+xml', '.webp': 'image/webp',
+    '.jpg': 'image/jpeg', '.json': 'application/json', '.html': 'text/html; charset=utf-8',
+}
+JSON_TYPE = 'application/json; charset=utf-8'
+
+
+class TTLCache:
+    def __init__(self, clock=time.monotonic):
+        """
+        按键缓存数据源返回值，每个键有自己的有效期；
+        同一个键并发请求时只有一个线程加载，其余等待结果
+        """
+        self.clock = clock
+        self._entries = {}     # 键 -> (过期时间, 值)
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, ttl, loader, valid=None):
+        """
+        有效期内返回缓存值，否则调用 loader() 并缓存
+        :param valid: 判断返回值是否可缓存的函数（如空结果不缓存，下次重新加载）；loader 抛出异常时同样不缓存
+        """
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            now = self.clock()
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+            value = loader()
+            with self._lock:
+                # 日期窗口参数每天变化，顺带清掉已过期的旧键
+                for stale in [k for k, (expires, _) in self._entries.items() if expires <= now]:
+                    del self._entries[stale]
+                    self._locks.pop(stale, None)
+                if valid is None or valid(value):
+                    self._entries[key] = (self.clock() + ttl, value)
+            return value
+
+
+class RefreshJob:
+    def __init__(self, name, interval, run):
+        """
+        刷新分组
+        :param interval: 刷新间隔（秒）
+        :param run: 无参函数，执行一次刷新并返回执行汇总（LogSummary 或同结构的 dict）
+        """
+        self.name = name
+        self.interval = interval
+        self.run = run
+        self.next_run = 0.0    # 单调时钟，启动后立即执行一次
+        self.summary = None
+        self.last_run = None
+        self.elapsed = None
+        self.error = None
+        self.runs = 0
+
+
+class SignalService:
+    def __init__(self, jobs, chart_dir, clock=time.monotonic, logger=None):
+        """
+        常驻信号服务
+        :param jobs: [RefreshJob]，按顺序合并信号（后面的分组覆盖同名信号）
+        :param chart_dir: 图表所在目录，/charts/<文件名> 从这里读取
+        :param logger: 日志回调函数 (task, status, details)（可选）
+        """
+        self.jobs = {job.name: job for job in jobs}
+        self.chart_dir = chart_dir
+        self.clock = clock
+        self.logger = logger
+        self.started = datetime.now()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._files = {}       # 文件名 -> (mtime, 大小, 字节)
+        self._snapshot = {}
+        self._publish()
+
+    # ---- 刷新 ----
+    def refresh(self, job):
+        """执行一个分组的刷新，完成后发布新快照"""
+        start = time.time()
+        try:
+            summary = job.run()
+            job.summary, job.error = summary, None
+        except Exception as e:
+            job.error = f'{type(e).__name__}: {e}'
+            if self.logger:
+                self.logger('常驻服务', 'error', f'{job.name}: {job.error}')
+        job.runs += 1
+        job.elapsed = time.time() - start
+        job.last_run = datetime.now()
+        job.next_run = self.clock() + job.interval
+        self._publish()
+
+    def run_due(self):
+        """按声明顺序执行所有到期的分组，返回执行的分组名"""
+        due = [job for job in self.jobs.values() if job.next_run <= self.clock()]
+        for job in due:
+            if self._stop.is_set():
+                break
+            self.refresh(job)
+        return [job.name for job in due]
+
+    def trigger(self, name):
+        """让分组立即刷新"""
+        if name not in self.jobs:
+            raise KeyError(name)
+        self.jobs[name].next_run = 0.0
+        self._wake.set()
+
+    def loop(self):
+        """刷新循环（单线程依次执行，分组之间不会并发改写全局状态）"""
+        while not self._stop.is_set():
+            self.run_due()
+            wait = min(job.next_run for job in self.jobs.values()) - self.clock()
+            self._wake.wait(max(0.0, wait))
+            self._wake.clear()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    # ---- 快照 ----
+    def _publish(self):
+        signals, insights, charts, status = {}, [], {}, {}
+        for job in self.jobs.values():
+            summary = job.summary or {}
+            signals.update(summary.get('market_signals', {}))
+            insights += [{'category': category, 'message': message, 'group': job.name}
+                         for category, message in summary.get('insights', [])]
+            for path in summary.get('charts', []):
+                name = os.path.basename(path)
+                charts[name] = {'name': name, 'url': f'/charts/{name}', 'group': job.name}
+            counts = summary.get('task_counts', {})
+            status[job.name] = {
+                'interval': job.interval, 'runs': job.runs,
+                'last_run': job.last_run.isoformat(timespec='seconds') if job.last_run else None,
+                'next_in': max(0, round(job.next_run - self.clock())) if job.runs else 0,
+                'elapsed': round(job.elapsed, 2) if job.elapsed is not None else None,
+                'error': job.error, 'task_counts': counts,
+                'errors': summary.get('errors', []), 'warnings': summary.get('warnings', []),
+            }
+        updated = max((job.last_run for job in self.jobs.values() if job.last_run), default=None)
+        meta = {'started': self.started.isoformat(timespec='seconds'),
+                'updated': updated.isoformat(timespec='seconds') if updated else None}
+        documents = {
+            '/api/signals': dict(meta, signals=signals),
+            '/api/insights': dict(meta, insights=insights),
+            '/api/charts': dict(meta, charts=list(charts.values())),
+            '/api/status': dict(meta, groups=status),
+        }
+        documents['/api/latest'] = dict(meta, signals=signals, insights=insights, charts=list(charts.values()))
+        self._snapshot = {
+            path: json.dumps(doc, ensure_ascii=False, default=str).encode('utf-8')
+            for path, doc in documents.items()
+        }
+
+    def get(self, path):
+        """接口响应字节（进程内读取同样可用），未知路径返回 None"""
+        return self._snapshot.get(path)
+
+    def chart(self, name):
+        """图表文件字节（按修改时间缓存），不存在时返回 None"""
+        if not name or name != os.path.basename(name) or name.startswith('.'):
+            return None
+        path = os.path.join(self.chart_dir, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        cached = self._files.get(name)
+        if cached is None or cached[:2] != (stat.st_mtime_ns, stat.st_size):
+            with open(path, 'rb') as f:
+                cached = (stat.st_mtime_ns, stat.st_size, f.read())
+            self._files[name] = cached
+        return cached[2]
+
+    # ---- HTTP ----
+    def handler(self):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True     # 头和正文分两次写出，避免 Nagle + 延迟确认带来约 40ms 的等待
+
+            def _send(self, code, body, content_type=JSON_TYPE):
+                self.send_response(code)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('Cache-Control', 'no-cache')
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(body)
+
+            def _error(self, code, message):
+                self._send(code, json.dumps({'error': message}, ensure_ascii=False).encode('utf-8'))
+
+            def do_GET(self):
+                path = unquote(urlsplit(self.path).path).rstrip('/') or '/api/latest'
+                body = service.get(path)
+                if body is not None:
+                    return self._send(200, body)
+                if path.startswith('/charts/'):
+                    name = path[len('/charts/'):]
+                    data = service.chart(name)
+                    if data is not None:
+                        return self._send(200, data, CONTENT_TYPES.get(os.path.splitext(name)[1].lower(),
+                                                                       'application/octet-stream'))
+                self._error(404, f'未知路径: {path}')
+
+            do_HEAD = do_GET
+
+            def do_POST(self):
+                path = unquote(urlsplit(self.path).path).rstrip('/')
+                if not path.startswith('/api/refresh/'):
+                    return self._error(404, f'未知路径: {path}')
+                name = path[len('/api/refresh/'):]
+                try:
+                    service.trigger(name)
+                except KeyError:
+                    return self._error(404, f'未知刷新分组: {name}')
+                self._send(202, json.dumps({'triggered': name}, ensure_ascii=False).encode('utf-8'))
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def serve(self, host='127.0.0.1', port=8765):
+        """启动刷新线程并在前台提供 HTTP 接口，Ctrl-C 退出"""
+        worker = threading.Thread(target=self.loop, name='service-refresh', daemon=True)
+        worker.start()
+        server = ThreadingHTTPServer((host, port), self.handler())
+        server.daemon_threads = True
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+            server.server_close()
+            worker.join(timeout=5)
@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+"""
+指标与信号历史库：每次运行把指标序列（VIX、国债收益率、股债利差、融资余额等）
+与每日信号（risk_level、liquidity_env）合并进本地历史，跨运行累积多年数据；
+数值指标按时间建归并排序树，任意回看窗口内的历史分位数 O(log² n) 查询，
+全部历史的分位数在整体有序数组上一次二分 O(log n)；逐日追加与少量修改直接插入树中，不重新建树
+"""
+import os
+import threading
+import numpy as np
+import pandas as pd
+from disk_cache import CACHE_DIR
+
+try:
+    import pyarrow  # noqa: F401  parquet 引擎
+    _PARQUET = True
+except ImportError:
+    _PARQUET = False
+
+DEFAULT_PATH = os.path.join(CACHE_DIR, 'signal_history.parquet')
+
+# 样本少于该数量时分位数没有统计意义，返回 NaN
+MIN_SAMPLES = 20
+# 一次记录追加或修改的值不超过该数量时原地更新归并排序树，否则下次查询时重建
+PATCH_LIMIT = 32
+
+
+def _normalize_index(series):
+    """统一为无时区、按日的升序日期索引（同一日期保留最后一个值）"""
+    index = pd.to_datetime(series.index, errors='coerce')
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    series = pd.Series(series.to_numpy(), index=index.normalize())
+    series = series[series.index.notna()]
+    return series[~series.index.duplicated(keep='last')].sort_index()
+
+
+def lookback_offset(lookback):
+    """回看窗口：None（全部）、天数，或 '1y' / '6mo' / '90d' 这样的字符串"""
+    if lookback is None:
+        return None
+    if isinstance(lookback, (int, np.integer)):
+        return pd.DateOffset(days=int(lookback))
+    if isinstance(lookback, str):
+        from market_data import period_offset
+        return period_offset(lookback)
+    return lookback
+
+
+class MergeSortTree:
+    def __init__(self, values):
+        """
+        归并排序树：第 k 层把时间顺序的数值按 2^k 个一块分别排序，
+        任意下标区间拆成 O(log n) 块，每块二分计数
+        :param values: 按时间顺序的一维数组（不含 NaN）
+        """
+        values = np.asarray(values, dtype=float)
+        self.n = len(values)
+        size = 1
+        while size < max(self.n, 1):
+            size *= 2
+        self.size = size
+        padded = np.full(size, np.inf)
+        padded[:self.n] = values
+        self.levels = [padded]
+        width = 1
+        while width < size:
+            width *= 2
+            self.levels.append(np.sort(padded.reshape(-1, width), axis=1).ravel())
+
+    def rank(self, lo, hi, value):
+        """
+        下标区间 [lo, hi) 内小于 value 与等于 value 的个数
+        :return: (less, equal)
+        """
+        if lo == 0 and hi == self.n:
+            # 全部历史：顶层就是整体有序数组（补位的 inf 排在最后），一次二分
+            return self._count(len(self.levels) - 1, 0, value, 0, 0)
+        less = equal = 0
+        level = 0
+        while lo < hi:
+            if lo & 1:
+                less, equal = self._count(level, lo, value, less, equal)
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                less, equal = self._count(level, hi, value, less, equal)
+            lo >>= 1
+            hi >>= 1
+            level += 1
+        return less, equal
+
+    def _count(self, level, block, value, less, equal):
+        width = 1 << level
+        sorted_block = self.levels[level][block * width:(block + 1) * width]
+        left = int(np.searchsorted(sorted_block, value, side='left'))
+        right = int(np.searchsorted(sorted_block, value, side='right'))
+        return less + left, equal + right - left
+
+    def append(self, value):
+        """在末尾追加一个值（占用一个补位），容量已满时返回 False（需要重建）"""
+        if self.n >= self.size:
+            return False
+        self._replace(self.n, np.inf, float(value))
+        self.n += 1
+        return True
+
+    def update(self, index, old, new):
+        """把下标 index 处的值 old 改为 new"""
+        self._replace(index, float(old), float(new))
+
+    def _replace(self, index, old, new):
+        # 每层只改包含 index 的有序块：删去 old、在有序位置插入 new，块内其余元素整体平移一位
+        for level, values in enumerate(self.levels):
+            width = 1 << level
+            block = values[(index >> level) * width:((index >> level) + 1) * width]
+            i = int(np.searchsorted(block, old, side='left'))
+            j = int(np.searchsorted(block, new, side='left'))
+            if j > i:
+                block[i:j - 1] = block[i + 1:j].copy()
+                block[j - 1] = new
+            else:
+                block[j + 1:i + 1] = block[j:i].copy()
+                block[j] = new
+
+
+class SignalHistory:
+    def __init__(self, path=DEFAULT_PATH, min_samples=MIN_SAMPLES, logger=None):
+        """
+        指标与信号历史库
+        :param path: Parquet 文件路径；None 时只在内存中累积（回放模式）
+        :param min_samples: 分位数所需的最少样本数
+        :param logger: 日志回调函数 (task, status, details)（可选）
+        """
+        self.path = path if _PARQUET else None
+        self.min_samples = min_samples
+        self.logger = logger
+        self._lock = threading.RLock()
+        self._values = {}   # 名称 -> 数值 Series（日期升序）
+        self._labels = {}   # 名称 -> 信号标签 Series
+        self._trees = {}    # 名称 -> (日期数组, MergeSortTree)，追加时原地更新，改动较多时失效
+        self._loaded = False
+        self._dirty = False
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            frame = pd.read_parquet(self.path)
+        except Exception as e:
+            if self.logger:
+                self.logger('信号历史', 'warning', f'历史库损坏，重新累积: {str(e)[:100]}')
+            return
+        for (name, kind), group in frame.groupby(['name', 'kind'], sort=False):
+            series = group.set_index('date')['value' if kind == 'value' else 'label']
+            target = self._values if kind == 'value' else self._labels
+            target[name] = _normalize_index(series.astype(float) if kind == 'value' else series)
+
+    # ---- 写入 ----
+    def record(self, name, data, date=None):
+        """
+        合并数值指标（同一日期以新值为准）
+        :param data: 日期索引的 Series，或单个数值（此时需给出 date）
+        """
+        series = data if isinstance(data, pd.Series) else pd.Series([data], index=[pd.Timestamp(date)])
+        series = _normalize_index(pd.to_numeric(series, errors='coerce').dropna())
+        if series.empty:
+            return
+        with self._lock:
+            self._load()
+            old = self._values.get(name)
+            self._values[name] = self._merge(old, series.astype(float))
+            self._patch_tree(name, old, self._values[name])
+            self._dirty = True
+
+    def _patch_tree(self, name, old, merged):
+        """已建好的树按新旧序列的差异原地更新：日期只在末尾追加、改动不多时插入树中，否则丢弃待重建"""
+        entry = self._trees.pop(name, None)
+        if entry is None or old is None or len(merged) < len(old):
+            return
+        k = len(old)
+        if not merged.index[:k].equals(old.index):
+            return
+        before, after = old.to_numpy(), merged.to_numpy()
+        changed = np.flatnonzero(after[:k] != before)
+        if len(changed) + len(merged) - k > PATCH_LIMIT:
+            return
+        tree = entry[1]
+        for i in changed:
+            tree.update(i, before[i], after[i])
+        for value in after[k:]:
+            if not tree.append(value):
+                return
+        self._trees[name] = (merged.index.to_numpy(), tree)
+
+    def record_label(self, name, label, date):
+        """记录某日的信号标签（如 risk_level）"""
+        series = _normalize_index(pd.Series([str(label)], index=[pd.Timestamp(date)], dtype=object))
+        with self._lock:
+            self._load()
+            self._labels[name] = self._merge(self._labels.get(name), series)
+            self._dirty = True
+
+    @staticmethod
+    def _merge(old, new):
+        if old is None or old.empty:
+            return new
+        if new.index[0] > old.index[-1]:
+            return pd.concat([old, new])
+        merged = pd.concat([old, new])
+        return merged[~merged.index.duplicated(keep='last')].sort_index()
+
+    # ---- 查询 ----
+    def series(self, name):
+        """完整历史（日期升序）"""
+        with self._lock:
+            self._load()
+            return self._values.get(name, pd.Series(dtype=float)).copy()
+
+    def labels(self, name):
+        with self._lock:
+            self._load()
+            return self._labels.get(name, pd.Series(dtype=object)).copy()
+
+    def last_date(self, name):
+        """最后记录的日期，没有记录时为 None"""
+        with self._lock:
+            self._load()
+            series = self._values.get(name)
+            return series.index[-1] if series is not None and len(series) else None
+
+    def _tree(self, name):
+        entry = self._trees.get(name)
+        if entry is None:
+            series = self._values.get(name)
+            if series is None or series.empty:
+                return None
+            entry = (series.index.to_numpy(), MergeSortTree(series.to_numpy()))
+            self._trees[name] = entry
+        return entry
+
+    def percentile(self, name, value=None, lookback=None, asof=None):
+        """
+        value 在 [asof - lookback, asof] 窗口历史中的分位数（0-100，相同值按中位秩计）
+        :param value: 默认取窗口内最后一个值
+        :param lookback: 回看窗口，None 为全部历史
+        :param asof: 窗口终点，默认最后记录的日期
+        :return: (分位数, 样本数)；样本不足 min_samples 时分位数为 NaN
+        """
+        with self._lock:
+            self._load()
+            entry = self._tree(name)
+            if entry is None:
+                return float('nan'), 0
+            dates, tree = entry
+            end = pd.Timestamp(asof).normalize() if asof is not None else pd.Timestamp(dates[-1])
+            hi = int(np.searchsorted(dates, end.to_datetime64(), side='right'))
+            offset = lookback_offset(lookback)
+            lo = 0 if offset is None else int(np.searchsorted(dates, (end - offset).to_datetime64(), side='left'))
+            count = hi - lo
+            if value is None:
+                if count == 0:
+                    return float('nan'), 0
+                value = float(self._values[name].iloc[hi - 1])
+            if count < self.min_samples:
+                return float('nan'), count
+            less, equal = tree.rank(lo, hi, value)
+        return (less + 0.5 * equal) / count * 100, count
+
+    def streak(self, name):
+        """最新信号标签及其连续出现的记录数，没有记录时为 (None, 0)"""
+        labels = self.labels(name)
+        if labels.empty:
+            return None, 0
+        values = labels.to_numpy()
+        changed = np.flatnonzero(values != values[-1])
+        return values[-1], int(len(values) - (changed[-1] + 1 if len(changed) else 0))
+
+    def freeze(self, asof):
+        """
+        按历史日期运行：丢弃 asof 之后的记录，此后只在内存中累积，不再写回文件
+        （分位数与“最后记录日期”不会看到 asof 之后的数据，也不会用历史重算覆盖正式历史库）
+        """
+        end = pd.Timestamp(asof).normalize()
+        with self._lock:
+            self._load()
+            for target in (self._values, self._labels):
+                for name, series in list(target.items()):
+                    target[name] = series[series.index <= end]
+            self._trees.clear()
+            self.path = None
+
+    # ---- 持久化 ----
+    def save(self):
+        """有新数据时原子写出历史库，返回写入的指标数"""
+        with self._lock:
+            if not self._dirty or not self.path:
+                return 0
+            parts = [
+                pd.DataFrame({'name': name, 'kind': 'value', 'date': s.index, 'value': s.to_numpy(), 'label': None})
+                for name, s in self._values.items()
+            ] + [
+                pd.DataFrame({'name': name, 'kind': 'label', 'date': s.index, 'value': np.nan,
+                              'label': s.astype(str).to_numpy()})
+                for name, s in self._labels.items()
+            ]
+            count = len(parts)
+            path = self.path    # 锁外写文件期间 freeze() 可能把 path 置空
+            self._dirty = False
+        if not parts:
+            return 0
+        frame = pd.concat(parts, ignore_index=True)
+        frame['label'] = frame['label'].astype(object)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            frame.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            with self._lock:
+                self._dirty = True
+            if self.logger:
+                self.logger('信号历史', 'warning', f'保存失败: {str(e)[:100]}')
+            return 0
+        return count
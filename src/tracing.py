@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+运行追踪：按线程嵌套的 span，记录墙钟时间、CPU 时间、下载字节、行数与缓存命中，
+导出为 Chrome trace / Perfetto 可直接打开的 JSON
+"""
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+
+class Span:
+    def __init__(self, name, cat, args):
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.start = time.perf_counter()
+        self.cpu_start = time.thread_time()
+
+    def set(self, **kwargs):
+        """设置字段（覆盖）"""
+        self.args.update(kwargs)
+
+    def add(self, key, value):
+        """累加计数字段（如下载字节）"""
+        self.args[key] = self.args.get(key, 0) + value
+
+
+class Tracer:
+    def __init__(self):
+        """进程内追踪器，span 按线程嵌套"""
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._events = []
+        self._threads = {}
+        self._origin = time.perf_counter()
+        self.pid = os.getpid()
+
+    def carry(self, func):
+        """
+        把调用线程当前的 span 栈带入辅助线程执行 func（在调用线程中包装）：
+        辅助线程中的字节、请求计数记入调用方的 span，新开的 span 记在调用线程的轨道上，按时间嵌套
+        """
+        stack = list(self._stack())
+        if not stack:
+            return func
+        tid = getattr(self._local, 'tid', None) or threading.get_ident()
+
+        def wrapper(*args, **kwargs):
+            self._local.stack, self._local.tid = list(stack), tid
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._local.stack, self._local.tid = [], None
+        return wrapper
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def current(self):
+        """当前线程最内层的 span，没有时返回 None"""
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def span(self, name, cat='task', **args):
+        """
+        记录一个 span
+        :param cat: 类别，如 task / fetch / parse / compute / render
+        :param args: 附加字段（rows、bytes、cache 等）
+        """
+        item = Span(name, cat, dict(args))
+        stack = self._stack()
+        stack.append(item)
+        try:
+            yield item
+        except BaseException as e:
+            item.set(error=f'{type(e).__name__}: {e}'[:200])
+            raise
+        finally:
+            stack.pop()
+            self._finish(item)
+
+    def _finish(self, item):
+        end = time.perf_counter()
+        item.args['cpu_ms'] = round((time.thread_time() - item.cpu_start) * 1000, 3)
+        thread = threading.current_thread()
+        tid = getattr(self._local, 'tid', None) or thread.ident
+        event = {
+            'name': item.name, 'cat': item.cat, 'ph': 'X', 'pid': self.pid, 'tid': tid,
+            'ts': round((item.start - self._origin) * 1e6, 1),
+            'dur': round((end - item.start) * 1e6, 1),
+            'args': item.args,
+        }
+        with self._lock:
+            self._events.append(event)
+            self._threads.setdefault(tid, thread.name)
+
+    def annotate(self, **kwargs):
+        """给当前 span 设置字段（不在 span 中时忽略）"""
+        item = self.current()
+        if item is not None:
+            item.set(**kwargs)
+
+    def count(self, key, value):
+        """给当前 span 累加计数（不在 span 中时忽略；带入辅助线程的 span 可能被多个线程同时累加）"""
+        item = self.current()
+        if item is not None:
+            with self._lock:
+                item.add(key, value)
+
+    def events(self):
+        with self._lock:
+            return list(self._events)
+
+    def summary(self, cat=None, top=None):
+        """
+        按名称汇总：次数、总墙钟/CPU 毫秒、字节与行数
+        :return: [dict]，按总耗时降序
+        """
+        totals = {}
+        for event in self.events():
+            if cat is not None and event['cat'] != cat:
+                continue
+            entry = totals.setdefault((event['cat'], event['name']), {
+                'name': event['name'], 'cat': event['cat'], 'count': 0,
+                'wall_ms': 0.0, 'cpu_ms': 0.0, 'bytes': 0, 'rows': 0,
+            })
+            entry['count'] += 1
+            entry['wall_ms'] += event['dur'] / 1000
+            entry['cpu_ms'] += event['args'].get('cpu_ms', 0)
+            entry['bytes'] += event['args'].get('bytes', 0)
+            entry['rows'] += event['args'].get('rows', 0) or 0
+        result = sorted(totals.values(), key=lambda e: e['wall_ms'], reverse=True)
+        for entry in result:
+            entry['wall_ms'] = round(entry['wall_ms'], 1)
+            entry['cpu_ms'] = round(entry['cpu_ms'], 1)
+        return result[:top] if top else result
+
+    def export(self, path):
+        """写出 Chrome trace JSON（chrome://tracing 或 ui.perfetto.dev 打开）"""
+        with self._lock:
+            events = list(self._events)
+            threads = dict(self._threads)
+        metadata = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': tid, 'args': {'name': name}}
+            for tid, name in threads.items()
+        ]
+        metadata.append({'name': 'process_name', 'ph': 'M', 'pid': self.pid, 'tid': 0,
+                         'args': {'name': 'generate_image'}})
+        events.sort(key=lambda e: e['ts'])
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': metadata + events, 'displayTimeUnit': 'ms'},
+                      f, ensure_ascii=False, default=str)
+        return path
+
+
+# 进程级默认追踪器
+TRACER = Tracer()
+span = TRACER.span
+annotate = TRACER.annotate
+
+
+def row_count(data):
+    """数据行数（非表格对象返回 None）"""
+    try:
+        return len(data)
+    except TypeError:
+        return None
+
+
+_REQUESTS_HOOKED = False
+
+
+def install_requests_hook(tracer=TRACER):
+    """统计经 requests 下载的字节数，计入发起请求的线程当前 span（可重复调用）"""
+    global _REQUESTS_HOOKED
+    if _REQUESTS_HOOKED:
+        return
+    import requests
+
+    original_send = requests.Session.send
+
+    def send(session, request, **kwargs):
+        response = original_send(session, request, **kwargs)
+        if not kwargs.get('stream'):
+            tracer.count('bytes', len(response.content or b''))
+            tracer.count('requests', 1)
+        return response
+
+    requests.Session.send = send
+    _REQUESTS_HOOKED = True
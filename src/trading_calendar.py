@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+交易日历：上交所 / 港交所 / 纽交所的交易日按节假日规则预先计算成有序日期数组，
+多市场序列通过 searchsorted 一次性按“截至该交易日的最近有效值”(as-of) 对齐到主日历，
+不再用 concat / dropna / intersection 反复复制并丢掉各市场节假日所在的行
+
+纽交所按交易所规则计算；上交所与港交所的农历节假日（清明、端午、中秋等）无法按公历规则推出，
+只内置了春节日期表，其余由 align(observed=True) 按实际数据剔除
+"""
+import functools
+
+import numpy as np
+import pandas as pd
+
+CALENDAR_START = 2000
+CALENDAR_END = 2035
+
+# 农历正月初一
+LUNAR_NEW_YEAR = np.array([
+    '2000-02-05', '2001-01-24', '2002-02-12', '2003-02-01', '2004-01-22', '2005-02-09',
+    '2006-01-29', '2007-02-18', '2008-02-07', '2009-01-26', '2010-02-14', '2011-02-03',
+    '2012-01-23', '2013-02-10', '2014-01-31', '2015-02-19', '2016-02-08', '2017-01-28',
+    '2018-02-16', '2019-02-05', '2020-01-25', '2021-02-12', '2022-02-01', '2023-01-22',
+    '2024-02-10', '2025-01-29', '2026-02-17', '2027-02-06', '2028-01-26', '2029-02-13',
+    '2030-02-03', '2031-01-23', '2032-02-11', '2033-01-31', '2034-02-19', '2035-02-08',
+], dtype='datetime64[D]')
+
+# 纽交所临时休市
+NYSE_CLOSURES = np.array([
+    '2001-09-11', '2001-09-12', '2001-09-13', '2001-09-14', '2004-06-11', '2007-01-02',
+    '2012-10-29', '2012-10-30', '2018-12-05', '2025-01-09',
+], dtype='datetime64[D]')
+
+_DAY = np.timedelta64(1, 'D')
+
+
+def _dates(years, month, day):
+    """各年份的 month 月 day 日"""
+    months = (years - 1970) * 12 + (month - 1)
+    return months.astype('datetime64[M]').astype('datetime64[D]') + (day - 1)
+
+
+def _nth_weekday(years, month, weekday, n):
+    """各年份 month 月第 n 个星期 weekday（n 为负数表示倒数第 |n| 个）"""
+    mask = 'Mon Tue Wed Thu Fri Sat Sun'.split()[weekday]
+    if n > 0:
+        return np.busday_offset(_dates(years, month, 1), n - 1, roll='forward', weekmask=mask)
+    month_end = _dates(years + (month == 12), month % 12 + 1, 1) - _DAY
+    return np.busday_offset(month_end, n + 1, roll='backward', weekmask=mask)
+
+
+def _easter(years):
+    """公历复活节（匿名公历算法，逐年向量化）"""
+    a, b, c = years % 19, years // 100, years % 100
+    d, e = b // 4, b % 4
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 19 * l) // 433
+    month = (h + l - 7 * m + 90) // 25
+    day = (h + l - 7 * m + 33 * month + 19) % 32
+    return _dates(years, month, day)
+
+
+def _weekday(days):
+    """星期几（周一为 0）"""
+    return (days.astype('datetime64[D]').astype(np.int64) - 4) % 7
+
+
+def _sunday_to_monday(days):
+    return days + (_weekday(days) == 6) * _DAY
+
+
+def _weekend_to_monday(days):
+    weekday = _weekday(days)
+    return days + (weekday == 5) * 2 * _DAY + (weekday == 6) * _DAY
+
+
+def _nearest_workday(days):
+    """周六提前到周五，周日顺延到周一"""
+    weekday = _weekday(days)
+    return days - (weekday == 5) * _DAY + (weekday == 6) * _DAY
+
+
+def _spans(first, days):
+    """每个起始日起连续 days 天"""
+    return (first[:, None] + np.arange(days) * _DAY).ravel()
+
+
+def _nyse_holidays(years):
+    # 元旦落在周六时不补休（前一个周五是上一年的交易日）
+    return np.concatenate([
+        _sunday_to_monday(_dates(years, 1, 1)),
+        _nth_weekday(years, 1, 0, 3),                   # 马丁·路德·金纪念日
+        _nth_weekday(years, 2, 0, 3),                   # 总统日
+        _easter(years) - 2 * _DAY,                      # 耶稣受难日
+        _nth_weekday(years, 5, 0, -1),                  # 阵亡将士纪念日
+        _nearest_workday(_dates(years[years >= 2022], 6, 19)),  # 六月节
+        _nearest_workday(_dates(years, 7, 4)),
+        _nth_weekday(years, 9, 0, 1),                   # 劳动节
+        _nth_weekday(years, 11, 3, 4),                  # 感恩节
+        _nearest_workday(_dates(years, 12, 25)),
+        NYSE_CLOSURES,
+    ])
+
+
+def _sse_holidays(years):
+    """上交所：元旦、春节（除夕起 7 天）、劳动节（5/1-5/3）、国庆节（10/1-10/7）"""
+    return np.concatenate([
+        _weekend_to_monday(_dates(years, 1, 1)),
+        _spans(_dates(years, 5, 1), 3),
+        _spans(_dates(years, 10, 1), 7),
+        _spans(LUNAR_NEW_YEAR - _DAY, 7),
+    ])
+
+
+def _hkex_holidays(years):
+    """港交所：公历假期 + 春节（初一至初三，其中有周日则顺延一天）"""
+    easter = _easter(years)
+    festival = _spans(LUNAR_NEW_YEAR, 3).reshape(-1, 3)
+    extra = LUNAR_NEW_YEAR[(_weekday(festival) == 6).any(axis=1)] + 3 * _DAY
+    return np.concatenate([
+        _sunday_to_monday(_dates(years, 1, 1)),
+        easter - 2 * _DAY, easter + _DAY,
+        _sunday_to_monday(_dates(years, 5, 1)),
+        _sunday_to_monday(_dates(years, 7, 1)),
+        _sunday_to_monday(_dates(years, 10, 1)),
+        _sunday_to_monday(_dates(years, 12, 25)),
+        _sunday_to_monday(_dates(years, 12, 26)),
+        festival.ravel(), extra,
+    ])
+
+
+class TradingCalendar:
+    def __init__(self, name, holidays, start=CALENDAR_START, end=CALENDAR_END):
+        """
+        交易日历（周一至周五去掉节假日）
+        :param holidays: 函数 (年份数组) -> 节假日 datetime64[D] 数组，首次使用时计算一次
+        :param start: 覆盖的首个年份
+        :param end: 覆盖的最后年份
+        """
+        self.name = name
+        self.start = start
+        self.end = end
+        self._holidays = holidays
+
+    @functools.cached_property
+    def days(self):
+        """全部交易日（有序 datetime64[D] 数组）"""
+        years = np.arange(self.start, self.end + 1)
+        first, last = _dates(years[:1], 1, 1)[0], _dates(years[-1:] + 1, 1, 1)[0]
+        days = np.arange(first, last, dtype='datetime64[D]')
+        return days[np.is_busday(days, holidays=self._holidays(years))]
+
+    def sessions(self, start=None, end=None):
+        """[start, end] 内的交易日（DatetimeIndex）"""
+        days = self.days
+        lo = np.searchsorted(days, _day(start)) if start is not None else 0
+        hi = np.searchsorted(days, _day(end), side='right') if end is not None else len(days)
+        return pd.DatetimeIndex(days[lo:hi])
+
+    def is_session(self, dates):
+        """逐个判断日期是否为交易日，返回布尔数组"""
+        dates = _days(dates)
+        pos = np.minimum(np.searchsorted(self.days, dates), len(self.days) - 1)
+        return self.days[pos] == dates
+
+    def __repr__(self):
+        return f'TradingCalendar({self.name})'
+
+
+CALENDARS = {
+    'SSE': TradingCalendar('SSE', _sse_holidays),
+    'HKEX': TradingCalendar('HKEX', _hkex_holidays),
+    'NYSE': TradingCalendar('NYSE', _nyse_holidays),
+}
+
+
+def get_calendar(name):
+    """按交易所代码取日历；传入 TradingCalendar 原样返回"""
+    if isinstance(name, TradingCalendar):
+        return name
+    try:
+        return CALENDARS[name]
+    except KeyError:
+        raise ValueError(f'未知交易日历: {name}（可选 {", ".join(CALENDARS)}）')
+
+
+def _day(value):
+    return np.datetime64(pd.Timestamp(value).date(), 'D')
+
+
+def _days(index):
+    """日期索引 → datetime64[D] 数组（去时区，截到日）"""
+    if not isinstance(index, pd.DatetimeIndex):
+        index = pd.DatetimeIndex(pd.to_datetime(index))
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.to_numpy().astype('datetime64[D]')
+
+
+def master_days(calendar, start=None, end=None):
+    """
+    主日历的交易日（datetime64[D] 数组）：交易所代码、代码元组（各市场交易日并集）或现成的日期索引
+    """
+    if isinstance(calendar, (tuple, list)):
+        days = np.unique(np.concatenate([get_calendar(name).days for name in calendar]))
+    elif isinstance(calendar, (str, TradingCalendar)):
+        days = get_calendar(calendar).days
+    else:
+        days = np.unique(_days(calendar))
+    lo = np.searchsorted(days, _day(start)) if start is not None else 0
+    hi = np.searchsorted(days, _day(end), side='right') if end is not None else len(days)
+    return days[lo:hi]
+
+
+def _dates_and_values(series):
+    """有序、去重的交易日（datetime64[D]）与浮点值数组"""
+    series = pd.Series(series, dtype=float).dropna()
+    dates, values = _days(series.index), series.to_numpy()
+    if len(dates) > 1 and not (dates[1:] > dates[:-1]).all():
+        order = np.argsort(dates, kind='stable')
+        dates, values = dates[order], values[order]
+        keep = np.append(dates[1:] != dates[:-1], True)  # 同一日期保留最后一个
+        dates, values = dates[keep], values[keep]
+    return dates, values
+
+
+def align(series, calendar='SSE', start=None, end=None, tolerance=5, observed=True, how='any'):
+    """
+    把多个市场的序列按 as-of 规则对齐到同一主日历：
+    每个主日历交易日取各序列截至当天的最近有效值，对方市场休市的日期沿用上一个值而不是整行丢弃
+    :param series: {名称: pd.Series}
+    :param calendar: 主日历（交易所代码、代码元组或日期索引），见 master_days
+    :param start: 起始日期，默认为各序列首个有效日期中最晚的一个（保证每列从第一行起都有值）
+    :param end: 截止日期，默认为各序列最后日期中最晚的一个
+    :param tolerance: 最多沿用多少个主日历交易日前的值，超过记为 NaN；None 表示不限制
+    :param observed: 只保留至少一个序列当天有实际数据的交易日（修正节假日表的误差、剔除尚未更新的日期）
+    :param how: 'any' 丢弃含 NaN 的行，'all' 丢弃全为 NaN 的行，None 保留
+    :return: DataFrame（索引为主日历交易日，列顺序同 series）
+    """
+    names = list(series)
+    columns = [_dates_and_values(series[name]) for name in names]
+    spans = [(dates[0], dates[-1]) for dates, _ in columns if len(dates)]
+    if not spans:
+        return pd.DataFrame(columns=names, index=pd.DatetimeIndex([]), dtype=float)
+    master = master_days(calendar,
+                         start if start is not None else max(first for first, _ in spans),
+                         end if end is not None else max(last for _, last in spans))
+
+    out = np.full((len(master), len(names)), np.nan)
+    hit = np.zeros(len(master), dtype=bool)
+    for j, (dates, values) in enumerate(columns):
+        if not len(dates):
+            continue
+        pos = np.searchsorted(dates, master, side='right') - 1
+        valid = pos >= 0
+        pos[~valid] = 0
+        if tolerance is not None:
+            # 值所在日期之后经过的主日历交易日数
+            age = np.arange(len(master)) - np.searchsorted(master, dates[pos])
+            valid &= age <= tolerance
+        out[valid, j] = values[pos[valid]]
+        if observed:
+            hit |= valid & (dates[pos] == master)
+
+    keep = hit if observed else np.ones(len(master), dtype=bool)
+    if how == 'any':
+        keep &= ~np.isnan(out).any(axis=1)
+    elif how == 'all':
+        keep &= ~np.isnan(out).all(axis=1)
+    return pd.DataFrame(out[keep], index=pd.DatetimeIndex(master[keep]), columns=names)
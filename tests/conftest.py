@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+"""src/ 下的模块按扁平方式导入（与 generate_image.py 相同）"""
+import os
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+import pytest
+
+from disk_cache import DiskCache, merge_frames, cache_key, _PARQUET
+
+pytestmark = pytest.mark.skipif(not _PARQUET, reason='需要 pyarrow')
+
+
+def daily(start, end, value=1.0):
+    dates = pd.bdate_range(start, end)
+    return pd.DataFrame({'日期': dates.strftime('%Y-%m-%d'), '值': value})
+
+
+class Source:
+    """按 start_date 返回数据的假数据源，记录每次调用的参数"""
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.calls = []
+        self.__name__ = 'fake_source'
+
+    def __call__(self, start_date=None, end_date=None):
+        self.calls.append(start_date)
+        if start_date is None:
+            return self.frame
+        return self.frame[pd.to_datetime(self.frame['日期']) >= pd.to_datetime(start_date)]
+
+
+OPTIONS = {'date_col': '日期', 'start_arg': 'start_date', 'exclude': ('end_date',)}
+
+
+def test_cache_key_ignores_argument_order():
+    assert cache_key('x', a=1, b=2) == cache_key('x', b=2, a=1)
+    assert cache_key('x', a=1) != cache_key('x', a=2)
+
+
+def test_merge_frames_prefers_new_rows():
+    old = daily('2026-01-01', '2026-01-09', 1.0)
+    new = daily('2026-01-08', '2026-01-14', 2.0)
+    merged = merge_frames(old, new, '日期')
+    assert merged['日期'].is_monotonic_increasing and not merged['日期'].duplicated().any()
+    assert merged.set_index('日期').loc['2026-01-08', '值'] == 2.0
+    assert merged.set_index('日期').loc['2026-01-02', '值'] == 1.0
+
+
+def test_fetch_hit_within_max_age(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    source = Source(daily('2026-01-01', '2026-03-31'))
+    first = cache.fetch(source, start_date='20260101', end_date='20260331', **OPTIONS)
+    second = cache.fetch(source, start_date='20260201', end_date='20260401', **OPTIONS)
+    assert source.calls == ['20260101']
+    assert len(first) == len(source.frame)
+    assert pd.to_datetime(second['日期']).min() >= pd.Timestamp('2026-02-01')
+
+
+def test_fetch_appends_after_last_cached_date(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    source = Source(daily('2026-01-01', '2026-03-31'))
+    cache.fetch(source, start_date='20260101', **OPTIONS)
+    source.frame = daily('2026-01-01', '2026-04-10')
+    frame = cache.fetch(source, start_date='20260101', max_age=0, **OPTIONS)
+    assert source.calls == ['20260101', '20260331']
+    assert frame['日期'].iloc[-1] == '2026-04-10'
+    assert not frame['日期'].duplicated().any()
+
+
+def test_fetch_refetches_when_cache_starts_too_late(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    source = Source(daily('2025-06-01', '2026-03-31'))
+    cache.fetch(source, start_date='20260101', **OPTIONS)
+    cache.fetch(source, start_date='20250701', **OPTIONS)
+    assert source.calls == ['20260101', '20250701']
+
+
+def test_fetch_falls_back_to_cache_on_error(tmp_path):
+    messages = []
+    cache = DiskCache(str(tmp_path), logger=lambda *args: messages.append(args))
+    source = Source(daily('2026-01-01', '2026-03-31'))
+    cache.fetch(source, start_date='20260101', **OPTIONS)
+
+    def broken(**kwargs):
+        raise ConnectionError('down')
+    broken.__name__ = 'fake_source'
+    frame = cache.fetch(broken, start_date='20260101', max_age=0, **OPTIONS)
+    assert len(frame) == len(source.frame)
+    assert messages and messages[0][1] == 'warning'
+    with pytest.raises(ConnectionError):
+        cache.fetch(broken, start_date='20260101', max_age=0, name='other', **OPTIONS)
+
+
+def test_stale_reads_without_calling_source(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    source = Source(daily('2026-01-01', '2026-03-31'))
+    assert cache.stale(source, start_date='20260101', **OPTIONS) is None
+    cache.fetch(source, start_date='20260101', **OPTIONS)
+    frame = cache.stale(source, start_date='20260301', **OPTIONS)
+    assert source.calls == ['20260101']
+    assert pd.to_datetime(frame['日期']).min() >= pd.Timestamp('2026-03-01')
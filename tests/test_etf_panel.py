@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+
+from etf_panel import EtfPanel, ETF_TYPES, classify, history_rows, quote_rows
+
+
+def raw(code, dates, close, amount, shares):
+    return pd.DataFrame({'代码': code, '日期': dates, '收盘': close, '成交额': amount, '最新份额': shares})
+
+
+def panel():
+    dates = ['2026-01-05', '2026-01-06', '2026-01-07']
+    rows = pd.concat([
+        raw('510300', dates, [4.0, 4.0, 5.0], [100.0, 200.0, 300.0], [10.0, 12.0, 12.0]),
+        raw('513100', dates, [2.0, 2.0, 2.0], [50.0, 50.0, 50.0], [5.0, 4.0, 6.0]),
+    ])
+    return EtfPanel(quote_rows(rows))
+
+
+def test_quote_rows_implies_shares_and_pads_codes():
+    rows = quote_rows(pd.DataFrame({'代码': [510300, 159915], '数据日期': ['2026-01-05'] * 2,
+                                    '最新价': [4.0, np.nan], '成交额': [1e6, 2e6],
+                                    '成交量': [1000, 10], '换手率': [2.0, 1.0]}))
+    # 收盘价缺失的行丢弃；份额 = 成交量(手) × 100 / 换手率
+    assert list(rows.index) == [(pd.Timestamp('2026-01-05'), '510300')]
+    assert rows['份额'].iloc[0] == 1000 * 100 / 0.02
+    assert rows['份额估算'].iloc[0] == 1.0
+    assert quote_rows(None).empty and quote_rows(pd.DataFrame({'x': [1]})).empty
+
+
+def test_history_rows_skips_empty_frames():
+    rows = history_rows({'510300': raw('510300', ['2026-01-05'], [4.0], [1.0], [1.0]).drop(columns='代码'),
+                         '510500': pd.DataFrame(), '510050': None})
+    assert list(rows.index.get_level_values('代码')) == ['510300']
+    assert history_rows({}).empty
+
+
+def test_classify_by_type_and_name():
+    fund_types = pd.Series({'511880': '货币型', '518880': '商品型', '513100': '指数型-海外股票',
+                            '511010': '指数型-固收', '510300': '指数型-股票'})
+    names = pd.Series({'159920': '恒生ETF', '510300': '沪深300ETF'})
+    types = classify(fund_types, names)
+    assert types.to_dict() == {'159920': '跨境ETF', '510300': '股票ETF', '511010': '债券ETF',
+                               '511880': '货币ETF', '513100': '跨境ETF', '518880': '商品ETF'}
+
+
+def test_net_flow_aum_and_flow_rate():
+    etf = panel()
+    flow = etf.net_flow()
+    assert flow.loc['2026-01-06'].tolist() == [8.0, -2.0]
+    assert flow.loc['2026-01-07'].tolist() == [0.0, 4.0]
+    assert etf.aum().loc['2026-01-07'].tolist() == [60.0, 12.0]
+    # 1/6：净申赎 6 / 前日规模 50
+    assert etf.flow_rate().loc['2026-01-06'] == 6.0 / 50.0
+    assert etf.amount().tolist() == [150.0, 250.0, 350.0]
+    ratio = etf.amount_ratio(pd.Series([1500.0, 2500.0], index=pd.to_datetime(['2026-01-05', '2026-01-06'])))
+    assert ratio.iloc[:2].tolist() == [0.1, 0.1] and np.isnan(ratio.iloc[2])
+
+
+def test_by_type_matrix_sum():
+    etf = panel()
+    totals = etf.by_type(etf.aum(), pd.Series({'513100': '跨境ETF'}))
+    assert list(totals.columns) == list(ETF_TYPES)
+    assert totals.loc['2026-01-05', '股票ETF'] == 40.0     # 未分类计入股票ETF
+    assert totals.loc['2026-01-05', '跨境ETF'] == 10.0
+    assert totals.loc['2026-01-05', '货币ETF'] == 0.0
+
+
+def test_merge_prefers_new_rows_and_last_dates():
+    etf = panel()
+    update = quote_rows(pd.concat([
+        raw('510300', ['2026-01-07', '2026-01-08'], [5.5, 6.0], [1.0, 1.0], [13.0, 14.0]),
+        raw('159915', ['2026-01-08'], [3.0], [1.0], [1.0]),
+    ]))
+    merged = etf.merge(update)
+    assert list(merged.codes) == ['159915', '510300', '513100']
+    assert merged.field('收盘').loc['2026-01-07', '510300'] == 5.5
+    assert merged.field('收盘').loc['2026-01-07', '513100'] == 2.0   # 新数据缺失时保留旧值
+    last = merged.last_dates()
+    assert last['510300'] == pd.Timestamp('2026-01-08') and last['513100'] == pd.Timestamp('2026-01-07')
+    assert list(merged.since('2026-01-07').dates) == list(pd.to_datetime(['2026-01-07', '2026-01-08']))
+
+
+def test_rows_round_trip():
+    etf = panel()
+    again = EtfPanel(etf.rows())
+    pd.testing.assert_frame_equal(again.frame, etf.frame)
+    assert EtfPanel().empty and EtfPanel().last_dates().empty
+
+
+def estimated(code, dates, close, shares):
+    """由成交量 / 换手率反推份额的历史行（换手率固定 1%，成交量(手) = 份额 / 10000）"""
+    return pd.DataFrame({'代码': code, '日期': dates, '收盘': close, '成交额': 1.0,
+                         '成交量': [value / 10000 for value in shares], '换手率': 1.0})
+
+
+def test_estimated_shares_are_excluded_from_flows():
+    dates = pd.bdate_range('2026-01-05', periods=6)
+    # 510300: 前三天反推（误差很大），后三天快照；513100: 全部为快照
+    history = history_rows({'510300': estimated('510300', dates[:3], [1.0] * 3, [900.0, 1300.0, 700.0])
+                           .drop(columns='代码')})
+    snapshots = pd.concat([
+        raw('510300', dates[3:], [1.0] * 3, [1.0] * 3, [1000.0, 1010.0, 1005.0]),
+        raw('513100', dates, [2.0] * 6, [1.0] * 6, [50.0, 51.0, 51.0, 52.0, 52.0, 53.0]),
+    ])
+    etf = EtfPanel(history).merge(quote_rows(snapshots))
+    flow = etf.net_flow()
+    # 估算 → 实际的交界（1300/700 → 1000）不产生净申赎
+    assert flow['510300'].iloc[:4].isna().all()
+    assert flow['510300'].iloc[4:].tolist() == [10.0, -5.0]
+    assert flow['513100'].iloc[1:].tolist() == [2.0, 0.0, 2.0, 0.0, 2.0]
+    assert flow.sum(min_count=1).to_dict() == {'510300': 5.0, '513100': 6.0}
+    # 净申赎率的分母只含当天有净申赎的 ETF
+    assert etf.flow_rate().iloc[1] == 2.0 / 100.0
+    assert etf.flow_rate().iloc[4] == 10.0 / (1000.0 + 104.0)
+    # 规模仍使用估算份额
+    assert etf.aum()['510300'].iloc[0] == 900.0
+
+
+def test_merge_keeps_exact_shares_over_estimates():
+    day = ['2026-01-05']
+    etf = EtfPanel(quote_rows(raw('510300', day, [1.0], [1.0], [1000.0])))
+    merged = etf.merge(history_rows({'510300': estimated('510300', day, [1.1], [1300.0]).drop(columns='代码')}))
+    assert merged.field('份额').iloc[0, 0] == 1000.0
+    assert merged.field('份额估算').iloc[0, 0] == 0.0
+    assert merged.field('收盘').iloc[0, 0] == 1.1
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+from datetime import date, timedelta
+
+from event_log import EventLog, LogSummary, read_events, summarize
+
+
+def task(name, status, details='', chart_path=None):
+    return 'task', {'task': name, 'status': status, 'details': details, 'chart_path': chart_path}
+
+
+def test_runs_append_instead_of_truncating(tmp_path):
+    log = EventLog(str(tmp_path / 'events.jsonl'))
+    first = log.start('run-1')
+    log.write(*task('a', 'success'))
+    second = log.start('run-2')
+    log.write(*task('b', 'error', 'boom'))
+    log.close()
+    assert [data['task'] for _, data in read_events(log.path)] == ['a', 'b']
+    assert [data['task'] for _, data in read_events(log.path, run=first)] == ['a']
+    assert [data['task'] for _, data in read_events(log.path, run=second)] == ['b']
+
+
+def test_summarize_defaults_to_last_run(tmp_path):
+    log = EventLog(str(tmp_path / 'events.jsonl'))
+    log.start('run-1')
+    log.write(*task('a', 'warning', 'slow'))
+    log.start('run-2')
+    log.write(*task('b', 'success', chart_path='b.png'))
+    log.write('insight', ['资金', 'inflow'])
+    log.write('signal', ['vix', 18.5])
+    log.close()
+    summary = summarize(log.path)
+    assert summary['task_status'] == {'b': 'success'}
+    assert summary['warnings'] == []
+    assert summary['charts'] == ['b.png']
+    assert summary['market_signals'] == {'vix': 18.5}
+    assert summarize(log.path, run='run-1')['warnings'] == ['slow']
+
+
+def test_partial_last_line_is_skipped(tmp_path):
+    log = EventLog(str(tmp_path / 'events.jsonl'))
+    log.start()
+    log.write(*task('a', 'success'))
+    log.close()
+    with open(log.path, 'a', encoding='utf-8') as f:
+        f.write('{"kind": "task", "da')
+    assert len(list(read_events(log.path))) == 1
+
+
+def test_rotates_by_day_and_keeps_recent_files(tmp_path):
+    path = tmp_path / 'events.jsonl'
+    for days in range(1, 5):
+        old = tmp_path / f'events.{date.today() - timedelta(days=days + 1):%Y-%m-%d}.jsonl'
+        old.write_text('')
+    path.write_text('{"kind": "run", "data": {}}\n')
+    yesterday = time.time() - 86400
+    os.utime(path, (yesterday, yesterday))
+    log = EventLog(str(path), keep_days=2)
+    log.start()
+    log.write(*task('a', 'success'))
+    log.close()
+    rotated = sorted(p.name for p in tmp_path.glob('events.*-*-*.jsonl'))
+    assert rotated[-1] == f'events.{date.fromtimestamp(yesterday):%Y-%m-%d}.jsonl'
+    assert len(rotated) == 2
+    assert [data['task'] for _, data in read_events(str(path))] == ['a']
+
+
+def test_reset_drops_keys_from_previous_run():
+    summary = LogSummary()
+    summary.apply(*task('a', 'error', 'boom'))
+    summary['total_time'] = '1.0s'
+    summary['data_sources'] = {'x': {}}
+    summary.reset()
+    assert 'total_time' not in summary and 'data_sources' not in summary
+    assert summary['errors'] == [] and summary.task_total == 0
+
+
+def test_message_lists_are_capped():
+    summary = LogSummary(max_messages=3)
+    for i in range(10):
+        summary.apply(*task(f't{i}', 'warning', str(i)))
+    assert summary['warnings'] == ['0', '1', '2']
+    assert summary['task_counts'] == {'warning': 10}
+
+
+def test_merge_group_summaries():
+    first, second = LogSummary(), LogSummary()
+    first['start_time'], second['start_time'] = '2026-01-05T09:00:00', '2026-01-05T08:00:00'
+    for summary, name, status in [(first, '行情数据', 'success'), (first, 'K线', 'success'),
+                                  (second, '行情数据', 'warning'), (second, '融资余额', 'error')]:
+        summary.apply(*task(name, status, name, f'{name}.png'))
+    first.apply('insight', ('风险', '低'))
+    second.apply('signal', ('vix', 15))
+    merged = LogSummary()
+    merged.merge(first)
+    merged.merge(dict(second))
+    assert merged['task_counts'] == {'success': 2, 'warning': 1, 'error': 1}
+    assert merged['task_status']['行情数据'] == 'warning'
+    assert merged['charts'] == ['行情数据.png', 'K线.png', '融资余额.png']
+    assert merged['insights'] == [('风险', '低')] and merged['market_signals'] == {'vix': 15}
+    assert merged['errors'] == ['融资余额'] and merged['start_time'] == '2026-01-05T08:00:00'
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+
+from indicators import IndicatorEngine
+
+
+def prices():
+    """两条不同交易日历的价格序列（b 缺少部分日期）"""
+    rng = np.random.default_rng(7)
+    dates = pd.bdate_range('2026-01-01', periods=80)
+    a = pd.Series(100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(dates)))), index=dates)
+    b = pd.Series(50 * np.exp(np.cumsum(rng.normal(0, 0.02, len(dates)))), index=dates).drop(dates[5::7])
+    return {'a': a, 'b': b}
+
+
+def test_per_series_indicators_match_pandas():
+    data = prices()
+    engine = IndicatorEngine(data, trend_period=10, vol_window=20)
+    for name, series in data.items():
+        assert engine.last[name] == series.iloc[-1]
+        assert engine.count[name] == len(series)
+        assert np.isclose(engine.change(5)[name], (series.iloc[-1] / series.iloc[-5] - 1) * 100)
+        assert np.isclose(engine.moving_average(10)[name], series.iloc[-10:].mean())
+        vol = series.pct_change().iloc[-20:].std() * np.sqrt(252) * 100
+        assert np.isclose(engine.volatility[name], vol)
+        assert np.isclose(engine.percentile[name], (series <= series.iloc[-1]).mean() * 100)
+        trend = 'up' if series.iloc[-10:].mean() > series.iloc[-20:-10].mean() else 'down'
+        assert engine.trend[name] == trend
+
+
+def test_short_history_is_nan_or_unknown():
+    engine = IndicatorEngine({'x': pd.Series([1.0, 2.0, 3.0], index=pd.bdate_range('2026-01-01', periods=3))})
+    assert np.isnan(engine.change(10)['x'])
+    assert np.isnan(engine.moving_average(5)['x'])
+    assert engine.trend['x'] == 'unknown'
+
+
+def test_returns_and_corr_use_own_calendar():
+    data = prices()
+    engine = IndicatorEngine(data)
+    returns = engine.returns()
+    expected = data['b'].pct_change()
+    assert np.allclose(returns['b'].dropna(), expected.dropna())
+    both = pd.concat({name: s.pct_change() for name, s in data.items()}, axis=1).dropna()
+    assert np.isclose(engine.corr().loc['a', 'b'], both['a'].corr(both['b']))
+
+
+def test_diff_columns_use_differences():
+    data = prices()
+    engine = IndicatorEngine(data)
+    assert np.allclose(engine.returns(diff=('a',))['a'].dropna(), data['a'].diff().dropna())
+
+
+def test_tz_aware_and_duplicate_dates_are_normalised():
+    index = pd.DatetimeIndex(['2026-01-02', '2026-01-05', '2026-01-05'], tz='America/New_York')
+    engine = IndicatorEngine({'x': pd.Series([1.0, 2.0, 3.0], index=index)})
+    assert engine.count['x'] == 2
+    assert engine.last['x'] == 3.0
+    assert engine.prices.index.tz is None
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import pytest
+
+from disk_cache import DiskCache, _PARQUET
+from market_data import MarketDataStore, period_days, period_offset
+
+TODAY = pd.Timestamp('2026-10-16')
+
+
+def ohlc(start, end):
+    index = pd.bdate_range(start, end)
+    close = np.linspace(100, 110, len(index))
+    return pd.DataFrame({'Open': close, 'High': close, 'Low': close, 'Close': close}, index=index)
+
+
+class FakeYahoo:
+    """按 period / start 返回 300 天日线中相应窗口的下载器，记录调用"""
+
+    def __init__(self):
+        self.history = ohlc(TODAY - pd.Timedelta(days=300), TODAY)
+        self.calls = []
+
+    def window(self, period, start):
+        if start is not None:
+            return self.history[self.history.index >= pd.Timestamp(start)]
+        offset = period_offset(period)
+        return self.history if offset is None else self.history[self.history.index >= TODAY - offset]
+
+    def download(self, symbol, period, interval, start=None):
+        self.calls.append(('single', symbol, period, start))
+        return self.window(period, start)
+
+    def download_batch(self, symbols, period, interval, start=None):
+        self.calls.append(('batch', tuple(symbols), period, start))
+        return {symbol: self.window(period, start) for symbol in symbols}
+
+
+def make_store(tmp_path=None, max_age=3600):
+    yahoo = FakeYahoo()
+    cache = DiskCache(str(tmp_path)) if tmp_path is not None else None
+    store = MarketDataStore(yahoo.download, yahoo.download_batch, disk_cache=cache, max_age=max_age,
+                            clock=lambda: TODAY)
+    return store, yahoo
+
+
+def test_period_parsing():
+    assert period_days('5d') == 5
+    assert period_days('3mo') == 93
+    assert period_days('max') == float('inf')
+    assert period_offset('max') is None
+    with pytest.raises(ValueError):
+        period_days('3q')
+
+
+def test_narrow_period_sliced_from_wider_download():
+    store, yahoo = make_store()
+    store.get('^GSPC', '1y')
+    month = store.get('^GSPC', '1mo')
+    assert len(yahoo.calls) == 1
+    assert month.index[0] >= TODAY - pd.DateOffset(months=1)
+
+
+@pytest.mark.skipif(not _PARQUET, reason='需要 pyarrow')
+def test_same_period_hit_is_sliced_to_window(tmp_path):
+    """磁盘缓存累积了 300 天，同一 period 的请求仍只返回该窗口"""
+    store, _ = make_store(tmp_path)
+    store.disk_cache.save(ohlc(TODAY - pd.Timedelta(days=300), TODAY), 'yf_1d', symbol='VNQ')
+    month = store.get('VNQ', '1mo')
+    assert month.index[0] >= TODAY - pd.DateOffset(months=1)
+    assert len(month) < 30
+
+
+@pytest.mark.skipif(not _PARQUET, reason='需要 pyarrow')
+def test_prefetch_from_disk_is_sliced(tmp_path):
+    store, yahoo = make_store(tmp_path)
+    store.disk_cache.save(ohlc(TODAY - pd.Timedelta(days=300), TODAY), 'yf_1d', symbol='VNQ')
+    store.require('VNQ', '1mo')
+    assert store.prefetch() == (['VNQ'], [])
+    assert yahoo.calls == []     # 缓存新鲜，不访问网络
+    assert store.get('VNQ', '1mo').index[0] >= TODAY - pd.DateOffset(months=1)
+
+
+@pytest.mark.skipif(not _PARQUET, reason='需要 pyarrow')
+def test_stale_disk_cache_downloads_only_new_rows(tmp_path):
+    store, yahoo = make_store(tmp_path, max_age=0)
+    cached = ohlc(TODAY - pd.Timedelta(days=300), TODAY - pd.Timedelta(days=5))
+    store.disk_cache.save(cached, 'yf_1d', symbol='^VIX')
+    frame = store.get('^VIX', '3mo')
+    assert yahoo.calls == [('single', '^VIX', '3mo', f'{cached.index[-1]:%Y-%m-%d}')]
+    assert frame.index[-1] == TODAY
+
+
+def test_prefetch_batches_registered_symbols():
+    store, yahoo = make_store()
+    store.require('^GSPC', '1mo')
+    store.require('^GSPC', '1y')
+    store.require('^HSI', '3mo')
+    fetched, missing = store.prefetch()
+    assert fetched == ['^GSPC', '^HSI'] and missing == []
+    assert yahoo.calls == [('batch', ('^GSPC', '^HSI'), '1y', None)]
+    store.get('^GSPC', '6mo')
+    assert len(yahoo.calls) == 1
+
+
+def test_as_of_cuts_rows_after_date():
+    store, _ = make_store()
+    store.as_of = TODAY - pd.Timedelta(days=30)
+    frame = store.get('^GSPC', '1mo')
+    assert frame.index[-1] <= store.as_of
+    assert frame.index[0] >= store.as_of - pd.DateOffset(months=1)
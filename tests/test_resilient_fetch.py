@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from disk_cache import DiskCache, _PARQUET
+from resilient_fetch import ResilientFetcher, FetchPolicy, FetchTimeout, CircuitOpen, CircuitBreaker
+from tracing import Tracer
+
+
+def fetcher(policy, **kwargs):
+    sleeps = []
+    instance = ResilientFetcher({'src': policy}, sleep=sleeps.append, **kwargs)
+    return instance, sleeps
+
+
+def flaky(failures, value='ok'):
+    calls = []
+
+    def func():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise ConnectionError(f'失败 {len(calls)}')
+        return value
+    return func, calls
+
+
+def test_retries_with_bounded_backoff_then_succeeds():
+    instance, sleeps = fetcher(FetchPolicy(timeout=1, deadline=10, attempts=3, backoff=1, max_backoff=1.5))
+    func, calls = flaky(2)
+    assert instance.call('src', func) == 'ok'
+    assert len(calls) == 3
+    assert len(sleeps) == 2 and 0 <= sleeps[0] <= 1 and 0 <= sleeps[1] <= 1.5
+    stats = instance.stats()['src']
+    assert (stats['failures'], stats['retries'], stats['state']) == (2, 2, 'closed')
+
+
+def test_last_error_is_raised_after_attempts():
+    instance, _ = fetcher(FetchPolicy(timeout=1, deadline=10, attempts=2))
+    func, calls = flaky(5)
+    with pytest.raises(ConnectionError, match='失败 2'):
+        instance.call('src', func)
+    assert len(calls) == 2
+
+
+def test_timeout_abandons_attempt_and_retries():
+    release = threading.Event()
+    calls = []
+
+    def func():
+        calls.append(1)
+        if len(calls) == 1:
+            release.wait(5)     # 第一次卡住
+        return len(calls)
+    instance, _ = fetcher(FetchPolicy(timeout=0.1, deadline=5, attempts=2, backoff=0))
+    start = time.time()
+    assert instance.call('src', func) == 2
+    release.set()
+    assert time.time() - start < 2
+    assert instance.stats()['src']['timeouts'] == 1
+
+
+def test_timeout_raises_fetch_timeout():
+    release = threading.Event()
+    instance, _ = fetcher(FetchPolicy(timeout=0.05, deadline=0.2, attempts=1))
+    with pytest.raises(FetchTimeout):
+        instance.call('src', lambda: release.wait(5))
+    release.set()
+
+
+def test_breaker_opens_and_half_opens():
+    now = [0.0]
+    breaker = CircuitBreaker(threshold=2, cooldown=10, clock=lambda: now[0])
+    assert breaker.allow()
+    assert not breaker.failure()
+    assert breaker.failure()          # 第二次失败时打开
+    assert breaker.state == 'open' and not breaker.allow()
+    now[0] = 11
+    assert breaker.state == 'half_open'
+    assert breaker.allow() and not breaker.allow()     # 只放行一次探测
+    breaker.success()
+    assert breaker.state == 'closed'
+
+
+def test_open_circuit_rejects_calls():
+    instance, _ = fetcher(FetchPolicy(timeout=1, deadline=10, attempts=1), threshold=1)
+    func, _ = flaky(10)
+    with pytest.raises(ConnectionError):
+        instance.call('src', func)
+    with pytest.raises(CircuitOpen):
+        instance.call('src', func)
+    assert instance.stats()['src']['rejected'] == 1
+
+
+def test_hedged_uses_fallback_when_primary_is_slow():
+    release = threading.Event()
+    instance = ResilientFetcher({'primary': FetchPolicy(hedge_after=0.05)})
+    result, used = instance.hedged(('primary', lambda: release.wait(5) and 'late'),
+                                   ('fallback', lambda: 'fast'))
+    release.set()
+    assert (result, used) == ('fast', 'fallback')
+    assert instance.stats()['primary']['hedged'] == 1
+
+
+def test_hedged_prefers_primary_when_it_returns_in_time():
+    instance = ResilientFetcher({'primary': FetchPolicy(hedge_after=1)})
+    assert instance.hedged(('primary', lambda: 'p'), ('fallback', lambda: 'f')) == ('p', 'primary')
+
+
+def test_tracing_span_is_carried_into_worker_threads():
+    """工作线程中的字节计数记入调用方的 span，新开的 span 记在调用线程上"""
+    tracer = Tracer()
+    instance = ResilientFetcher({'src': FetchPolicy(timeout=1, deadline=5)}, context=tracer.carry)
+
+    def request():
+        tracer.count('bytes', 100)
+        with tracer.span('inner', 'fetch'):
+            tracer.count('bytes', 20)
+        return 'ok'
+    with tracer.span('parse', 'parse') as span:
+        assert instance.call('src', request) == 'ok'
+    assert span.args['bytes'] == 100
+    events = {event['name']: event for event in tracer.events()}
+    assert events['inner']['args']['bytes'] == 20
+    assert events['inner']['tid'] == events['parse']['tid'] == threading.get_ident()
+
+
+@pytest.mark.skipif(not _PARQUET, reason='需要 pyarrow')
+def test_retry_is_not_blocked_by_abandoned_cache_fetch(tmp_path):
+    """超时被放弃的调用仍在访问数据源时，重试不会卡在缓存文件锁上"""
+    cache = DiskCache(str(tmp_path))
+    release = threading.Event()
+    calls = []
+
+    def source(start_date=None):
+        calls.append(start_date)
+        if len(calls) == 1:
+            release.wait(5)
+        return pd.DataFrame({'日期': ['2026-01-02', '2026-01-05'], '值': [1.0, 2.0]})
+    source.__name__ = 'slow_source'
+    instance, _ = fetcher(FetchPolicy(timeout=0.2, deadline=5, attempts=2, backoff=0))
+    start = time.time()
+    frame = instance.call('src', cache.fetch, source, date_col='日期', start_arg='start_date',
+                          start_date='20260101')
+    release.set()
+    assert time.time() - start < 2
+    assert len(calls) == 2 and len(frame) == 2
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+
+from rolling_corr import RollingCorrelation
+
+
+def changes(rows=200, seed=11):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2025-01-01', periods=rows)
+    base = rng.normal(size=rows)
+    frame = pd.DataFrame({
+        'a': base + rng.normal(scale=0.5, size=rows),
+        'b': base + rng.normal(scale=0.5, size=rows),
+        'c': rng.normal(size=rows),
+    }, index=dates)
+    frame.iloc[::9, 2] = np.nan
+    return frame
+
+
+def pandas_corr(frame, window, min_periods):
+    return frame.iloc[-window:].corr(min_periods=min_periods)
+
+
+def test_matches_pandas_pairwise_corr_for_every_window():
+    frame = changes()
+    engine = RollingCorrelation(frame.columns, windows=(20, 60))
+    engine.update_frame(frame)
+    for window in (20, 60):
+        expected = pandas_corr(frame, window, max(window // 2, 3))
+        assert np.allclose(engine.corr(window).to_numpy(), expected.to_numpy(), equal_nan=True)
+
+
+def test_same_date_replaces_last_row_and_older_dates_are_ignored():
+    frame = changes(40)
+    engine = RollingCorrelation(frame.columns, windows=(20,))
+    engine.update_frame(frame)
+    revised = frame.copy()
+    revised.iloc[-1] = [0.3, -0.2, 0.1]
+    engine.update(frame.index[-1], revised.iloc[-1].to_numpy())
+    engine.update(frame.index[0], [9.0, 9.0, 9.0])
+    assert engine.steps == 40
+    assert np.allclose(engine.corr(20).to_numpy(), pandas_corr(revised, 20, 10).to_numpy(), equal_nan=True)
+
+
+def test_drift_flags_pair_whose_relation_breaks():
+    frame = changes(160)
+    frame.iloc[-20:, 1] = -frame.iloc[-20:, 0]      # 最近 20 天 a、b 反向
+    engine = RollingCorrelation(frame.columns, windows=(20, 120))
+    engine.update_frame(frame)
+    pairs = engine.drift()
+    assert pairs[0]['a'] == 'a' and pairs[0]['b'] == 'b'
+    assert pairs[0]['short'] < -0.9 and pairs[0]['drift'] < 0
+
+
+def test_save_and_load_resumes_incrementally(tmp_path):
+    frame = changes()
+    path = str(tmp_path / 'state.npz')
+    engine = RollingCorrelation(frame.columns, windows=(20, 60))
+    engine.update_frame(frame.iloc[:150])
+    engine.save(path)
+    resumed = RollingCorrelation.load(path, frame.columns, windows=(20, 60))
+    assert resumed.last_date == frame.index[149]
+    assert resumed.update_frame(frame) == 60        # 撤回重喂的最近 10 天与之后的 50 天
+    full = RollingCorrelation(frame.columns, windows=(20, 60))
+    full.update_frame(frame)
+    assert np.allclose(resumed.corr(60).to_numpy(), full.corr(60).to_numpy(), equal_nan=True)
+
+
+def test_load_with_changed_configuration_starts_empty(tmp_path):
+    path = str(tmp_path / 'state.npz')
+    engine = RollingCorrelation(['a', 'b'], windows=(20,))
+    engine.update_frame(changes(30)[['a', 'b']])
+    engine.save(path)
+    assert RollingCorrelation.load(path, ['a', 'b', 'c'], windows=(20,)).steps == 0
+    assert RollingCorrelation.load(path, ['a', 'b'], windows=(10,)).steps == 0
+    assert RollingCorrelation.load(path, ['a', 'b'], windows=(20,), overlap=5).steps == 0
+    assert RollingCorrelation.load(str(tmp_path / 'missing.npz'), ['a'], windows=(20,)).steps == 0
+
+
+def full_corr(frame, windows=(20, 60)):
+    engine = RollingCorrelation(frame.columns, windows=windows)
+    engine.update_frame(frame)
+    return engine
+
+
+def test_late_values_within_overlap_are_filled_in():
+    frame = changes()
+    lagged = frame.copy()
+    lagged.iloc[-3:, 2] = np.nan        # c 滞后：最近 3 天上次运行时还没有数据
+    engine = RollingCorrelation(frame.columns, windows=(20, 60))
+    engine.update_frame(lagged.iloc[:-1])
+    engine.update_frame(frame)
+    expected = full_corr(frame)
+    for window in (20, 60):
+        assert np.allclose(engine.corr(window).to_numpy(), expected.corr(window).to_numpy(), equal_nan=True)
+    assert engine.steps == len(frame)
+
+
+def test_failed_source_keeps_previously_fed_rows():
+    frame = changes()
+    engine = RollingCorrelation(frame.columns, windows=(20, 60))
+    engine.update_frame(frame.iloc[:-2])
+    partial = frame.copy()
+    partial['c'] = np.nan               # 本次 c 获取失败
+    engine.update_frame(partial.drop(columns='c'))
+    expected = frame.copy()
+    expected.iloc[-2:, 2] = np.nan
+    assert np.allclose(engine.corr(60).to_numpy(), full_corr(expected).corr(60).to_numpy(), equal_nan=True)
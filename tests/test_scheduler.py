@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import pytest
+
+from scheduler import TaskScheduler, emit, map_captured, carry_context
+
+
+def test_inputs_are_passed_in_order():
+    scheduler = TaskScheduler()
+    scheduler.add('a', lambda: 1)
+    scheduler.add('b', lambda: 2)
+    scheduler.add('sum', lambda x, y, z: x * 100 + y * 10 + z, args=(3,), inputs=('a', 'b'))
+    results = scheduler.run()
+    assert results['sum'].status == 'success'
+    assert results['sum'].value == 312
+
+
+def test_undeclared_dependency_and_duplicate_name():
+    scheduler = TaskScheduler()
+    scheduler.add('a', lambda: 1)
+    with pytest.raises(ValueError):
+        scheduler.add('b', lambda x: x, inputs=('missing',))
+    with pytest.raises(ValueError):
+        scheduler.add('a', lambda: 2)
+
+
+def test_failure_skips_downstream():
+    scheduler = TaskScheduler()
+    scheduler.add('bad', lambda: 1 / 0)
+    scheduler.add('child', lambda x: x, inputs=('bad',))
+    scheduler.add('grandchild', lambda: None, after=('child',))
+    scheduler.add('other', lambda: 'ok')
+    results = scheduler.run()
+    assert results['bad'].status == 'error' and 'ZeroDivisionError' in results['bad'].error
+    assert results['child'].status == 'skipped'
+    assert results['grandchild'].status == 'skipped'
+    assert results['other'].value == 'ok'
+
+
+def test_timeout_marks_task_and_skips_dependents():
+    release = threading.Event()
+    scheduler = TaskScheduler()
+    scheduler.add('slow', release.wait, timeout=0.2)
+    scheduler.add('after_slow', lambda: None, after=('slow',))
+    start = time.time()
+    results = scheduler.run()
+    release.set()
+    assert time.time() - start < 5
+    assert results['slow'].status == 'timeout'
+    assert results['after_slow'].status == 'skipped'
+
+
+def test_results_replayed_in_declaration_order():
+    scheduler = TaskScheduler()
+
+    def task(delay, label):
+        time.sleep(delay)
+        emit(label)
+        print(label)
+        return label
+    scheduler.add('first', task, args=(0.2, 'first'))
+    scheduler.add('second', task, args=(0.0, 'second'))
+    seen = []
+    results = scheduler.run(on_result=lambda r: seen.append((r.name, r.events, r.output)))
+    assert seen == [('first', ['first'], 'first\n'), ('second', ['second'], 'second\n')]
+    assert list(results) == ['first', 'second']
+
+
+def test_select_keeps_transitive_dependencies_and_prefix():
+    scheduler = TaskScheduler()
+    scheduler.add('data', lambda: 1)
+    scheduler.add('K线:a', lambda x: x, inputs=('data',))
+    scheduler.add('K线:b', lambda x: x, inputs=('data',))
+    scheduler.add('other', lambda: None)
+    assert list(scheduler.select(['K线']).tasks) == ['data', 'K线:a', 'K线:b']
+    assert list(scheduler.select(['K线:b']).tasks) == ['data', 'K线:b']
+    with pytest.raises(ValueError):
+        scheduler.select(['missing'])
+
+
+def test_map_captured_merges_events_in_item_order():
+    def task():
+        def work(item):
+            time.sleep(0.05 * (3 - item))
+            emit(item)
+            return item * 2
+        return map_captured(work, [1, 2, 3])
+    scheduler = TaskScheduler()
+    scheduler.add('map', task)
+    result = scheduler.run()['map']
+    assert result.value == [2, 4, 6]
+    assert result.events == [1, 2, 3]
+
+
+def test_map_captured_reraises_and_works_outside_tasks():
+    assert map_captured(lambda x: x + 1, [1, 2]) == [2, 3]
+
+    def task():
+        return map_captured(lambda x: 1 / x, [1, 0])
+    scheduler = TaskScheduler()
+    scheduler.add('map', task)
+    assert scheduler.run()['map'].status == 'error'
+
+
+def test_carry_context_forwards_events_to_helper_thread():
+    def task():
+        wrapped = carry_context(lambda: emit('from helper'))
+        thread = threading.Thread(target=wrapped)
+        thread.start()
+        thread.join()
+    scheduler = TaskScheduler()
+    scheduler.add('carry', task)
+    assert scheduler.run()['carry'].events == ['from helper']
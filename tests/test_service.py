@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import json
+import threading
+import time
+
+import pytest
+
+from service import TTLCache, RefreshJob, SignalService
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def summary(signals=None, insights=(), charts=()):
+    return {'market_signals': dict(signals or {}), 'insights': list(insights), 'charts': list(charts),
+            'task_counts': {'success': 1}, 'errors': [], 'warnings': []}
+
+
+def load(service, path):
+    return json.loads(service.get(path))
+
+
+def test_ttl_cache_expires_and_skips_invalid():
+    clock = Clock()
+    cache = TTLCache(clock)
+    calls = []
+    loader = lambda: calls.append(1) or len(calls)
+    assert cache.get('a', 10, loader) == 1
+    assert cache.get('a', 10, loader) == 1
+    clock.now = 11
+    assert cache.get('a', 10, loader) == 2
+    # 不可缓存的结果每次重新加载
+    assert cache.get('b', 10, lambda: None, valid=lambda v: v is not None) is None
+    assert 'b' not in cache._entries
+
+
+def test_ttl_cache_loads_once_under_concurrency():
+    cache = TTLCache()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.05)
+        return 'v'
+    threads = [threading.Thread(target=cache.get, args=('k', 60, loader)) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+
+
+def test_publish_merges_groups_in_order(tmp_path):
+    clock = Clock()
+    jobs = [RefreshJob('日线', 100, lambda: summary({'vix': 'low', 'rmb': 'flat'}, [('风险', '平稳')],
+                                                    ['output/vix.png'])),
+            RefreshJob('盘中', 10, lambda: summary({'vix': 'high'}))]
+    service = SignalService(jobs, str(tmp_path), clock=clock)
+    assert load(service, '/api/signals')['signals'] == {}
+    assert service.run_due() == ['日线', '盘中']
+    assert load(service, '/api/signals')['signals'] == {'vix': 'high', 'rmb': 'flat'}
+    assert load(service, '/api/insights')['insights'] == [{'category': '风险', 'message': '平稳', 'group': '日线'}]
+    assert load(service, '/api/charts')['charts'] == [{'name': 'vix.png', 'url': '/charts/vix.png', 'group': '日线'}]
+    assert service.get('/api/unknown') is None
+    clock.now = 50
+    assert service.run_due() == ['盘中']
+    assert load(service, '/api/status')['groups']['日线']['next_in'] == 50
+
+
+def test_failed_refresh_keeps_last_summary(tmp_path):
+    results = [summary({'a': 1}), RuntimeError('down')]
+    logged = []
+
+    def run():
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+    job = RefreshJob('g', 10, run)
+    service = SignalService([job], str(tmp_path), clock=Clock(), logger=lambda *args: logged.append(args))
+    service.refresh(job)
+    service.refresh(job)
+    assert load(service, '/api/signals')['signals'] == {'a': 1}
+    status = load(service, '/api/status')['groups']['g']
+    assert status['error'] == 'RuntimeError: down' and status['runs'] == 2
+    assert logged == [('常驻服务', 'error', 'g: RuntimeError: down')]
+
+
+def test_trigger(tmp_path):
+    clock = Clock()
+    job = RefreshJob('g', 10, lambda: summary())
+    service = SignalService([job], str(tmp_path), clock=clock)
+    service.run_due()
+    assert service.run_due() == []
+    service.trigger('g')
+    assert service.run_due() == ['g']
+    with pytest.raises(KeyError):
+        service.trigger('missing')
+
+
+def test_chart_reads_files_and_rejects_paths(tmp_path):
+    (tmp_path / 'a.png').write_bytes(b'one')
+    service = SignalService([], str(tmp_path))
+    assert service.chart('a.png') == b'one'
+    (tmp_path / 'a.png').write_bytes(b'three')
+    assert service.chart('a.png') == b'three'
+    assert service.chart('../a.png') is None
+    assert service.chart('.hidden') is None
+    assert service.chart('missing.png') is None
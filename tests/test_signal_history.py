@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import pytest
+
+import signal_history
+from signal_history import MergeSortTree, SignalHistory, _PARQUET
+
+
+def test_merge_sort_tree_matches_brute_force():
+    rng = np.random.default_rng(3)
+    values = rng.integers(0, 20, 137).astype(float)
+    tree = MergeSortTree(values)
+    for lo, hi in [(0, 137), (5, 6), (17, 90), (64, 128), (100, 137), (3, 3)]:
+        for value in (-1.0, 0.0, 7.0, 19.0, 25.0):
+            window = values[lo:hi]
+            assert tree.rank(lo, hi, value) == ((window < value).sum(), (window == value).sum())
+
+
+def test_merge_sort_tree_append_and_update_match_rebuild():
+    rng = np.random.default_rng(5)
+    values = list(rng.integers(0, 20, 50).astype(float))
+    tree = MergeSortTree(values)
+    for step in range(14):
+        value = float(rng.integers(0, 20))
+        assert tree.append(value)
+        values.append(value)
+        index = int(rng.integers(0, len(values)))
+        new = float(rng.integers(0, 20))
+        tree.update(index, values[index], new)
+        values[index] = new
+    assert not tree.append(1.0)      # 64 个补位已用完
+    fresh = MergeSortTree(values)
+    for level, expected in zip(tree.levels, fresh.levels):
+        assert np.array_equal(level, expected)
+    array = np.array(values)
+    for lo, hi in [(0, 64), (0, 63), (10, 64), (31, 33)]:
+        for value in (0.0, 9.0, 19.0):
+            window = array[lo:hi]
+            assert tree.rank(lo, hi, value) == ((window < value).sum(), (window == value).sum())
+
+
+def history(tmp_path=None, **kwargs):
+    path = str(tmp_path / 'history.parquet') if tmp_path is not None else None
+    return SignalHistory(path, **kwargs)
+
+
+def test_percentile_with_lookback_and_min_samples():
+    store = history(min_samples=5)
+    dates = pd.bdate_range('2024-01-01', periods=300)
+    values = pd.Series(np.arange(300, dtype=float), index=dates)
+    store.record('x', values)
+    assert store.percentile('x') == ((299 + 0.5) / 300 * 100, 300)
+    percentile, count = store.percentile('x', value=values.iloc[-30], lookback='6mo')
+    window = values[values.index >= dates[-1] - pd.DateOffset(months=6)]
+    assert count == len(window)
+    assert np.isclose(percentile, ((window < values.iloc[-30]).sum() + 0.5) / count * 100)
+    assert np.isnan(store.percentile('x', lookback=3)[0])
+    assert np.isnan(store.percentile('missing')[0])
+
+
+def test_record_merges_and_newer_values_win():
+    store = history()
+    store.record('x', pd.Series([1.0, 2.0], index=pd.to_datetime(['2026-01-02', '2026-01-05'])))
+    store.record('x', 3.0, date='2026-01-05')
+    store.record('x', 0.5, date='2026-01-01')
+    assert store.series('x').tolist() == [0.5, 1.0, 3.0]
+    assert store.last_date('x') == pd.Timestamp('2026-01-05')
+
+
+def test_streak_counts_latest_label():
+    store = history()
+    for day, label in zip(pd.bdate_range('2026-01-01', periods=5), ['低', '高', '高', '低', '低']):
+        store.record_label('risk', label, day)
+    assert store.streak('risk') == ('低', 2)
+    assert store.streak('missing') == (None, 0)
+
+
+@pytest.mark.skipif(not _PARQUET, reason='需要 pyarrow')
+def test_save_and_reload(tmp_path):
+    store = history(tmp_path)
+    store.record('x', pd.Series([1.0, 2.0], index=pd.bdate_range('2026-01-01', periods=2)))
+    store.record_label('risk', '高', '2026-01-02')
+    assert store.save() == 2
+    assert store.save() == 0     # 没有新数据不重写
+    reloaded = history(tmp_path)
+    assert reloaded.series('x').tolist() == [1.0, 2.0]
+    assert reloaded.streak('risk') == ('高', 1)
+
+
+@pytest.mark.skipif(not _PARQUET, reason='需要 pyarrow')
+def test_freeze_drops_later_rows_and_disables_save(tmp_path):
+    store = history(tmp_path)
+    store.record('x', pd.Series([1.0, 2.0, 3.0], index=pd.bdate_range('2026-01-01', periods=3)))
+    store.freeze('2026-01-02')
+    assert store.series('x').tolist() == [1.0, 2.0]
+    store.record('x', 9.0, date='2026-01-02')
+    assert store.save() == 0
+    assert not (tmp_path / 'history.parquet').exists()
+
+
+@pytest.mark.skipif(not _PARQUET, reason='需要 pyarrow')
+def test_freeze_during_save_does_not_break_it(tmp_path, monkeypatch):
+    store = history(tmp_path)
+    store.record('x', pd.Series([1.0, 2.0], index=pd.bdate_range('2026-01-01', periods=2)))
+    original = pd.DataFrame.to_parquet
+
+    def slow_write(frame, path, **kwargs):
+        store.freeze('2026-01-01')      # 写文件期间另一线程切换到历史日期
+        return original(frame, path, **kwargs)
+    monkeypatch.setattr(signal_history.pd.DataFrame, 'to_parquet', slow_write)
+    assert store.save() == 1
+    assert (tmp_path / 'history.parquet').exists()
+
+
+def test_daily_record_patches_tree_instead_of_rebuilding():
+    store = history(min_samples=5)
+    dates = pd.bdate_range('2024-01-01', periods=200)
+    values = pd.Series(np.random.default_rng(1).normal(size=200), index=dates)
+    store.record('x', values.iloc[:190])
+    store.percentile('x')
+    tree = store._trees['x'][1]
+    # 整段重新记录（已有日期的值不变）、修改最后一天并追加新交易日：原地更新同一棵树
+    store.record('x', values.iloc[:190])
+    store.record('x', 5.0, date=dates[189])
+    values.iloc[189] = 5.0
+    for day in dates[190:]:
+        store.record('x', values[day], date=day)
+    assert store._trees['x'][1] is tree
+    for lookback in (None, 30, '6mo'):
+        expected = history(min_samples=5)
+        expected.record('x', values)
+        assert store.percentile('x', lookback=lookback) == expected.percentile('x', lookback=lookback)
+    assert store.percentile('x', value=0.0, asof=dates[100]) == expected.percentile('x', value=0.0, asof=dates[100])
+    # 插入更早的日期时丢弃，下次查询重建
+    store.record('x', 1.0, date='2023-12-29')
+    assert 'x' not in store._trees
+    assert store.percentile('x')[1] == 201
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+import pytest
+
+from trading_calendar import align, get_calendar, master_days, TradingCalendar
+
+
+def ts(*days):
+    return pd.DatetimeIndex(days)
+
+
+def test_get_calendar():
+    nyse = get_calendar('NYSE')
+    assert isinstance(nyse, TradingCalendar)
+    assert get_calendar(nyse) is nyse
+    with pytest.raises(ValueError, match='未知交易日历'):
+        get_calendar('LSE')
+
+
+def test_nyse_2024_sessions():
+    sessions = get_calendar('NYSE').sessions('2024-01-01', '2024-12-31')
+    assert len(sessions) == 252
+    for holiday in ['2024-01-01', '2024-01-15', '2024-02-19', '2024-03-29', '2024-05-27',
+                    '2024-06-19', '2024-07-04', '2024-09-02', '2024-11-28', '2024-12-25']:
+        assert pd.Timestamp(holiday) not in sessions
+
+
+def test_nyse_observed_holidays():
+    nyse = get_calendar('NYSE')
+    # 2021-12-25 周六提前到周五；2022-01-01 周六不补休；六月节 2022 起
+    flags = nyse.is_session(['2021-12-24', '2021-12-31', '2022-06-20', '2021-06-18', '2025-01-09'])
+    assert flags.tolist() == [False, True, False, True, False]
+
+
+def test_hkex_lunar_new_year_extends_past_sunday():
+    hkex = get_calendar('HKEX')
+    # 2024 春节初一至初三为 2/10-2/12，含周日，顺延到 2/13
+    assert hkex.is_session(['2024-02-09', '2024-02-12', '2024-02-13', '2024-02-14']).tolist() == \
+        [True, False, False, True]
+    assert not hkex.is_session(['2024-03-29', '2024-04-01']).any()     # 耶稣受难日、复活节星期一
+
+
+def test_sse_holidays():
+    sse = get_calendar('SSE')
+    assert not sse.is_session(pd.date_range('2024-10-01', '2024-10-07')).any()
+    assert not sse.is_session(pd.date_range('2024-02-09', '2024-02-15')).any()
+    assert sse.is_session(['2024-10-08', '2024-02-19']).all()
+
+
+def test_is_session_handles_tz_and_range_end():
+    sse = get_calendar('SSE')
+    index = pd.DatetimeIndex(['2024-10-08 15:00', '2024-10-05 09:30'], tz='Asia/Shanghai')
+    assert sse.is_session(index).tolist() == [True, False]
+    assert not sse.is_session(['2040-01-02']).any()     # 超出日历范围
+
+
+def test_master_days_union():
+    days = master_days(('SSE', 'NYSE'), '2024-10-01', '2024-10-07')
+    # 国庆休市期间纽交所照常交易
+    assert pd.DatetimeIndex(days).equals(ts('2024-10-01', '2024-10-02', '2024-10-03', '2024-10-04',
+                                            '2024-10-07'))
+
+
+def test_align_carries_values_over_other_market_holidays():
+    sse = pd.Series([1.0, 2.0], index=ts('2024-09-30', '2024-10-08'))
+    nyse = pd.Series([10.0, 11.0, 12.0], index=ts('2024-09-30', '2024-10-01', '2024-10-08'))
+    frame = align({'a': sse, 'b': nyse}, calendar=('SSE', 'NYSE'))
+    assert list(frame.index) == list(ts('2024-09-30', '2024-10-01', '2024-10-08'))
+    assert frame['a'].tolist() == [1.0, 1.0, 2.0]
+    assert frame['b'].tolist() == [10.0, 11.0, 12.0]
+
+
+def test_align_tolerance_and_how():
+    a = pd.Series(range(10), index=pd.bdate_range('2024-03-04', periods=10), dtype=float)
+    b = pd.Series([1.0], index=ts('2024-03-04'))
+    frame = align({'a': a, 'b': b}, calendar='NYSE', tolerance=2, how=None)
+    assert frame['b'].notna().sum() == 3
+    assert len(align({'a': a, 'b': b}, calendar='NYSE', tolerance=2)) == 3
+
+
+def test_align_sorts_and_deduplicates():
+    series = pd.Series([2.0, 1.0, 3.0], index=ts('2024-03-05', '2024-03-04', '2024-03-05'))
+    frame = align({'a': series}, calendar='NYSE')
+    assert frame['a'].tolist() == [1.0, 3.0]
+
+
+def test_align_empty():
+    frame = align({'a': pd.Series(dtype=float)})
+    assert frame.empty and list(frame.columns) == ['a']